@@ -1,8 +1,16 @@
 import logging
+import os
+import sys
 from abc import ABC, abstractmethod
-import socket
-import airsim
-from pymavlink import mavutil
+
+# Модули пакета drone импортируют соседей напрямую (from clock import ...), поэтому каталог
+# drone добавляется в sys.path, как в tests/conftest.py: модуль работает и при запуске
+# python YetOne/drone_manager.py, и при импорте YetOne.drone_manager из корня репозитория
+DRONE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drone")
+if DRONE_DIR not in sys.path:
+    sys.path.append(DRONE_DIR)
+
+from backends import AirSimBackend, DroneBackend, MavLinkBackend, backend_for_manufacturer
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -69,60 +77,16 @@ class AirSimDroneFactory(DroneFactory):
     def create_drone(self, drone_id, model, manufacturer, sensors, max_speed, max_altitude, battery_capacity):
         return DroneFlyweight(drone_id, model, manufacturer, sensors, max_speed, max_altitude, battery_capacity)
 
-# Абстрактный класс для API управления дроном
-class IDroneAPI(ABC):
-    def __init__(self, connect_uri=None):
-        self.client = None
-        self.connect_uri = connect_uri
-
-    @abstractmethod
-    def connect(self):
-        pass
-
-    @abstractmethod
-    def send_command(self, command):
-        pass
-
-# Класс API для работы с AirSim
-class AirSimAPI(IDroneAPI):
-    def connect(self):
-        self.client = airsim.MultirotorClient()
-        try:
-            self.client.confirmConnection()
-            logger.info("Подключение через AirSim успешно")
-        except Exception as e:
-            logger.error(f"Ошибка подключения через AirSim: {e}")
-            raise
-
-    def send_command(self, command):
-        logger.info(f"Command sent to AirSim: {command}")
-
-# Класс API для работы с MAVLink
-class DJIDroneAPI(IDroneAPI):
-    def connect(self):
-        logger.debug(f"Попытка подключения к {self.connect_uri}")
-        try:
-            self.client = mavutil.mavlink_connection(self.connect_uri)
-            self.client.wait_heartbeat()
-            logger.info("Соединение с дроном DJI установлено")
-        except socket.gaierror as e:
-            logger.error(f"Ошибка получения адреса: {self.connect_uri} - {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка: {e}")
-            raise
-
-    def send_command(self, command):
-        logger.info(f"Command sent to DJI: {command}")
+# API управления дроном — общий асинхронный интерфейс бэкендов пакета drone
+IDroneAPI = DroneBackend
+AirSimAPI = AirSimBackend
+DJIDroneAPI = MavLinkBackend
 
 # Фабрика для создания объектов API
 class DroneAPIFactory:
     @staticmethod
     def get_drone_api(manufacturer, connect_uri):
-        if manufacturer.lower() == "dji":
-            return DJIDroneAPI(connect_uri)
-        else:
-            return AirSimAPI()
+        return backend_for_manufacturer(manufacturer, connect_uri)
 
 
 # Функция для выбора дрона на основе требуемой емкости батареи
@@ -1,13 +1,11 @@
-from abc import ABC, abstractmethod
 import logging
-import cv2
 from flask import Flask, Response, render_template, request, redirect, url_for
+from metrics import metrics_response, timer
+from .device_base import FRAME_STAGE_SECONDS, FRAMES, Device
 
 
 app = Flask(__name__)
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
 class DeviceManager:
     """Менеджер для управления устройствами, такими как камеры."""
 
@@ -20,7 +18,7 @@ class DeviceManager:
     def register_device(self, device):
         """Регистрация нового устройства."""
         self.devices.append(device)
-        self.logger.info(f"Device {device.get_name()} registered.")
+        self.logger.info("Device %s registered.", device.get_name())
 
     def initialize_devices(self):
         """Инициализация всех зарегистрированных устройств."""
@@ -29,7 +27,7 @@ class DeviceManager:
             try:
                 device.initialize()
             except Exception as err:
-                self.logger.error(f"Ошибка при инициализации устройства {device.get_name()}: {err}")
+                self.logger.error("Ошибка при инициализации устройства %s: %s", device.get_name(), err)
 
     def process_device_data(self):
         """Обработка данных от всех зарегистрированных устройств."""
@@ -38,7 +36,7 @@ class DeviceManager:
             try:
                 device.process_data()
             except Exception as err:
-                self.logger.error(f"Ошибка при обработке данных устройства {device.get_name()}: {err}")
+                self.logger.error("Ошибка при обработке данных устройства %s: %s", device.get_name(), err)
 
     def start_video_capture(self, source="udp://127.0.0.1:1234"):
         """Инициализирует захват видео с указанного источника."""
@@ -60,41 +58,27 @@ class DeviceManager:
 
     def video_stream(self):
         """Генерирует поток видео кадров."""
+        import cv2  # OpenCV загружается при первом использовании камеры, а не при импорте модуля
         self.logger.info("Начинаю трансляцию видео.")
         if self.camera_device is not None and self.camera_device.capture.isOpened():
             while True:
-                ret, frame = self.camera_device.capture.read()
+                with timer(FRAME_STAGE_SECONDS, "capture"):
+                    ret, frame = self.camera_device.capture.read()
                 if not ret:
                     self.logger.warning("Не удалось получить кадр.")
                     break
-                ret, buffer = cv2.imencode('.jpg', frame)
+                with timer(FRAME_STAGE_SECONDS, "encode"):
+                    ret, buffer = cv2.imencode('.jpg', frame)
                 if not ret:
                     self.logger.error("Ошибка кодирования кадра в JPEG.")
                     continue
                 frame = buffer.tobytes()
+                FRAMES.inc()
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
         else:
             self.logger.error("Камера не инициализирована или не открыта для трансляции.")
 
-class Device(ABC):
-    """Абстрактный класс для устройств."""
-
-    @abstractmethod
-    def get_name(self):
-        """Возвращает имя устройства."""
-        pass
-
-    @abstractmethod
-    def initialize(self):
-        """Инициализация устройства."""
-        pass
-
-    @abstractmethod
-    def process_data(self):
-        """Обработка данных устройства."""
-        pass
-
 class Camera(Device):
     """Класс, представляющий камеру."""
 
@@ -109,6 +93,7 @@ class Camera(Device):
 
     def initialize(self):
         """Инициализация камеры для захвата видео."""
+        import cv2
         self.capture = cv2.VideoCapture(self.address)
         if not self.capture.isOpened():
             self.logger.error("Не удалось открыть поток видео.")
@@ -155,9 +140,19 @@ def video_feed():
     """Маршрут для получения потока видео."""
     return Response(device_manager.video_stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики процесса в текстовом формате Prometheus."""
+    body, content_type = metrics_response()
+    return Response(body, content_type=content_type)
 
+
+# Запуск из корня репозитория: python -m client.Dev_mngr_with_requests
 if __name__ == '__main__':
+    from .logging_config import setup_logging
+
+    setup_logging(logging.DEBUG)
     try:
         app.run(debug=True)
     except Exception as e:
-        logging.error(f"Ошибка при запуске приложения: {e}")
\ No newline at end of file
+        logging.error("Ошибка при запуске приложения: %s", e)
\ No newline at end of file
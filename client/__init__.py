@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Клиент использует модули metrics и profiler из каталога drone. Они импортируются
+# по тем же именам, что и внутри drone (import profiler), чтобы в процессе был один
+# реестр метрик и один профилировщик; так же каталог добавляет tests/conftest.py.
+DRONE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "drone")
+if DRONE_DIR not in sys.path:
+    sys.path.append(DRONE_DIR)
@@ -1,4 +1,6 @@
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
+import profiler
+from metrics import metrics_response
 from .device_manager import DeviceManager
 from .sensor_manager import SensorManager
 from .user_interface import UserInterface
@@ -68,11 +70,24 @@ class ApplicationFacade:
             self.logger.info("Rendering control panel page.")
             return render_template('control_panel.html')
 
+        @app.route('/metrics')
+        def metrics():
+            """Обработчик для метрик процесса.
+
+            Возвращает счетчики и гистограммы в текстовом формате Prometheus.
+            """
+            body, content_type = metrics_response()
+            return Response(body, content_type=content_type)
+
         # Другие маршруты и обработчики
 
         app.run(debug=True)
 
 if __name__ == '__main__':
+    # Окно профилирования клиента запускается переменной DRONE_PROFILE или сигналом SIGUSR2:
+    # у клиента нет авторизации, поэтому HTTP-маршрута для профилирования нет
+    profiler.install_signal_handler(tag="client")
+    profiler.start_from_env(tag="client")
     facade = ApplicationFacade()
     facade.initialize_components()
     facade.run()
@@ -0,0 +1,33 @@
+from abc import ABC, abstractmethod
+from metrics import REGISTRY, instrument_subclasses
+
+# Метрики устройств и видеопотока, общие для device_manager и Dev_mngr_with_requests
+DEVICE_PROCESS_SECONDS = REGISTRY.histogram("client_device_process_duration_seconds",
+                                            "Время обработки данных устройства", ("device",))
+FRAME_STAGE_SECONDS = REGISTRY.histogram("client_frame_stage_duration_seconds",
+                                         "Время этапов видеопотока: захват и кодирование кадра", ("stage",))
+FRAMES = REGISTRY.counter("client_frames", "Кадры, отправленные в видеопоток")
+
+
+class Device(ABC):
+    """Абстрактный класс для устройств."""
+
+    def __init_subclass__(cls, **kwargs):
+        # Время process_data каждого устройства попадает в DEVICE_PROCESS_SECONDS с меткой — именем класса
+        super().__init_subclass__(**kwargs)
+        instrument_subclasses(cls, "process_data", DEVICE_PROCESS_SECONDS)
+
+    @abstractmethod
+    def get_name(self):
+        """Возвращает имя устройства."""
+        pass
+
+    @abstractmethod
+    def initialize(self):
+        """Инициализация устройства."""
+        pass
+
+    @abstractmethod
+    def process_data(self):
+        """Обработка данных устройства."""
+        pass
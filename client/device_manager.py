@@ -1,14 +1,13 @@
-from abc import ABC, abstractmethod
 import logging
-import cv2
 import subprocess
 from flask import Flask, Response, render_template
+import profiler
+from metrics import metrics_response, timer
+from .device_base import FRAME_STAGE_SECONDS, FRAMES, Device
 
 
 app = Flask(__name__)
 
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
 class DeviceManager:
     """Менеджер для управления устройствами, такими как камеры."""
 
@@ -21,7 +20,7 @@ class DeviceManager:
     def register_device(self, device):
         """Регистрация нового устройства."""
         self.devices.append(device)
-        self.logger.info(f"Device {device.get_name()} registered.")
+        self.logger.info("Device %s registered.", device.get_name())
 
     def initialize_devices(self):
         """Инициализация всех зарегистрированных устройств."""
@@ -50,36 +49,22 @@ class DeviceManager:
 
     def video_stream(self):
         """Генерирует поток видео кадров."""
+        import cv2  # OpenCV загружается при первом использовании камеры, а не при импорте модуля
         self.logger.info("Начинаю трансляцию видео.")
         if self.camera_device is not None and self.camera_device.capture.isOpened():
             while True:
-                ret, frame = self.camera_device.capture.read()
+                with timer(FRAME_STAGE_SECONDS, "capture"):
+                    ret, frame = self.camera_device.capture.read()
                 if not ret:
                     self.logger.warning("Не удалось получить кадр.")
                     break
-                ret, buffer = cv2.imencode('.jpg', frame)
+                with timer(FRAME_STAGE_SECONDS, "encode"):
+                    ret, buffer = cv2.imencode('.jpg', frame)
                 frame = buffer.tobytes()
+                FRAMES.inc()
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
-class Device(ABC):
-    """Абстрактный класс для устройств."""
-
-    @abstractmethod
-    def get_name(self):
-        """Возвращает имя устройства."""
-        pass
-
-    @abstractmethod
-    def initialize(self):
-        """Инициализация устройства."""
-        pass
-
-    @abstractmethod
-    def process_data(self):
-        """Обработка данных устройства."""
-        pass
-
 class Camera(Device):
     """Класс, представляющий камеру."""
 
@@ -95,6 +80,7 @@ class Camera(Device):
 
     def initialize(self):
         """Инициализация камеры и настройка потокового видео."""
+        import cv2
         self.logger.info("Инициализирую камеру.")
         self.capture = cv2.VideoCapture(0)
         if not self.capture.isOpened():
@@ -122,7 +108,7 @@ class Camera(Device):
             "-f", output_format,
             self.address
         ]
-        self.logger.debug(f"FFmpeg settings: {settings}")
+        self.logger.debug("FFmpeg settings: %s", settings)
         self.ffmpeg = subprocess.Popen(settings, stdin=subprocess.PIPE)
         self.logger.info("Камера инициализирована.")
 
@@ -176,6 +162,11 @@ def video_feed():
     return Response(device_manager.video_stream(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/metrics')
+def metrics():
+    body, content_type = metrics_response()
+    return Response(body, content_type=content_type)
+
 @app.route('/start')
 def start():
     logging.info("Starting video capture via HTTP request.")
@@ -188,5 +179,11 @@ def stop():
     device_manager.stop_video_capture()
     return "Захват видео завершен."
 
+# Запуск из корня репозитория: python -m client.device_manager
 if __name__ == '__main__':
+    from .logging_config import setup_logging
+
+    setup_logging(logging.DEBUG)
+    profiler.install_signal_handler(tag="video")
+    profiler.start_from_env(tag="video")
     app.run(debug=True)
@@ -1,8 +1,6 @@
 import logging
 from abc import ABC, abstractmethod
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Abstract Base Class
@@ -67,9 +65,9 @@ class AnemometerDevice(Device):
 # Decorator for logging execution
 def log_execution(func):
     def wrapper(*args, **kwargs):
-        logger.info(f"Executing {func.__name__}")
+        logger.info("Executing %s", func.__name__)
         result = func(*args, **kwargs)
-        logger.info(f"Finished executing {func.__name__}")
+        logger.info("Finished executing %s", func.__name__)
         return result
     return wrapper
 
@@ -87,8 +85,11 @@ class DeviceFactory:
             return AnemometerDevice()
         else:raise ValueError(f"Unknown device type: {device_type}")
 
-# Testing functionality
+# Testing functionality. Запуск из корня репозитория: python -m client.devices
 if __name__ == "__main__":
+    from .logging_config import setup_logging
+
+    setup_logging()
     try:
         # Create devices using the factory
         camera = DeviceFactory.create_device("camera")
@@ -115,4 +116,4 @@ if __name__ == "__main__":
         logger.info("Anemometer telemetry: %s", anemometer.get_telemetry())
 
     except Exception as e:
-        logger.error(f"An error occurred: {e}")
\ No newline at end of file
+        logger.error("An error occurred: %s", e)
\ No newline at end of file
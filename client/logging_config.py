@@ -1,49 +1,210 @@
+import atexit
+import itertools
 import logging
-import logging.config
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Отдельные файлы журналов для логгеров: {имя логгера: файл}
+DEFAULT_LOG_FILES = {'security': 'security.log'}
+
+# Частые сообщения горячего пути и доля, с которой они попадают в журнал: пишется 1 из N
+DEFAULT_SAMPLING = {
+    "Кадр успешно обработан.": 100,
+    "Обрабатываю данные с камеры.": 100,
+}
+
+# Типы аргументов, которые можно передать в поток журнала без форматирования:
+# они неизменяемы, поэтому сообщение в потоке журнала совпадет с моментом вызова
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Фильтр, пропускающий 1 из N записей для частых сообщений.
+
+    Записи сравниваются по шаблону сообщения (record.msg), поэтому логирование должно
+    использовать %-форматирование: logger.info("Кадр %d", n), а не f-строки.
+    Пропущенная запись отбрасывается до постановки в очередь и форматирования.
+
+    Args:
+        rates (dict): Словарь {шаблон сообщения: N}.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counters = {message: itertools.count() for message in self.rates}
+
+    def filter(self, record):
+        counter = self._counters.get(record.msg)
+        if counter is None:
+            return True
+        # next() у itertools.count атомарен под GIL, блокировка не нужна
+        return next(counter) % self.rates[record.msg] == 0
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не форматирует сообщение в потоке вызывающего кода.
+
+    Стандартный QueueHandler.prepare подставляет аргументы в сообщение до постановки
+    в очередь. Если все аргументы неизменяемы, запись передается как есть и
+    %-форматирование выполняется в потоке QueueListener. Записи с изменяемыми
+    аргументами или исключением готовятся стандартно.
+    """
+
+    def prepare(self, record):
+        if record.exc_info or record.stack_info:
+            return super().prepare(record)
+        args = record.args
+        if isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args):
+            return record
+        return super().prepare(record)
+
+
+def _file_handler(filename, formatter, level, logger_name=None):
+    handler = logging.FileHandler(filename, encoding='utf-8', delay=True)
+    handler.setFormatter(formatter)
+    handler.setLevel(level)
+    if logger_name:
+        handler.addFilter(logging.Filter(logger_name))
+    return handler
+
 
 def setup_logging(
     default_level=logging.INFO,
     log_file='app.log',
-    log_format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'):
+    log_format=DEFAULT_FORMAT,
+    log_files=None,
+    sampling=None,
+    console=True):
     """
-    Настройка конфигурации логирования.
+    Настройка единой асинхронной подсистемы логирования.
+
+    Корневой логгер получает единственный обработчик DeferredQueueHandler: вызов
+    логгера только кладет запись в очередь, а запись в консоль и файлы выполняет
+    поток QueueListener. Повторный вызов заменяет предыдущую конфигурацию.
+    Логгеры с отдельными файлами (log_files) получают уровень DEBUG: в их файл
+    пишутся все записи, а в общий журнал и консоль — от default_level.
 
     Args:
         default_level (int): Уровень логирования по умолчанию. Использует значения из модуля logging, такие как logging.INFO.
         log_file (str): Имя файла, в который будет записываться лог.
         log_format (str): Формат строки логирования.
+        log_files (dict): Дополнительные файлы {имя логгера: файл}. По умолчанию DEFAULT_LOG_FILES.
+        sampling (dict): Прореживание частых сообщений {шаблон: N}. По умолчанию DEFAULT_SAMPLING.
+        console (bool): Выводить ли журнал в консоль.
+
+    Returns:
+        logging.handlers.QueueListener: Запущенный поток записи журнала.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = logging.Formatter(log_format)
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(default_level)
+        handlers.append(console_handler)
+    if log_file:
+        handlers.append(_file_handler(log_file, formatter, default_level))
+    for logger_name, filename in (DEFAULT_LOG_FILES if log_files is None else log_files).items():
+        handlers.append(_file_handler(filename, formatter, logging.DEBUG, logger_name))
+        # Иначе логгер наследует уровень корневого и DEBUG-записи не доходят до своего файла
+        logging.getLogger(logger_name).setLevel(logging.DEBUG)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(DEFAULT_SAMPLING if sampling is None else sampling))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(default_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Дописывает записи из очереди и останавливает поток журнала."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def measure_overhead(calls=10000, directory=None):
     """
-    logging_config = {
-        'version': 1,
-        'formatters': {
-            'default': {
-                'format': log_format,
-            },
-        },
-        'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-                'formatter': 'default',
-                'level': default_level,
-            },
-            'file': {
-                'class': 'logging.FileHandler',
-                'filename': log_file,
-                'formatter': 'default',
-                'level': default_level,
-            },
-        },
-        'root': {
-            'handlers': ['console', 'file'],
-            'level': default_level,
-        },
-    }
-
-    # Применение конфигурации логирования из словаря.
-    logging.config.dictConfig(logging_config)
+    Измеряет среднее время вызова логгера в потоке вызывающего кода.
+
+    Сравниваются синхронная запись в файл, запись через очередь и через очередь
+    с прореживанием 1 из 100. Время дописывания очереди потоком журнала не входит
+    в замер: именно эту работу подсистема убирает с горячего пути.
+
+    Args:
+        calls (int): Количество вызовов в каждом замере.
+        directory (str): Каталог для временных файлов журнала.
+
+    Returns:
+        dict: Время одного вызова в микросекундах по вариантам.
+    """
+    directory = directory or tempfile.mkdtemp()
+    formatter = logging.Formatter(DEFAULT_FORMAT)
+    results = {}
+
+    def timed(name, handler, message="Кадр %d обработан, задержка %.3f мс"):
+        logger = logging.getLogger(f"overhead.{name}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        started = time.perf_counter()
+        for i in range(calls):
+            logger.info(message, i, 1.5)
+        results[name] = (time.perf_counter() - started) / calls * 1e6
+        logger.removeHandler(handler)
+
+    sync_handler = logging.FileHandler(os.path.join(directory, 'sync.log'), encoding='utf-8')
+    sync_handler.setFormatter(formatter)
+    timed('sync', sync_handler)
+    sync_handler.close()
+
+    for name, sampling in (('queued', {}), ('sampled', {"Кадр %d обработан, задержка %.3f мс": 100})):
+        file_handler = logging.FileHandler(os.path.join(directory, f'{name}.log'), encoding='utf-8')
+        file_handler.setFormatter(formatter)
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(sampling))
+        timed(name, queue_handler)
+        # Очередь дописывается после замера: поток журнала не конкурирует с замеряемым за GIL
+        listener = logging.handlers.QueueListener(log_queue, file_handler)
+        listener.start()
+        listener.stop()
+        file_handler.close()
+    return results
+
 
 # Пример использования
 if __name__ == '__main__':
     setup_logging()  # Настройка логирования с параметрами по умолчанию.
     logger = logging.getLogger(__name__)  # Получение логгера для текущего модуля.
     logger.info("Logger is set up and ready to use!")  # Запись информационного сообщения в лог.
+    for variant, overhead in measure_overhead().items():
+        logger.info("Накладные расходы логирования (%s): %.2f мкс на вызов", variant, overhead)
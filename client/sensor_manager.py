@@ -1,11 +1,22 @@
 from abc import ABC, abstractmethod
 
+from metrics import REGISTRY, instrument_subclasses
+
+SENSOR_READ_SECONDS = REGISTRY.histogram("client_sensor_read_duration_seconds", "Время чтения показаний сенсора",
+                                         ("sensor",))
+SENSORS = REGISTRY.gauge("client_sensors", "Количество сенсоров, подключенных к SensorManager")
+
 
 class Sensor(ABC):
     """
     Абстрактный класс для сенсора.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        # Время read_data каждого сенсора попадает в SENSOR_READ_SECONDS с меткой — именем класса
+        super().__init_subclass__(**kwargs)
+        instrument_subclasses(cls, "read_data", SENSOR_READ_SECONDS)
+
     @abstractmethod
     def read_data(self):
         pass
@@ -63,9 +74,11 @@ class SensorManager:
 
     def add_sensor(self, sensor):
         self.sensors.append(sensor)
+        SENSORS.inc()
 
     def remove_sensor(self, sensor):
         self.sensors.remove(sensor)
+        SENSORS.dec()
 
     def add_observer(self, observer):
         self.observers.append(observer)
@@ -0,0 +1,182 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Стоимость недопустимого назначения; конечна, чтобы не ломать арифметику потенциалов
+INFEASIBLE_COST = 1e12
+
+
+def sensor_masks(sensor_lists, vocabulary):
+    """
+    Кодирует списки сенсоров битовыми масками.
+
+    Args:
+        sensor_lists (list): Списки названий сенсоров.
+        vocabulary (dict): Словарь {название сенсора: номер бита}, дополняется новыми названиями.
+
+    Returns:
+        numpy.ndarray: Массив масок типа uint64.
+    """
+    masks = np.zeros(len(sensor_lists), dtype=np.uint64)
+    for i, sensors in enumerate(sensor_lists):
+        mask = 0
+        for sensor in sensors:
+            mask |= 1 << vocabulary.setdefault(sensor, len(vocabulary))
+        masks[i] = mask
+    return masks
+
+
+def build_cost_matrix(mission_starts, drone_positions, mission_sensors=None, drone_sensors=None,
+                      energy=None, distance_weight: float = 1.0, energy_weight: float = 1.0):
+    """
+    Строит матрицу стоимостей назначения M миссий на N дронов.
+
+    Args:
+        mission_starts (array-like): Начальные точки миссий (x, y), форма (M, 2).
+        drone_positions (array-like): Позиции дронов (x, y), форма (N, 2).
+        mission_sensors (list, optional): Требуемые сенсоры для каждой миссии.
+        drone_sensors (list, optional): Сенсоры каждого дрона.
+        energy (array-like, optional): Предсказанный расход энергии, форма (M, N). np.inf — план невыполним.
+        distance_weight (float, optional): Вес расстояния до старта. По умолчанию 1.0.
+        energy_weight (float, optional): Вес расхода энергии. По умолчанию 1.0.
+
+    Returns:
+        numpy.ndarray: Матрица стоимостей формы (M, N), недопустимые пары равны INFEASIBLE_COST.
+    """
+    starts = np.asarray(mission_starts, dtype=np.float64).reshape(-1, 2)
+    positions = np.asarray(drone_positions, dtype=np.float64).reshape(-1, 2)
+    deltas = starts[:, None, :] - positions[None, :, :]
+    cost = distance_weight * np.hypot(deltas[..., 0], deltas[..., 1])
+    if energy is not None:
+        cost = cost + energy_weight * np.asarray(energy, dtype=np.float64)
+    if mission_sensors is not None and drone_sensors is not None:
+        vocabulary = {}
+        required = sensor_masks(mission_sensors, vocabulary)
+        available = sensor_masks(drone_sensors, vocabulary)
+        missing = required[:, None] & ~available[None, :]
+        cost = np.where(missing == 0, cost, INFEASIBLE_COST)
+    return np.where(np.isfinite(cost), np.minimum(cost, INFEASIBLE_COST), INFEASIBLE_COST)
+
+
+# Решатель задачи о назначениях (венгерский алгоритм с кратчайшими дополняющими путями)
+class AssignmentSolver:
+    """
+    Оптимальное назначение миссий (строки) на дроны (столбцы).
+
+    Реализует венгерский алгоритм в форме последовательных кратчайших
+    дополняющих путей: каждая строка добавляется за O(N) векторизованных шагов
+    NumPy, всего O(M^2 N). Потенциалы строк и столбцов сохраняются после решения,
+    поэтому при выбытии дрона переназначается только его миссия одним
+    дополняющим путем, без полного пересчета.
+
+    Если миссий больше, чем дронов, часть миссий остается без назначения.
+
+    Args:
+        cost (array-like): Матрица стоимостей формы (M, N).
+    """
+
+    def __init__(self, cost):
+        self.cost = np.array(cost, dtype=np.float64)
+        self._transposed = self.cost.shape[0] > self.cost.shape[1]
+        self._matrix = self.cost.T.copy() if self._transposed else self.cost.copy()
+        self._removed_rows = set()
+        self._reset()
+
+    def _reset(self):
+        rows, cols = self._matrix.shape
+        self._u = np.zeros(rows + 1)
+        self._v = np.zeros(cols + 1)
+        self._p = np.zeros(cols + 1, dtype=np.int64)  # _p[j] — строка, занявшая столбец j (1-based)
+        self._removed = np.zeros(cols, dtype=bool)
+
+    def solve(self):
+        """
+        Находит назначение минимальной суммарной стоимости.
+
+        Returns:
+            dict: Словарь {индекс миссии: индекс дрона} без недопустимых пар.
+        """
+        for row in range(1, self._matrix.shape[0] + 1):
+            if row not in self._removed_rows:
+                self._augment(row)
+        return self.assignment()
+
+    def remove_drone(self, drone):
+        """
+        Исключает дрон и переназначает его миссию, сохраняя оптимальность.
+
+        Args:
+            drone (int): Индекс выбывшего дрона.
+
+        Returns:
+            dict: Обновленное назначение {индекс миссии: индекс дрона}. Если свободных
+            дронов не осталось, миссия выбывшего дрона остается без назначения.
+        """
+        self.cost[:, drone] = INFEASIBLE_COST
+        if self._transposed:
+            # Строки транспонированной задачи — дроны: решаем заново без выбывшей строки
+            self._removed_rows.add(drone + 1)
+            self._reset()
+            return self.solve()
+        col = drone + 1
+        self._matrix[:, drone] = INFEASIBLE_COST
+        self._removed[drone] = True
+        row = int(self._p[col])
+        self._p[col] = 0
+        if row:
+            self._augment(row)
+        return self.assignment()
+
+    def assignment(self):
+        result = {}
+        for col in np.nonzero(self._p[1:])[0]:
+            row = int(self._p[col + 1]) - 1
+            mission, drone = (int(col), row) if self._transposed else (row, int(col))
+            if self.cost[mission, drone] < INFEASIBLE_COST:
+                result[mission] = drone
+        return dict(sorted(result.items()))
+
+    def total_cost(self):
+        return float(sum(self.cost[mission, drone] for mission, drone in self.assignment().items()))
+
+    def _augment(self, row):
+        matrix, u, v, p = self._matrix, self._u, self._v, self._p
+        cols = matrix.shape[1]
+        minv = np.full(cols + 1, np.inf)
+        way = np.zeros(cols + 1, dtype=np.int64)
+        used = np.zeros(cols + 1, dtype=bool)
+        # Выбывшие столбцы не участвуют в поиске пути
+        used[1:] = self._removed
+        if used[1:].all():
+            return
+        p[0] = row
+        j0 = 0
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = matrix[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            if not np.isfinite(candidates[j1 - 1]):
+                # Свободных столбцов не осталось: строка остается без назначения
+                p[0] = 0
+                return
+            delta = candidates[j1 - 1]
+            used_rows = p[used]
+            np.add.at(u, used_rows, delta)
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+        p[0] = 0
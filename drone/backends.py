@@ -0,0 +1,533 @@
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+import math
+import time
+from importlib import metadata
+
+from clock import IClock, RealClock
+from metrics import REGISTRY, timer
+
+logger = logging.getLogger(__name__)
+
+# Группа точек входа для бэкендов из сторонних пакетов:
+#     [project.entry-points."drone.backends"]
+#     px4 = "px4_backend:PX4Backend"
+ENTRY_POINT_GROUP = "drone.backends"
+
+BACKEND_COMMAND_SECONDS = REGISTRY.histogram("drone_backend_command_duration_seconds",
+                                             "Время выполнения команд бэкендами дронов", ("backend", "command"))
+
+# Команды, общие для всех бэкендов, и их параметры
+COMMANDS = {
+    "takeoff": ("altitude",),
+    "land": (),
+    "move_forward": ("distance",),
+    "turn": ("degree",),
+    "goto": ("x", "y", "altitude"),
+    "return_to_base": (),
+}
+
+# Производители из DRONE_DATABASE и их бэкенды
+MANUFACTURER_BACKENDS = {"dji": "mavlink", "airsim": "airsim", "simulator": "simulator"}
+
+# Общая нагрузка для сравнения бэкендов: (команда, параметры)
+STANDARD_WORKLOAD = (
+    ("takeoff", {"altitude": 10}),
+    ("move_forward", {"distance": 20}),
+    ("turn", {"degree": 90}),
+    ("move_forward", {"distance": 20}),
+    ("goto", {"x": 0, "y": 0, "altitude": 15}),
+    ("return_to_base", {}),
+    ("land", {}),
+)
+
+
+class BackendError(Exception):
+    """Ошибка бэкенда: нет подключения или команда недопустима в текущем состоянии дрона."""
+
+
+class DroneBackend(ABC):
+    """
+    Асинхронный интерфейс бэкенда управления дроном.
+
+    Бэкенд создается без подключения, поэтому проверка поддержки производителя
+    не обращается к симулятору или аппарату. Шаблонный метод send_command
+    проверяет команду, замеряет ее в BACKEND_COMMAND_SECONDS и передает
+    реализации _send, поэтому бэкенды сравниваются на одной нагрузке по одной метрике.
+
+    Args:
+        connect_uri (str, optional): URI для подключения. По умолчанию None.
+    """
+    name = None
+
+    def __init__(self, connect_uri: str = None):
+        self.client = None
+        self.connect_uri = connect_uri
+
+    @abstractmethod
+    async def connect(self):
+        """
+        Подключается к дрону или симулятору.
+        """
+        pass
+
+    async def close(self):
+        """
+        Закрывает подключение.
+        """
+        self.client = None
+
+    async def send_command(self, command: str, **params):
+        """
+        Отправляет дрону команду из COMMANDS и ждет ее выполнения.
+
+        Args:
+            command (str): Имя команды.
+            **params: Параметры команды.
+        """
+        expected = COMMANDS.get(command)
+        if expected is None:
+            raise ValueError(f"Неизвестная команда: {command}")
+        unknown = set(params) - set(expected)
+        if unknown:
+            raise ValueError(f"Команда {command} не принимает параметры: {', '.join(sorted(unknown))}")
+        with timer(BACKEND_COMMAND_SECONDS, self.name, command):
+            return await self._send(command, params)
+
+    @abstractmethod
+    async def _send(self, command: str, params: dict):
+        pass
+
+    @abstractmethod
+    async def get_telemetry(self) -> dict:
+        """
+        Возвращает телеметрию: x, y, altitude (м), heading (град), battery (%), in_air.
+        """
+        pass
+
+    @abstractmethod
+    async def get_image(self):
+        """
+        Снимает кадр камерой дрона.
+
+        Returns:
+            bytes | str: Закодированное изображение или путь к снимку на борту,
+            если протокол не передает кадр.
+        """
+        pass
+
+
+BACKENDS = {}
+_entry_points_loaded = False
+
+
+def register_backend(name: str):
+    """
+    Декоратор: регистрирует класс бэкенда под именем name (без учета регистра).
+    """
+    def decorator(cls):
+        cls.name = name.lower()
+        BACKENDS[cls.name] = cls
+        return cls
+    return decorator
+
+
+def load_entry_points():
+    """
+    Регистрирует бэкенды из точек входа группы ENTRY_POINT_GROUP установленных пакетов.
+
+    Встроенные бэкенды не переопределяются. Ошибка загрузки одного бэкенда
+    логируется и не мешает остальным.
+    """
+    global _entry_points_loaded
+    _entry_points_loaded = True
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        name = entry_point.name.lower()
+        if name in BACKENDS:
+            continue
+        try:
+            cls = entry_point.load()
+        except Exception as e:
+            logger.error("Не удалось загрузить бэкенд %s (%s): %s", name, entry_point.value, e)
+            continue
+        register_backend(name)(cls)
+
+
+def available_backends() -> list:
+    """
+    Возвращает имена зарегистрированных бэкендов, включая точки входа.
+    """
+    if not _entry_points_loaded:
+        load_entry_points()
+    return sorted(BACKENDS)
+
+
+def get_backend(name: str, connect_uri: str = None, **options) -> DroneBackend:
+    """
+    Создает бэкенд по имени без подключения.
+
+    Args:
+        name (str): Имя бэкенда без учета регистра: airsim, mavlink, simulator или из точки входа.
+        connect_uri (str, optional): URI для подключения.
+        **options: Параметры конструктора бэкенда.
+
+    Returns:
+        DroneBackend: Бэкенд без подключения.
+    """
+    cls = BACKENDS.get(name.lower())
+    if cls is None and not _entry_points_loaded:
+        load_entry_points()
+        cls = BACKENDS.get(name.lower())
+    if cls is None:
+        raise ValueError(f"Неизвестный бэкенд: {name}")
+    return cls(connect_uri, **options)
+
+
+def backend_for_manufacturer(manufacturer: str, connect_uri: str = None, **options):
+    """
+    Создает бэкенд для производителя из MANUFACTURER_BACKENDS.
+
+    Returns:
+        DroneBackend: Бэкенд или None, если производитель не поддерживается.
+    """
+    name = MANUFACTURER_BACKENDS.get(manufacturer.lower())
+    return get_backend(name, connect_uri, **options) if name is not None else None
+
+
+async def run_workload(backend: DroneBackend, workload=STANDARD_WORKLOAD) -> list:
+    """
+    Выполняет нагрузку на подключенном бэкенде.
+
+    Args:
+        backend (DroneBackend): Подключенный бэкенд.
+        workload (list, optional): Последовательность (команда, параметры). По умолчанию STANDARD_WORKLOAD.
+
+    Returns:
+        list: Время выполнения каждой команды в секундах.
+    """
+    durations = []
+    for command, params in workload:
+        started = time.perf_counter()
+        await backend.send_command(command, **params)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+@register_backend("simulator")
+class SimulatorBackend(DroneBackend):
+    """
+    Бэкенд-симулятор, работающий в процессе без AirSim и аппарата.
+
+    Кинематическая модель: полет с постоянной скоростью, набор высоты с постоянной
+    вертикальной скоростью, поворот с постоянной угловой скоростью и разряд батареи
+    пропорционально времени в воздухе. Длительность команд выдерживается через часы,
+    поэтому с VirtualClock нагрузка выполняется мгновенно и воспроизводимо.
+
+    Args:
+        connect_uri (str, optional): Не используется, принимается для единообразия.
+        clock (IClock, optional): Часы для задержек. По умолчанию RealClock.
+        speed (float, optional): Горизонтальная скорость, м/с.
+        climb_rate (float, optional): Вертикальная скорость, м/с.
+        yaw_rate (float, optional): Угловая скорость, град/с.
+        battery_wh (float, optional): Емкость батареи, Вт·ч.
+        power_w (float, optional): Потребляемая в воздухе мощность, Вт.
+        link_latency (float, optional): Задержка канала связи на каждую команду, с.
+        image_size (tuple, optional): Размер синтетического кадра (ширина, высота).
+    """
+
+    def __init__(self, connect_uri: str = None, clock: IClock = None, speed: float = 10.0, climb_rate: float = 3.0,
+                 yaw_rate: float = 90.0, battery_wh: float = 80.0, power_w: float = 150.0,
+                 link_latency: float = 0.0, image_size=(64, 48)):
+        super().__init__(connect_uri)
+        self.clock = clock or RealClock()
+        self.speed = speed
+        self.climb_rate = climb_rate
+        self.yaw_rate = yaw_rate
+        self.battery_wh = battery_wh
+        self.power_w = power_w
+        self.link_latency = link_latency
+        self.image_size = image_size
+        self.x = self.y = self.altitude = self.heading = 0.0
+        self.energy_wh = battery_wh
+        self.in_air = False
+
+    async def connect(self):
+        await self.clock.sleep(self.link_latency)
+        self.client = self
+        logger.info("Подключение к симулятору")
+
+    async def _send(self, command, params):
+        if self.client is None:
+            raise BackendError("Симулятор не подключен")
+        if command != "takeoff" and not self.in_air:
+            raise BackendError(f"Команда {command} недоступна: дрон на земле")
+        if command == "takeoff":
+            duration = abs(params.get("altitude", 10.0) - self.altitude) / self.climb_rate
+            self.altitude = params.get("altitude", 10.0)
+            self.in_air = True
+        elif command == "land":
+            duration = self.altitude / self.climb_rate
+        elif command == "move_forward":
+            distance = params["distance"]
+            duration = abs(distance) / self.speed
+            self.x += distance * math.cos(math.radians(self.heading))
+            self.y += distance * math.sin(math.radians(self.heading))
+        elif command == "turn":
+            duration = abs(params["degree"]) / self.yaw_rate
+            self.heading = (self.heading + params["degree"]) % 360.0
+        else:
+            x, y = (params["x"], params["y"]) if command == "goto" else (0.0, 0.0)
+            altitude = params.get("altitude", self.altitude)
+            duration = math.hypot(x - self.x, y - self.y) / self.speed + abs(altitude - self.altitude) / self.climb_rate
+            self.x, self.y, self.altitude = x, y, altitude
+        await self.clock.sleep(self.link_latency + duration)
+        # Батарея разряжается, пока дрон в воздухе, в том числе на посадке
+        self.energy_wh = max(0.0, self.energy_wh - self.power_w * duration / 3600.0)
+        if command == "land":
+            self.altitude = 0.0
+            self.in_air = False
+
+    async def get_telemetry(self) -> dict:
+        if self.client is None:
+            raise BackendError("Симулятор не подключен")
+        return {"x": self.x, "y": self.y, "altitude": self.altitude, "heading": self.heading,
+                "battery": 100.0 * self.energy_wh / self.battery_wh, "in_air": self.in_air,
+                "timestamp": self.clock.now()}
+
+    async def get_image(self) -> bytes:
+        """
+        Возвращает синтетический кадр в формате PPM (P6): градиент, зависящий от положения дрона.
+        """
+        if self.client is None:
+            raise BackendError("Симулятор не подключен")
+        width, height = self.image_size
+        shift = int(self.x + self.y) & 0xFF
+        row = bytes(value for column in range(width) for value in ((column * 4 + shift) & 0xFF, shift, 128))
+        return f"P6 {width} {height} 255\n".encode("ascii") + row * height
+
+
+@register_backend("airsim")
+class AirSimBackend(DroneBackend):
+    """
+    Бэкенд AirSim. Блокирующие вызовы клиента airsim выполняются в потоке, чтобы не
+    останавливать цикл событий.
+
+    Args:
+        connect_uri (str, optional): Адрес сервера AirSim. По умолчанию локальный.
+        speed (float, optional): Скорость перемещения, м/с.
+        yaw_rate (float, optional): Угловая скорость поворота, град/с.
+    """
+
+    def __init__(self, connect_uri: str = None, speed: float = 5.0, yaw_rate: float = 45.0):
+        super().__init__(connect_uri)
+        self.speed = speed
+        self.yaw_rate = yaw_rate
+
+    async def connect(self):
+        import airsim
+        self.client = airsim.MultirotorClient(**({"ip": self.connect_uri} if self.connect_uri else {}))
+        try:
+            await asyncio.to_thread(self.client.confirmConnection)
+            await asyncio.to_thread(self.client.enableApiControl, True)
+            await asyncio.to_thread(self.client.armDisarm, True)
+            logger.info("Подключение через AirSim успешно")
+        except Exception as e:
+            logger.error("Ошибка подключения через AirSim: %s", e)
+            raise
+
+    async def close(self):
+        if self.client is not None:
+            await asyncio.to_thread(self.client.armDisarm, False)
+            await asyncio.to_thread(self.client.enableApiControl, False)
+        await super().close()
+
+    def _call(self, command, params):
+        client = self.client
+        if command == "takeoff":
+            client.takeoffAsync().join()
+            if "altitude" in params:
+                # Система координат NED: высота отрицательна
+                client.moveToZAsync(-params["altitude"], self.speed).join()
+        elif command == "land":
+            client.landAsync().join()
+        elif command == "move_forward":
+            distance = params["distance"]
+            client.moveByVelocityBodyFrameAsync(math.copysign(self.speed, distance), 0, 0,
+                                                abs(distance) / self.speed).join()
+        elif command == "turn":
+            degree = params["degree"]
+            client.rotateByYawRateAsync(math.copysign(self.yaw_rate, degree), abs(degree) / self.yaw_rate).join()
+        elif command == "goto":
+            client.moveToPositionAsync(params["x"], params["y"], -params["altitude"], self.speed).join()
+        else:
+            client.goHomeAsync().join()
+
+    async def _send(self, command, params):
+        if self.client is None:
+            raise BackendError("AirSim не подключен")
+        await asyncio.to_thread(self._call, command, params)
+
+    async def get_telemetry(self) -> dict:
+        if self.client is None:
+            raise BackendError("AirSim не подключен")
+        import airsim
+        state = await asyncio.to_thread(self.client.getMultirotorState)
+        position = state.kinematics_estimated.position
+        _, _, yaw = airsim.to_eularian_angles(state.kinematics_estimated.orientation)
+        return {"x": position.x_val, "y": position.y_val, "altitude": -position.z_val,
+                "heading": math.degrees(yaw) % 360.0, "battery": None,
+                "in_air": state.landed_state == airsim.LandedState.Flying, "timestamp": state.timestamp / 1e9}
+
+    async def get_image(self) -> bytes:
+        """
+        Возвращает кадр основной камеры в формате PNG.
+        """
+        if self.client is None:
+            raise BackendError("AirSim не подключен")
+        import airsim
+        responses = await asyncio.to_thread(self.client.simGetImages,
+                                            [airsim.ImageRequest("0", airsim.ImageType.Scene, False, True)])
+        return bytes(responses[0].image_data_uint8) if responses else None
+
+
+def _mavlink_channel():
+    # Канал MAVLink нужен только этому бэкенду и загружается при подключении
+    import mavlink_channel
+    return mavlink_channel
+
+
+@register_backend("mavlink")
+class MavLinkBackend(DroneBackend):
+    """
+    Бэкенд MAVLink (DJI и другие автопилоты). Команды с подтверждением отправляются
+    через MavlinkCommandChannel (COMMAND_LONG с ожиданием COMMAND_ACK и повторами),
+    перемещения — SET_POSITION_TARGET_LOCAL_NED, на который протокол не отвечает.
+
+    Args:
+        connect_uri (str): Строка подключения pymavlink, например udpin:0.0.0.0:14550.
+        heartbeat_timeout (float, optional): Таймаут ожидания HEARTBEAT при подключении, с.
+        transport (optional): Готовый транспорт канала, например LocalMavlinkVehicle;
+            тогда pymavlink не используется.
+        clock (IClock, optional): Часы таймеров повторов канала.
+        channel_options: Параметры MavlinkCommandChannel: ack_timeout, retries, mission_window.
+            Для соединений pymavlink mission_window по умолчанию 0: не все автопилоты
+            принимают точки миссии до запроса, окно включается для аппарата явно.
+    """
+
+    def __init__(self, connect_uri: str = None, heartbeat_timeout: float = 10.0, transport=None,
+                 clock: IClock = None, **channel_options):
+        super().__init__(connect_uri)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.transport = transport
+        self.clock = clock
+        self.channel_options = channel_options
+        self.channel = None
+
+    async def connect(self):
+        mavlink = _mavlink_channel()
+        if self.transport is None:
+            from pymavlink import mavutil
+            logger.debug("Попытка подключения к %s", self.connect_uri)
+            try:
+                connection = mavutil.mavlink_connection(self.connect_uri)
+                heartbeat = await asyncio.to_thread(connection.wait_heartbeat, timeout=self.heartbeat_timeout)
+            except Exception as e:
+                logger.error("Ошибка подключения к %s: %s", self.connect_uri, e)
+                raise
+            if heartbeat is None:
+                raise BackendError(f"Нет HEARTBEAT от {self.connect_uri} за {self.heartbeat_timeout} с")
+            self.transport = mavlink.PymavlinkTransport(connection)
+        self.client = self.transport
+        options = dict(self.channel_options)
+        if isinstance(self.transport, mavlink.PymavlinkTransport):
+            options.setdefault("mission_window", 0)
+        self.channel = mavlink.MavlinkCommandChannel(self.transport, self.clock, **options)
+        self.channel.start()
+        logger.info("Соединение по MAVLink установлено")
+
+    async def close(self):
+        if self.channel is not None:
+            await self.channel.close()
+            self.channel = None
+        if self.transport is not None:
+            self.transport.close()
+        await super().close()
+
+    async def _send(self, command, params):
+        mavlink = _mavlink_channel()
+        if self.channel is None:
+            raise BackendError("MAVLink не подключен")
+        if command == "takeoff":
+            await self.channel.command_long(mavlink.MAV_CMD_NAV_TAKEOFF, (0, 0, 0, 0, 0, 0, params.get("altitude", 10.0)))
+        elif command == "land":
+            await self.channel.command_long(mavlink.MAV_CMD_NAV_LAND)
+        elif command == "return_to_base":
+            await self.channel.command_long(mavlink.MAV_CMD_NAV_RETURN_TO_LAUNCH)
+        elif command == "turn":
+            degree = params["degree"]
+            # Параметры: угол, скорость (0 — по умолчанию), направление, относительный поворот
+            await self.channel.command_long(mavlink.MAV_CMD_CONDITION_YAW,
+                                            (abs(degree), 0, 1 if degree >= 0 else -1, 1))
+        else:
+            if command == "move_forward":
+                frame, position = mavlink.MAV_FRAME_BODY_OFFSET_NED, (params["distance"], 0, 0)
+            else:
+                frame, position = mavlink.MAV_FRAME_LOCAL_NED, (params["x"], params["y"], -params["altitude"])
+            # Маска типов: задана только позиция
+            self.transport.send("SET_POSITION_TARGET_LOCAL_NED", time_boot_ms=0,
+                                target_system=self.transport.target_system,
+                                target_component=self.transport.target_component, coordinate_frame=frame,
+                                type_mask=0b110111111000, x=position[0], y=position[1], z=position[2],
+                                vx=0, vy=0, vz=0, afx=0, afy=0, afz=0, yaw=0, yaw_rate=0)
+
+    async def upload_mission(self, waypoints, window: int = None):
+        """
+        Загружает миссию одним окном по протоколу MISSION_ITEM_INT.
+
+        Args:
+            waypoints (list): Точки (широта, долгота, высота над точкой взлета).
+            window (int, optional): Число точек, отправляемых без запроса аппарата.
+        """
+        mavlink = _mavlink_channel()
+        if self.channel is None:
+            raise BackendError("MAVLink не подключен")
+        await self.channel.upload_mission([mavlink.mission_item(*waypoint) for waypoint in waypoints],
+                                          window=window)
+
+    async def get_telemetry(self) -> dict:
+        """
+        Возвращает телеметрию из последних принятых сообщений; поля без данных равны None.
+        """
+        if self.channel is None:
+            raise BackendError("MAVLink не подключен")
+        position = self.channel.latest.get("LOCAL_POSITION_NED")
+        attitude = self.channel.latest.get("ATTITUDE")
+        status = self.channel.latest.get("SYS_STATUS")
+        return {"x": position.x if position else None, "y": position.y if position else None,
+                "altitude": -position.z if position else None,
+                "heading": math.degrees(attitude.yaw) % 360.0 if attitude else None,
+                "battery": status.battery_remaining if status else None,
+                "in_air": position is not None and position.z < -0.5, "timestamp": time.time()}
+
+    async def get_image(self, timeout: float = 30.0) -> str:
+        """
+        Запускает съемку и ждет CAMERA_IMAGE_CAPTURED: MAVLink передает путь к снимку, а не кадр.
+
+        Args:
+            timeout (float, optional): Сколько секунд ждать ответа камеры.
+
+        Returns:
+            str: Путь к снимку на борту или None, если камера не ответила за timeout секунд.
+        """
+        mavlink = _mavlink_channel()
+        if self.channel is None:
+            raise BackendError("MAVLink не подключен")
+        captured = asyncio.ensure_future(self.channel.wait_message("CAMERA_IMAGE_CAPTURED", timeout))
+        try:
+            await self.channel.command_long(mavlink.MAV_CMD_IMAGE_START_CAPTURE, (0, 0, 1))
+            response = await captured
+        finally:
+            # Если команда съемки завершилась ошибкой, ожидание снимка не остается висеть в цикле
+            captured.cancel()
+        return response.file_path if response is not None else None
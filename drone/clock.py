@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+import asyncio
+import heapq
+import itertools
+import time
+
+# Сколько проходов цикла событий часы уступают готовым задачам перед сдвигом времени
+ADVANCE_DEFERRALS = 16
+
+
+# Интерфейс часов, через который пакет drone получает время и выполняет задержки
+class IClock(ABC):
+    """
+    Абстракция времени для команд и миссий. Позволяет подменять реальные задержки
+    виртуальными, чтобы симуляции миссий выполнялись мгновенно и воспроизводимо.
+    """
+
+    @abstractmethod
+    def now(self) -> float:
+        """
+        Возвращает текущее время часов в секундах.
+        """
+        pass
+
+    @abstractmethod
+    async def sleep(self, delay: float):
+        """
+        Асинхронная задержка на заданное количество секунд.
+        :param delay: Длительность задержки в секундах.
+        """
+        pass
+
+
+# Часы реального времени, поведение совпадает с asyncio.sleep
+class RealClock(IClock):
+    def now(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, delay: float):
+        await asyncio.sleep(delay)
+
+
+# Часы виртуального времени: задержки не ждут, а сдвигают внутреннее время
+class VirtualClock(IClock):
+    """
+    Часы виртуального времени для тестов и симуляций.
+
+    Каждый вызов sleep регистрирует ожидающую задачу со сроком пробуждения.
+    Планировщик часов пропускает ADVANCE_DEFERRALS проходов цикла событий, чтобы
+    готовые задачи успели зарегистрировать свои задержки, затем мгновенно сдвигает
+    время к ближайшему сроку и пробуждает все задачи с этим сроком. Порядок
+    пробуждения задач с одинаковым сроком совпадает с порядком вызова sleep.
+    Число проходов ограничено, поэтому задачи, которые не ждут часов (опрос через
+    asyncio.sleep(0), другие часы в том же цикле), не останавливают время.
+
+    Args:
+        start (float, optional): Начальное значение времени. По умолчанию 0.0.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._waiters = []  # Куча (срок, порядковый номер, future)
+        self._counter = itertools.count()
+        self._advance_scheduled = False
+
+    def now(self) -> float:
+        return self._now
+
+    async def sleep(self, delay: float):
+        if delay < 0:
+            raise ValueError(f"Задержка не может быть отрицательной: {delay}")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (self._now + delay, next(self._counter), future))
+        self._schedule_advance(loop)
+        await future
+
+    def advance(self, delay: float):
+        """
+        Сдвигает время вручную, пробуждая все задачи, срок которых наступил.
+        :param delay: На сколько секунд сдвинуть время.
+        """
+        if delay < 0:
+            raise ValueError(f"Нельзя сдвинуть время назад: {delay}")
+        deadline = self._now + delay
+        while self._waiters and self._waiters[0][0] <= deadline:
+            self._wake_next()
+        self._now = deadline
+
+    def _schedule_advance(self, loop):
+        if not self._advance_scheduled:
+            self._advance_scheduled = True
+            loop.call_soon(self._advance_to_next, loop, ADVANCE_DEFERRALS)
+
+    def _advance_to_next(self, loop, deferrals: int):
+        # Каждый проход цикла выполняет обратные вызовы, готовые до него: задача, созданная
+        # в этот момент времени, успевает зарегистрировать свою задержку до сдвига
+        if deferrals:
+            loop.call_soon(self._advance_to_next, loop, deferrals - 1)
+            return
+        self._advance_scheduled = False
+        # Отменённые ожидания не должны сдвигать время
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if not self._waiters:
+            return
+        self._wake_next()
+        if self._waiters:
+            self._schedule_advance(loop)
+
+    def _wake_next(self):
+        deadline = self._waiters[0][0]
+        self._now = max(self._now, deadline)
+        while self._waiters and self._waiters[0][0] == deadline:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
@@ -1,21 +1,28 @@
 import asyncio
 import sqlite3
 
+from metrics import REGISTRY, timed
+
+DB_SECONDS = REGISTRY.histogram("drone_db_query_duration_seconds", "Время запросов к базе данных", ("method",))
+
 
 class DatabaseAccess:
     def __init__(self, db_path):
         self.connection = sqlite3.connect(db_path)
 
+    @timed(DB_SECONDS, "get_drones")
     async def get_drones(self):
         cursor = self.connection.cursor()
         cursor.execute("SELECT * FROM drones")
         return cursor.fetchall()
 
+    @timed(DB_SECONDS, "save_mission_parameters")
     async def save_mission_parameters(self, parameters):
         cursor = self.connection.cursor()
         cursor.execute("INSERT INTO missions (params) VALUES (?)", (parameters,))
         self.connection.commit()
 
+    @timed(DB_SECONDS, "get_feedback")
     async def get_feedback(self, drone_id):
         cursor = self.connection.cursor()
         cursor.execute("SELECT feedback FROM feedback WHERE drone_id=?", (drone_id,))
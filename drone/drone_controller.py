@@ -1,24 +1,42 @@
 from abc import ABC, abstractmethod
 import asyncio
-import pygame
-from pygame import math
 import math
 import queue
 import threading
+from clock import IClock, RealClock
+from metrics import REGISTRY, instrument_subclasses
+
+COMMAND_SECONDS = REGISTRY.histogram("drone_command_duration_seconds", "Время выполнения команд дрона",
+                                     ("command",))
 
 
 # Класс для управления дроном, включает методы для выполнения основных команд
 class DroneController:
     """
     Класс для управления дроном. Содержит методы для взлета, движения вперед и поворотов.
+
+    Args:
+        clock (IClock, optional): Часы для имитации задержек. По умолчанию RealClock.
+        recorder (FlightRecorder, optional): Бортовой самописец для записи команд.
+        drone_id (str, optional): Идентификатор дрона в записях самописца.
     """
 
+    def __init__(self, clock: IClock = None, recorder=None, drone_id: str = ""):
+        self.clock = clock or RealClock()
+        self.recorder = recorder
+        self.drone_id = drone_id
+
+    def _record(self, channel: str, *values):
+        if self.recorder is not None:
+            self.recorder.record(self.drone_id, channel, values, timestamp=self.clock.now())
+
     async def takeoff(self):
         """
         Асинхронная команда для взлета дрона.
         """
         print('Дрон взлетает...')
-        await asyncio.sleep(1)  # Имитируем задержку
+        self._record("takeoff")
+        await self.clock.sleep(1)  # Имитируем задержку
 
     async def move_forward(self, distance: float):
         """
@@ -26,7 +44,8 @@ class DroneController:
         :param distance: Расстояние, на которое дрон должен пролететь вперед.
         """
         print(f"Летим вперед на {distance} метров")
-        await asyncio.sleep(1)  # Имитируем задержку
+        self._record("move_forward", distance)
+        await self.clock.sleep(1)  # Имитируем задержку
 
     async def turn(self, degree: float):
         """
@@ -34,10 +53,16 @@ class DroneController:
         :param degree: Угол поворота в градусах.
         """
         print(f"Поворачиваем на {degree} градусов")
-        await asyncio.sleep(1)  # Имитируем задержку
+        self._record("turn", degree)
+        await self.clock.sleep(1)  # Имитируем задержку
 
 # Интерфейс команды, определяет метод execute
 class ICommand(ABC):
+    def __init_subclass__(cls, **kwargs):
+        # Время выполнения каждой команды попадает в COMMAND_SECONDS с меткой — именем класса
+        super().__init_subclass__(**kwargs)
+        instrument_subclasses(cls, "execute", COMMAND_SECONDS)
+
     @abstractmethod
     async def execute(self):
         """
@@ -75,8 +100,11 @@ class Turn(ICommand):
         # Выполняет команду поворота на заданный угол
         await self.__drone.turn(self.__degree)
 
+# pygame нужен только симулятору и загружается при его создании: контроллер и команды
+# импортируются сервером и менеджером миссий без графической подсистемы
 class DroneSimulator:
     def __init__(self):
+        import pygame
         pygame.init()
         self.screen = pygame.display.set_mode((800, 600))
         pygame.display.set_caption("Drone Simulator")
@@ -86,6 +114,7 @@ class DroneSimulator:
         self.command_queue = queue.Queue()
 
     def draw(self):
+        import pygame
         self.screen.fill((255, 255, 255))
         pygame.draw.rect(self.screen, (0, 0, 255), self.drone_rect)
         pygame.display.flip()
@@ -104,6 +133,7 @@ class DroneSimulator:
 
 # Пример использования
 async def main():
+    import pygame
     drone = DroneController()
     simulator = DroneSimulator()
     takeoff_command = Takeoff(drone)
@@ -1,16 +1,30 @@
 from abc import ABC, abstractmethod
-import socket
-import airsim
-from pymavlink import mavutil
-from mission_manager import MissionManager
 import logging
+import os
+import sys
+import profiler
+from backends import AirSimBackend, DroneBackend, MavLinkBackend, backend_for_manufacturer
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Логирование настраивает точка входа (см. client.logging_config.setup_logging)
 logger = logging.getLogger(__name__)
 
-# Создание экземпляра MissionManager
-mission_manager = MissionManager()
+# Экземпляр MissionManager создается при первой передаче дронов (get_mission_manager).
+# Тяжелые зависимости (airsim, pymavlink, numpy) загружаются при первом использовании
+# соответствующего API или модели, поэтому импорт модуля не тянет симуляторы.
+_mission_manager = None
+
+
+def get_mission_manager():
+    """Возвращает общий экземпляр MissionManager, создавая его при первом вызове.
+
+    Returns:
+        MissionManager: Менеджер миссий.
+    """
+    global _mission_manager
+    if _mission_manager is None:
+        from mission_manager import MissionManager
+        _mission_manager = MissionManager()
+    return _mission_manager
 
 # Симулированная база данных дронов
 DRONE_DATABASE = [
@@ -110,91 +124,27 @@ class AirSimDroneFactory(DroneFactory):
         return DroneFlyweight(drone_id, model, manufacturer, sensors, max_speed, max_altitude, battery_capacity)
 
 
-# Абстрактный интерфейс для API управления дроном
-class IDroneAPI(ABC):
-    """
-    Attributes:
-        client: Клиент для подключения к дрону.
-        connect_uri (str): URI для подключения.
-    """
-
-    def __init__(self, connect_uri=None):
-        """Инициализирует экземпляр IDroneAPI.
-
-        Args:
-            connect_uri (str, optional): URI для подключения. По умолчанию None.
-        """
-        self.client = None
-        self.connect_uri = connect_uri
-
-    @abstractmethod
-    def connect(self):
-        """Подключается к дрону."""
-        pass
-
-    @abstractmethod
-    def send_command(self, command):
-        """Отправляет команду дрону.
-
-        Args:
-            command (str): Команда для отправки.
-        """
-        pass
-
-
-# Класс API для работы с AirSim
-class AirSimAPI(IDroneAPI):
-    def connect(self):
-        """Подключается к AirSim."""
-        self.client = airsim.MultirotorClient()
-        try:
-            self.client.confirmConnection()
-            logger.info("Подключение через AirSim успешно")
-        except Exception as e:
-            logger.error(f"Ошибка подключения через AirSim: {e}")
-            raise
-
-    def send_command(self, command):
-        logger.info(f"AirSim оправлена команда: {command}")
-
-# Класс API для работы с MAVLink
-class DJIDroneAPI(IDroneAPI):
-    def connect(self):
-        """Подключается к дрону DJI по заданному URI.
-        """
-        logger.debug(f"Попытка подключения к {self.connect_uri}")
-        try:
-            self.client = mavutil.mavlink_connection(self.connect_uri)
-            self.client.wait_heartbeat()
-            logger.info("Соединение с дроном DJI установлено")
-        except socket.gaierror as e:
-            logger.error(f"Ошибка получения адреса: {self.connect_uri} - {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Неожиданная ошибка: {e}")
-            raise
-
-    def send_command(self, command):
-        logger.info(f"DJI отправлена команда: {command}")
+# API управления дроном — общий асинхронный интерфейс бэкендов (см. backends.py).
+# Прежние имена сохранены для существующего кода.
+IDroneAPI = DroneBackend
+AirSimAPI = AirSimBackend
+DJIDroneAPI = MavLinkBackend
 
 
 # Фабрика для создания объектов API для дронов
 class DroneAPIFactory:
     @staticmethod
     def get_drone_api(manufacturer, connect_uri):
-        """Возвращает экземпляр соответствующего API в зависимости от заданного производителя.
+        """Возвращает бэкенд, зарегистрированный для производителя, без подключения к дрону.
 
         Args:
             manufacturer (str): Название производителя дрона.
             connect_uri (str): URI для подключения к дрону.
 
         Returns:
-            IDroneAPI: Экземпляр API для работы с дроном.
+            DroneBackend or None: Бэкенд для работы с дроном или None, если производитель не поддерживается.
         """
-        if manufacturer.lower() == "dji":
-            return DJIDroneAPI(connect_uri)
-        else:
-            return AirSimAPI()
+        return backend_for_manufacturer(manufacturer, connect_uri)
 
 # Класс для логирования действий с дронами
 class DroneLogger:
@@ -205,13 +155,13 @@ class DroneLogger:
             drone_id (str): Идентификатор дрона.
             parameters (dict): Параметры дрона.
         """
-        logger.info(f"Drone ID {drone_id} approved with parameters: {parameters}")
+        logger.info("Drone ID %s approved with parameters: %s", drone_id, parameters)
 
     def log_selection(self, drone_id):
         """
         Логирует выбор дрона для выполнения миссии.
         """
-        logger.info(f"Drone {drone_id} selected for mission.")
+        logger.info("Drone %s selected for mission.", drone_id)
 
 def select_drone_for_mission(required_battery_capacity):
     """Выбирает дроны для миссии на основе емкости батареи.
@@ -225,10 +175,41 @@ def select_drone_for_mission(required_battery_capacity):
     approved_drones = []
     for drone_data in DRONE_DATABASE:
         if drone_data["battery_capacity"] >= required_battery_capacity:
-            logger.info(f"Drone {drone_data['drone_id']} meets the battery capacity requirement.")
+            logger.info("Drone %s meets the battery capacity requirement.", drone_data['drone_id'])
+            approved_drones.append(drone_data["drone_id"])
+        else:
+            logger.warning("Drone %s does not meet the battery capacity requirement.", drone_data['drone_id'])
+    return approved_drones
+
+def select_drones_for_plan(plan, anemometer=None, energy_model=None):
+    """Выбирает дроны, которым хватит энергии на выполнение полетного плана.
+
+        Поле battery_capacity трактуется как емкость батареи в Вт·ч. Проверка
+        выполняется одним векторизованным проходом по всему флоту.
+
+        Args:
+            plan (MissionPlan): Скомпилированный полетный план.
+            anemometer (AnemometerDevice, optional): Источник текущей скорости ветра.
+            energy_model (EnergyModel, optional): Модель энергопотребления. По умолчанию EnergyModel().
+
+        Returns:
+            list: Список идентификаторов дронов, способных выполнить план.
+        """
+    import numpy as np
+    from energy_model import EnergyModel
+
+    energy_model = energy_model or EnergyModel()
+    wind_speed = anemometer.get_telemetry()["wind_speed"] if anemometer is not None else 0.0
+    capacities = np.array([d["battery_capacity"] for d in DRONE_DATABASE], dtype=np.float64)
+    speeds = np.array([d["max_speed"] for d in DRONE_DATABASE], dtype=np.float64)
+    feasible, required = energy_model.feasible(plan, capacities, speeds, wind_speed)
+    approved_drones = []
+    for drone_data, ok, energy in zip(DRONE_DATABASE, feasible, required):
+        if ok:
             approved_drones.append(drone_data["drone_id"])
         else:
-            logger.warning(f"Drone {drone_data['drone_id']} does not meet the battery capacity requirement.")
+            logger.warning("Drone %s cannot complete the plan: requires %.1f Wh of %s Wh.",
+                           drone_data['drone_id'], energy, drone_data['battery_capacity'])
     return approved_drones
 
 def approve_drone_for_mission(drone_id):
@@ -239,7 +220,7 @@ def approve_drone_for_mission(drone_id):
     drone_data = next((d for d in DRONE_DATABASE if d["drone_id"] == drone_id), None)
 
     if drone_data is None:
-        logger.warning(f"Drone ID {drone_id} not found in DRONE_DATABASE.")
+        logger.warning("Drone ID %s not found in DRONE_DATABASE.", drone_id)
         return None
 
     parameters = {
@@ -249,11 +230,11 @@ def approve_drone_for_mission(drone_id):
     }
 
     if not check_manufacturer_api(parameters['manufacturer']):
-        logger.error(f"Drone {drone_id} not approved. Manufacturer API check failed.")
+        logger.error("Drone %s not approved. Manufacturer API check failed.", drone_id)
         return None
 
     if parameters['status'] != "operational":
-        logger.warning(f"Drone ID {drone_id} is not operational.")
+        logger.warning("Drone ID %s is not operational.", drone_id)
         return None
 
     drone_logger.log_approval(drone_id, parameters)
@@ -268,10 +249,10 @@ def check_manufacturer_api(manufacturer):
     """
     api_object = DroneAPIFactory.get_drone_api(manufacturer, "dummy_connect_uri")
     if api_object is not None:
-        logger.info(f"Manufacturer {manufacturer} is supported.")
+        logger.info("Manufacturer %s is supported.", manufacturer)
         return True
     else:
-        logger.warning(f"Manufacturer {manufacturer} is not supported.")
+        logger.warning("Manufacturer %s is not supported.", manufacturer)
         return False
 
 def send_validated_drones_to_mission_manager(valid_drones):
@@ -281,14 +262,21 @@ def send_validated_drones_to_mission_manager(valid_drones):
             valid_drones (list): Список идентификаторов валидных дронов.
         """
     try:
-        mission_manager.receive_validated_drones(valid_drones)
-        logger.info(f"Validated drones sent to mission manager: {valid_drones}")
+        get_mission_manager().receive_validated_drones(valid_drones)
+        logger.info("Validated drones sent to mission manager: %s", valid_drones)
     except AttributeError:
         logger.error("Нет подключения к mission_manager.py, назначение дронов на миссии невозможно. "
                      "Реализуйте receive_validated_drones в коде mission_manager.py")
 
 # Пример использования
 if __name__ == "__main__":
+    # Общая настройка журнала находится в пакете client в корне репозитория
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from client.logging_config import setup_logging
+    setup_logging()
+    profiler.install_signal_handler(tag="mission")
+    profiler.start_from_env(tag="mission")
+
     # Создаем объект класса DroneLogger
     drone_logger = DroneLogger()
 
@@ -303,7 +291,7 @@ if __name__ == "__main__":
         approved_drone = approve_drone_for_mission(drone_id)
         if approved_drone:
             drone_logger.log_selection(approved_drone['drone_id'])
-            logger.info(f"Drone ID {approved_drone['drone_id']} is approved for flight and mission.")
+            logger.info("Drone ID %s is approved for flight and mission.", approved_drone['drone_id'])
             validated_drones.append(approved_drone)
 
     # Передача валидированных дронов в менеджер миссий
@@ -0,0 +1,197 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRAVITY = 9.81  # Ускорение свободного падения, м/с^2
+JOULES_PER_WH = 3600.0
+
+
+# Скомпилированный полетный план: последовательность участков между точками маршрута
+class MissionPlan:
+    """
+    Полетный план миссии в виде массивов участков между точками маршрута.
+
+    Args:
+        waypoints (array-like): Точки маршрута (x, y, altitude) в метрах, форма (N, 3).
+        speed (float): Крейсерская скорость в м/с.
+    """
+
+    def __init__(self, waypoints, speed: float):
+        points = np.asarray(waypoints, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != 3 or len(points) < 2:
+            raise ValueError("План должен содержать минимум две точки (x, y, altitude)")
+        if speed <= 0:
+            raise ValueError(f"Скорость должна быть положительной: {speed}")
+        deltas = np.diff(points, axis=0)
+        self.waypoints = points
+        self.speed = speed
+        self.distances = np.hypot(deltas[:, 0], deltas[:, 1])  # Горизонтальная длина участков
+        self.climbs = deltas[:, 2]  # Изменение высоты на участках
+
+    @classmethod
+    def from_route(cls, route, speed: float, altitude: float, cell_size: float = 1.0):
+        """
+        Строит план из маршрута PathPlanner с взлетом до altitude и посадкой в конце.
+
+        Args:
+            route (tuple): Ячейки маршрута (x, y).
+            speed (float): Крейсерская скорость в м/с.
+            altitude (float): Высота полета в метрах.
+            cell_size (float, optional): Размер ячейки карты в метрах. По умолчанию 1.0.
+        """
+        cells = np.asarray(route, dtype=np.float64) * cell_size
+        ground = np.column_stack([cells[:1], [0.0]])
+        cruise = np.column_stack([cells, np.full(len(cells), float(altitude))])
+        landing = np.column_stack([cells[-1:], [0.0]])
+        return cls(np.vstack([ground, cruise, landing]), speed)
+
+    def __len__(self):
+        return len(self.distances)
+
+
+# Модель энергопотребления мультикоптера
+class EnergyModel:
+    """
+    Модель предсказания расхода энергии на выполнение полетного плана.
+
+    Мощность в крейсерском полете складывается из мощности зависания и
+    аэродинамических потерь, растущих с квадратом воздушной скорости. Ветер
+    учитывается как встречный (консервативная оценка): он увеличивает воздушную
+    скорость и уменьшает путевую. Набор высоты стоит m*g*h / КПД, спуск считается
+    бесплатным.
+
+    Args:
+        hover_power (float, optional): Мощность зависания, Вт. По умолчанию 150.
+        drag_coefficient (float, optional): Потери на сопротивление, Вт/(м/с)^2. По умолчанию 0.6.
+        mass (float, optional): Масса дрона, кг. По умолчанию 1.4.
+        efficiency (float, optional): КПД силовой установки при наборе высоты. По умолчанию 0.7.
+        reserve (float, optional): Доля резерва батареи, которую нельзя расходовать. По умолчанию 0.2.
+    """
+
+    def __init__(self, hover_power: float = 150.0, drag_coefficient: float = 0.6,
+                 mass: float = 1.4, efficiency: float = 0.7, reserve: float = 0.2):
+        self.hover_power = hover_power
+        self.drag_coefficient = drag_coefficient
+        self.mass = mass
+        self.efficiency = efficiency
+        self.reserve = reserve
+
+    def leg_energy(self, plan: MissionPlan, speeds=None, wind_speed: float = 0.0):
+        """
+        Рассчитывает расход энергии на каждом участке плана для одного или нескольких дронов.
+
+        Args:
+            plan (MissionPlan): Полетный план.
+            speeds (array-like, optional): Воздушные скорости дронов, м/с. По умолчанию скорость плана.
+            wind_speed (float, optional): Скорость ветра, м/с. По умолчанию 0.
+
+        Returns:
+            numpy.ndarray: Расход в Вт·ч формы (len(speeds), len(plan)) или (len(plan),) для скаляра.
+        """
+        scalar = speeds is None or np.ndim(speeds) == 0
+        speeds = np.atleast_1d(np.asarray(plan.speed if speeds is None else speeds, dtype=np.float64))
+        airspeed = speeds[:, None]
+        # Путевая скорость не опускается ниже 10% воздушной, чтобы план при сильном ветре оставался конечным
+        ground_speed = np.maximum(airspeed - wind_speed, 0.1 * airspeed)
+        flight_time = plan.distances[None, :] / ground_speed
+        vertical_time = np.abs(plan.climbs)[None, :] / np.maximum(airspeed, 1.0)
+        power = self.hover_power + self.drag_coefficient * (airspeed + wind_speed) ** 2
+        cruise = power * flight_time + self.hover_power * vertical_time
+        climb = self.mass * GRAVITY * np.clip(plan.climbs, 0.0, None)[None, :] / self.efficiency
+        energy = (cruise + climb) / JOULES_PER_WH
+        return energy[0] if scalar else energy
+
+    def predict(self, plan: MissionPlan, speed: float = None, wind_speed: float = 0.0):
+        """
+        Предсказывает полный расход энергии на план в Вт·ч.
+        """
+        return float(self.leg_energy(plan, speed, wind_speed).sum())
+
+    def feasible(self, plan: MissionPlan, capacities, speeds, wind_speed: float = 0.0):
+        """
+        Векторизованно проверяет выполнимость плана для всего флота.
+
+        Args:
+            plan (MissionPlan): Полетный план.
+            capacities (array-like): Доступная энергия батарей дронов, Вт·ч.
+            speeds (array-like): Максимальные скорости дронов, м/с.
+            wind_speed (float, optional): Скорость ветра, м/с. По умолчанию 0.
+
+        Returns:
+            tuple: (маска выполнимости, предсказанный расход в Вт·ч) — массивы длины флота.
+        """
+        capacities = np.asarray(capacities, dtype=np.float64)
+        speeds = np.minimum(np.asarray(speeds, dtype=np.float64), plan.speed)
+        required = self.leg_energy(plan, speeds, wind_speed).sum(axis=1)
+        return required <= capacities * (1.0 - self.reserve), required
+
+    def tracker(self, plan: MissionPlan, capacity: float, speed: float = None, wind_speed: float = 0.0):
+        """
+        Создает трекер для переоценки выполнимости плана в полете.
+        """
+        return EnergyTracker(self, plan, capacity, speed, wind_speed)
+
+
+# Переоценка запаса энергии по ходу выполнения плана
+class EnergyTracker:
+    """
+    Отслеживает оставшийся расход энергии по ходу полета.
+
+    Суффиксные суммы расхода по участкам хранятся заранее, поэтому переход к
+    следующему участку стоит O(1). Пересчет участков выполняется только при
+    изменении ветра и только для оставшейся части плана.
+
+    Args:
+        model (EnergyModel): Модель энергопотребления.
+        plan (MissionPlan): Полетный план.
+        capacity (float): Полная емкость батареи, Вт·ч.
+        speed (float, optional): Скорость полета, м/с. По умолчанию скорость плана.
+        wind_speed (float, optional): Скорость ветра при вылете, м/с. По умолчанию 0.
+    """
+
+    def __init__(self, model: EnergyModel, plan: MissionPlan, capacity: float,
+                 speed: float = None, wind_speed: float = 0.0):
+        self.model = model
+        self.plan = plan
+        self.capacity = capacity
+        self.speed = plan.speed if speed is None else speed
+        self.wind_speed = wind_speed
+        self.leg = 0
+        self._remaining = self._suffix(model.leg_energy(plan, self.speed, wind_speed))
+
+    @staticmethod
+    def _suffix(legs):
+        return np.concatenate([np.cumsum(legs[::-1])[::-1], [0.0]])
+
+    def remaining_energy(self):
+        """
+        Возвращает предсказанный расход на оставшиеся участки, Вт·ч.
+        """
+        return float(self._remaining[self.leg])
+
+    def update(self, leg: int, battery_level: float, wind_speed: float = None):
+        """
+        Переоценивает выполнимость после перехода к участку leg.
+
+        Args:
+            leg (int): Индекс текущего участка плана.
+            battery_level (float): Текущий заряд батареи в процентах.
+            wind_speed (float, optional): Новая скорость ветра, м/с.
+
+        Returns:
+            bool: True, если оставшегося заряда хватает на завершение плана с резервом.
+        """
+        self.leg = min(max(leg, 0), len(self.plan))
+        if wind_speed is not None and wind_speed != self.wind_speed:
+            self.wind_speed = wind_speed
+            legs = self.model.leg_energy(self.plan, self.speed, wind_speed)
+            legs[:self.leg] = 0.0
+            self._remaining = self._suffix(legs)
+        available = self.capacity * battery_level / 100.0 - self.capacity * self.model.reserve
+        feasible = self.remaining_energy() <= available
+        if not feasible:
+            logger.warning("Заряда недостаточно для завершения плана: нужно %.1f Вт·ч, доступно %.1f Вт·ч",
+                           self.remaining_energy(), available)
+        return feasible
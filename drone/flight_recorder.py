@@ -0,0 +1,309 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from clock import IClock
+
+# Максимальное количество значений в одной записи
+MAX_VALUES = 8
+
+# Формат записи: фиксированный размер 96 байт, поэтому файл сегмента — это массив записей
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("drone_id", "S16"),
+    ("channel", "<u4"),
+    ("count", "<u4"),
+    ("values", "<f8", (MAX_VALUES,)),
+])
+
+# Предельная длина идентификатора дрона в байтах UTF-8: более длинный обрезался бы молча
+DRONE_ID_SIZE = RECORD_DTYPE["drone_id"].itemsize
+
+# Заголовок сегмента; первая и последняя метки времени служат индексом сегментов
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("record_size", "<u4"),
+    ("capacity", "<u8"),
+    ("count", "<u8"),
+    ("t_first", "<f8"),
+    ("t_last", "<f8"),
+    ("reserved", "V16"),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+MAGIC = b"PDFDR001"
+VERSION = 1
+
+# Каналы записей: телеметрия и команды дронам
+CHANNELS = {
+    "telemetry": 1,
+    "position": 2,
+    "battery": 3,
+    "wind": 4,
+    "obstacle": 5,
+    "takeoff": 10,
+    "move_forward": 11,
+    "turn": 12,
+    "land": 13,
+    "return_to_base": 14,
+}
+
+SEGMENT_PATTERN = "segment-%06d.fdr"
+
+
+def channel_code(channel):
+    """
+    Возвращает числовой код канала.
+    :param channel: Имя канала из CHANNELS или его код.
+    """
+    return CHANNELS[channel] if isinstance(channel, str) else int(channel)
+
+
+def _segment_paths(directory):
+    """
+    Возвращает пары (номер, путь) сегментов каталога по возрастанию номера.
+
+    Номера берутся из имен по SEGMENT_PATTERN: после удаления старых сегментов
+    номера идут с пропусками, и их количество не равно последнему номеру.
+    :param directory: Каталог сегментов.
+    """
+    prefix, suffix = SEGMENT_PATTERN.split("%06d")
+    segments = []
+    for path in glob.glob(os.path.join(directory, prefix + "*" + suffix)):
+        number = os.path.basename(path)[len(prefix):-len(suffix)]
+        if number.isdigit():
+            segments.append((int(number), path))
+    return sorted(segments)
+
+
+def _open_segment(path, mode):
+    header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+    if header["magic"][0] != MAGIC or header["record_size"][0] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} не является сегментом бортового самописца версии {VERSION}")
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_SIZE,
+                        shape=(int(header["capacity"][0]),))
+    return header, records
+
+
+class FlightRecorder:
+    """
+    Бортовой самописец: дописывает записи фиксированного размера в отображенные в память сегменты.
+
+    Каждая запись содержит метку времени, идентификатор дрона, канал и до MAX_VALUES
+    значений. Сегмент — файл с заголовком и массивом записей, отображенный в память
+    целиком, поэтому запись не выполняет системных вызовов. Заполненный сегмент
+    сбрасывается на диск и заменяется новым. Метки времени не убывают, поэтому
+    FlightDataReader ищет диапазоны двоичным поиском.
+
+    Args:
+        directory (str): Каталог сегментов.
+        segment_records (int, optional): Количество записей в сегменте. По умолчанию 65536 (6 МБ).
+        clock (IClock, optional): Часы для меток времени. По умолчанию time.time.
+    """
+
+    def __init__(self, directory: str, segment_records: int = 65536, clock: IClock = None):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._now = clock.now if clock is not None else time.time
+        self._lock = threading.Lock()
+        self._header = None
+        self._records = None
+        os.makedirs(directory, exist_ok=True)
+        segments = _segment_paths(directory)
+        # Следующий сегмент получает номер после наибольшего, а не после количества сегментов,
+        # иначе после удаления старых сегментов новый перезаписал бы существующий
+        self._segment_number = segments[-1][0] if segments else 0
+        if segments:
+            # Продолжаем последний сегмент, если в нем есть место
+            header, records = _open_segment(segments[-1][1], "r+")
+            if header["count"][0] < header["capacity"][0]:
+                self._header, self._records = header, records
+            self._last_timestamp = float(header["t_last"][0])
+        else:
+            self._last_timestamp = -np.inf
+
+    def _rotate(self):
+        if self._records is not None:
+            self._records.flush()
+            self._header.flush()
+        self._segment_number += 1
+        path = os.path.join(self.directory, SEGMENT_PATTERN % self._segment_number)
+        with open(path, "wb") as segment:
+            segment.truncate(HEADER_SIZE + RECORD_DTYPE.itemsize * self.segment_records)
+        header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        header[0] = (MAGIC, VERSION, RECORD_DTYPE.itemsize, self.segment_records, 0, np.nan, np.nan, b"")
+        self._header, self._records = _open_segment(path, "r+")
+
+    def record(self, drone_id: str, channel, values=(), timestamp: float = None):
+        """
+        Дописывает одну запись.
+        :param drone_id: Идентификатор дрона (до 16 байт UTF-8).
+        :param channel: Имя канала из CHANNELS или его код.
+        :param values: До MAX_VALUES числовых значений.
+        :param timestamp: Метка времени; по умолчанию текущее время часов.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size > MAX_VALUES:
+            raise ValueError(f"Запись содержит не более {MAX_VALUES} значений")
+        encoded_id = drone_id.encode("utf-8")
+        if len(encoded_id) > DRONE_ID_SIZE:
+            raise ValueError(f"Идентификатор дрона {drone_id!r} длиннее {DRONE_ID_SIZE} байт UTF-8")
+        code = channel_code(channel)
+        with self._lock:
+            timestamp = self._now() if timestamp is None else float(timestamp)
+            if timestamp < self._last_timestamp:
+                raise ValueError("Метки времени записей не должны убывать")
+            if self._records is None or self._header["count"][0] >= self._header["capacity"][0]:
+                self._rotate()
+            header = self._header
+            index = int(header["count"][0])
+            row = self._records[index]
+            row["timestamp"] = timestamp
+            row["drone_id"] = encoded_id
+            row["channel"] = code
+            row["count"] = values.size
+            row["values"][:values.size] = values
+            if index == 0:
+                header["t_first"] = timestamp
+            header["t_last"] = timestamp
+            # Счетчик увеличивается последним: читатель не увидит недописанную запись
+            header["count"] = index + 1
+            self._last_timestamp = timestamp
+
+    def record_many(self, timestamps, drone_ids, channels, values):
+        """
+        Дописывает пакет записей векторно.
+        :param timestamps: Неубывающие метки времени, массив длины N.
+        :param drone_ids: Идентификаторы дронов (до 16 байт UTF-8), N строк или одна строка для всех записей.
+        :param channels: Каналы, N кодов или один канал для всех записей.
+        :param values: Матрица значений N x K, K <= MAX_VALUES.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(timestamps), -1)
+        if values.shape[1] > MAX_VALUES:
+            raise ValueError(f"Запись содержит не более {MAX_VALUES} значений")
+        if np.any(np.diff(timestamps) < 0):
+            raise ValueError("Метки времени записей не должны убывать")
+        if isinstance(drone_ids, str):
+            drone_ids = [drone_ids] * len(timestamps)
+        drone_ids = np.char.encode(np.asarray(drone_ids, dtype=str), "utf-8")
+        if drone_ids.dtype.itemsize > DRONE_ID_SIZE:
+            too_long = drone_ids[np.char.str_len(drone_ids) > DRONE_ID_SIZE][0].decode("utf-8")
+            raise ValueError(f"Идентификатор дрона {too_long!r} длиннее {DRONE_ID_SIZE} байт UTF-8")
+        channels = np.broadcast_to(np.asarray(channel_code(channels) if isinstance(channels, str) else channels,
+                                              dtype=np.uint32), timestamps.shape)
+        with self._lock:
+            if len(timestamps) and timestamps[0] < self._last_timestamp:
+                raise ValueError("Метки времени записей не должны убывать")
+            start = 0
+            while start < len(timestamps):
+                if self._records is None or self._header["count"][0] >= self._header["capacity"][0]:
+                    self._rotate()
+                header = self._header
+                index = int(header["count"][0])
+                stop = min(len(timestamps), start + int(header["capacity"][0]) - index)
+                block = self._records[index:index + stop - start]
+                block["timestamp"] = timestamps[start:stop]
+                block["drone_id"] = drone_ids[start:stop]
+                block["channel"] = channels[start:stop]
+                block["count"] = values.shape[1]
+                block["values"][:, :values.shape[1]] = values[start:stop]
+                if index == 0:
+                    header["t_first"] = timestamps[start]
+                header["t_last"] = timestamps[stop - 1]
+                header["count"] = index + stop - start
+                start = stop
+            if len(timestamps):
+                self._last_timestamp = float(timestamps[-1])
+
+    def flush(self):
+        """
+        Сбрасывает текущий сегмент на диск.
+        """
+        with self._lock:
+            if self._records is not None:
+                self._records.flush()
+                self._header.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._header = self._records = None
+
+
+class FlightDataReader:
+    """
+    Чтение записей самописца без копирования.
+
+    Сегменты отображаются в память только для чтения. Индексом служат метки времени
+    первой и последней записи в заголовках сегментов и двоичный поиск по
+    неубывающим меткам внутри сегмента, поэтому выборка интервала из многочасовой
+    записи читает с диска только нужные страницы.
+
+    Args:
+        directory (str): Каталог сегментов.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._segments = []
+        self.refresh()
+
+    def refresh(self):
+        """
+        Перечитывает список сегментов и количество записей, дописанных с момента открытия.
+        """
+        segments = []
+        for _, path in _segment_paths(self.directory):
+            header, records = _open_segment(path, "r")
+            count = int(header["count"][0])
+            if count:
+                segments.append((float(header["t_first"][0]), float(header["t_last"][0]), records[:count]))
+        self._segments = segments
+
+    def __len__(self):
+        return sum(len(records) for _, _, records in self._segments)
+
+    def segments(self, start: float = -np.inf, end: float = np.inf):
+        """
+        Возвращает представления записей с меткой времени в [start, end) по сегментам без копирования.
+        :param start: Начало интервала.
+        :param end: Конец интервала (не включается).
+        """
+        views = []
+        for t_first, t_last, records in self._segments:
+            if t_last < start or t_first >= end:
+                continue
+            timestamps = records["timestamp"]
+            left = 0 if t_first >= start else int(np.searchsorted(timestamps, start, side="left"))
+            right = len(records) if t_last < end else int(np.searchsorted(timestamps, end, side="left"))
+            if right > left:
+                views.append(records[left:right])
+        return views
+
+    def read(self, start: float = -np.inf, end: float = np.inf, drone_id: str = None, channel=None):
+        """
+        Возвращает структурированный массив записей интервала [start, end).
+
+        Если интервал лежит в одном сегменте и фильтры не заданы, результат — представление
+        отображенного файла без копирования; иначе сегменты объединяются и фильтруются.
+        :param start: Начало интервала.
+        :param end: Конец интервала (не включается).
+        :param drone_id: Оставить записи только этого дрона.
+        :param channel: Оставить записи только этого канала (имя или код).
+        """
+        views = self.segments(start, end)
+        if not views:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        records = views[0] if len(views) == 1 else np.concatenate(views)
+        if drone_id is not None or channel is not None:
+            mask = np.ones(len(records), dtype=bool)
+            if drone_id is not None:
+                mask &= records["drone_id"] == drone_id.encode("utf-8")
+            if channel is not None:
+                mask &= records["channel"] == channel_code(channel)
+            records = records[mask]
+        return records
@@ -0,0 +1,460 @@
+import asyncio
+import logging
+import random
+
+from backends import BackendError
+from clock import IClock, RealClock
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Константы протокола MAVLink (common.xml): канал и локальная замена аппарата работают без pymavlink
+MAV_CMD_NAV_WAYPOINT = 16
+MAV_CMD_NAV_RETURN_TO_LAUNCH = 20
+MAV_CMD_NAV_LAND = 21
+MAV_CMD_NAV_TAKEOFF = 22
+MAV_CMD_CONDITION_YAW = 115
+MAV_CMD_IMAGE_START_CAPTURE = 2000
+
+MAV_RESULT_ACCEPTED = 0
+MAV_RESULT_IN_PROGRESS = 5
+MAV_RESULTS = {0: "ACCEPTED", 1: "TEMPORARILY_REJECTED", 2: "DENIED", 3: "UNSUPPORTED", 4: "FAILED",
+               5: "IN_PROGRESS", 6: "CANCELLED"}
+
+MAV_FRAME_LOCAL_NED = 1
+MAV_FRAME_GLOBAL_RELATIVE_ALT_INT = 6
+MAV_FRAME_BODY_OFFSET_NED = 9
+
+MAV_MISSION_ACCEPTED = 0
+MAV_MISSION_TYPE_MISSION = 0
+
+MAVLINK_RETRANSMITS = REGISTRY.counter("drone_mavlink_retransmits", "Повторные отправки сообщений MAVLink",
+                                       ("message",))
+MAVLINK_ACK_SECONDS = REGISTRY.histogram("drone_mavlink_ack_seconds",
+                                         "Время от отправки до подтверждения команды или загрузки миссии",
+                                         ("message",))
+
+
+class MavlinkCommandError(BackendError):
+    """Команда или загрузка миссии отклонена аппаратом либо не подтверждена после всех повторов.
+
+    Attributes:
+        result (int): Код MAV_RESULT или MAV_MISSION_RESULT; None, если подтверждение не пришло.
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class MavlinkMessage:
+    """
+    Сообщение MAVLink локальной замены аппарата с интерфейсом сообщений pymavlink:
+    get_type, get_srcSystem, get_srcComponent и поля атрибутами.
+    """
+
+    def __init__(self, message_type: str, src_system: int = 1, src_component: int = 1, **fields):
+        self._type = message_type
+        self._src = (src_system, src_component)
+        self.__dict__.update(fields)
+
+    def get_type(self):
+        return self._type
+
+    def get_srcSystem(self):
+        return self._src[0]
+
+    def get_srcComponent(self):
+        return self._src[1]
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in vars(self).items() if not name.startswith("_"))
+        return f"{self._type}({fields})"
+
+
+def mission_item(lat: float, lon: float, altitude: float, command: int = MAV_CMD_NAV_WAYPOINT, params=(0, 0, 0, 0),
+                 frame: int = MAV_FRAME_GLOBAL_RELATIVE_ALT_INT) -> dict:
+    """
+    Возвращает поля MISSION_ITEM_INT для точки миссии.
+    :param lat: Широта в градусах.
+    :param lon: Долгота в градусах.
+    :param altitude: Высота в метрах относительно точки взлета.
+    :param command: Команда MAV_CMD точки. По умолчанию MAV_CMD_NAV_WAYPOINT.
+    :param params: param1..param4 команды.
+    """
+    return {"frame": frame, "command": command, "autocontinue": 1,
+            "param1": params[0], "param2": params[1], "param3": params[2], "param4": params[3],
+            "x": int(round(lat * 1e7)), "y": int(round(lon * 1e7)), "z": float(altitude),
+            "mission_type": MAV_MISSION_TYPE_MISSION}
+
+
+class PymavlinkTransport:
+    """
+    Транспорт канала поверх соединения pymavlink (mavutil.mavlink_connection).
+
+    Args:
+        connection: Соединение pymavlink после wait_heartbeat.
+        poll_timeout (float, optional): Таймаут одного блокирующего чтения в потоке, с.
+    """
+
+    def __init__(self, connection, poll_timeout: float = 0.1):
+        self.connection = connection
+        self.poll_timeout = poll_timeout
+
+    @property
+    def target_system(self):
+        return self.connection.target_system
+
+    @property
+    def target_component(self):
+        return self.connection.target_component
+
+    def send(self, message_type: str, **fields):
+        getattr(self.connection.mav, f"{message_type.lower()}_send")(**fields)
+
+    async def recv(self):
+        while True:
+            message = await asyncio.to_thread(self.connection.recv_match, blocking=True, timeout=self.poll_timeout)
+            if message is not None:
+                return message
+
+    def close(self):
+        self.connection.close()
+
+
+class MavlinkCommandChannel:
+    """
+    Канал команд MAVLink с подтверждениями и повторами.
+
+    Фоновая задача читает все входящие сообщения: COMMAND_ACK завершает ожидающую
+    команду, запросы и подтверждения миссии передаются активной загрузке, остальные
+    сообщения сохраняются в latest. COMMAND_ACK не содержит идентификатора запроса,
+    поэтому одновременно ожидается не более одной команды с одним MAV_CMD на аппарат;
+    разные команды выполняются параллельно, до max_in_flight на канал. Без
+    подтверждения за ack_timeout команда отправляется повторно с увеличенным полем
+    confirmation; после ответа IN_PROGRESS окончательный ответ ждется до
+    command_timeout без повторов.
+
+    Загрузка миссии (протокол MISSION_ITEM_INT) не ждет MISSION_REQUEST_INT перед
+    каждой точкой: после MISSION_COUNT сразу отправляется окно из mission_window
+    точек, а каждый запрос аппарата сдвигает окно. Запрошенные точки, отправленные
+    меньше ack_timeout назад, повторно не отправляются. Аппарат принимает точки по
+    порядку, поэтому загрузка N точек занимает около одного обмена вместо N.
+    mission_window=0 — загрузка строго по запросам аппарата.
+
+    Args:
+        transport: PymavlinkTransport или LocalMavlinkVehicle.
+        clock (IClock, optional): Часы таймеров повторов. По умолчанию RealClock.
+        ack_timeout (float, optional): Ожидание подтверждения до повтора, с.
+        retries (int, optional): Число повторов сообщения без ответа.
+        command_timeout (float, optional): Ожидание окончательного ответа после IN_PROGRESS, с.
+        max_in_flight (int, optional): Максимум одновременно ожидающих команд.
+        mission_window (int, optional): Число точек миссии, отправляемых без запроса.
+    """
+
+    def __init__(self, transport, clock: IClock = None, ack_timeout: float = 0.5, retries: int = 3,
+                 command_timeout: float = 30.0, max_in_flight: int = 16, mission_window: int = 32):
+        self.transport = transport
+        self.clock = clock or RealClock()
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.command_timeout = command_timeout
+        self.mission_window = mission_window
+        self.latest = {}  # тип сообщения -> последнее сообщение
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending = {}  # (система, MAV_CMD) -> очередь COMMAND_ACK
+        self._locks = {}  # (система, MAV_CMD) или (система, "mission") -> asyncio.Lock
+        self._uploads = {}  # система -> очередь сообщений загрузки миссии
+        self._waiters = {}  # тип сообщения -> [future]
+        self._reader = None
+
+    def start(self):
+        """
+        Запускает чтение входящих сообщений в текущем цикле событий.
+        """
+        if self._reader is None:
+            self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def close(self):
+        """
+        Останавливает чтение; ожидающие сообщений завершаются MavlinkCommandError,
+        ожидающие подтверждения команды — по таймауту.
+        """
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        for futures in self._waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(MavlinkCommandError("Канал MAVLink закрыт"))
+
+    async def _read(self):
+        while True:
+            message = await self.transport.recv()
+            try:
+                self._dispatch(message)
+            except Exception:
+                logger.exception("Ошибка обработки сообщения MAVLink %s", message)
+
+    def _dispatch(self, message):
+        message_type = message.get_type()
+        if message_type == "COMMAND_ACK":
+            acks = self._pending.get((message.get_srcSystem(), message.command))
+            if acks is not None:
+                acks.put_nowait(message)
+        elif message_type in ("MISSION_REQUEST_INT", "MISSION_REQUEST", "MISSION_ACK"):
+            queue = self._uploads.get(message.get_srcSystem())
+            if queue is not None:
+                queue.put_nowait(message)
+        else:
+            self.latest[message_type] = message
+            for future in self._waiters.pop(message_type, ()):
+                if not future.done():
+                    future.set_result(message)
+
+    async def _wait(self, awaitable, timeout: float):
+        """
+        Ждет awaitable не дольше timeout секунд по часам канала.
+        :return: Результат или None по таймауту.
+        """
+        future = asyncio.ensure_future(awaitable)
+        sleeper = asyncio.ensure_future(self.clock.sleep(timeout))
+        try:
+            await asyncio.wait({future, sleeper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sleeper.cancel()
+        if future.done():
+            return future.result()
+        future.cancel()
+        return None
+
+    def _lock(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def wait_message(self, message_type: str, timeout: float):
+        """
+        Ждет следующее сообщение типа message_type.
+        :return: Сообщение или None по таймауту.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(message_type, []).append(future)
+        try:
+            return await self._wait(future, timeout)
+        finally:
+            # После таймаута или отмены ожидание не должно копиться до следующего сообщения этого типа
+            futures = self._waiters.get(message_type)
+            if futures is not None and future in futures:
+                futures.remove(future)
+                if not futures:
+                    del self._waiters[message_type]
+
+    async def command_long(self, command: int, params=(), target_system: int = None, target_component: int = None):
+        """
+        Отправляет COMMAND_LONG и ждет COMMAND_ACK с повторами.
+        :param command: Номер MAV_CMD.
+        :param params: До семи параметров команды.
+        :return: Сообщение COMMAND_ACK с результатом MAV_RESULT_ACCEPTED.
+        """
+        target_system = target_system if target_system is not None else self.transport.target_system
+        target_component = target_component if target_component is not None else self.transport.target_component
+        params = tuple(params) + (0,) * (7 - len(params))
+        key = (target_system, command)
+        async with self._lock(key), self._in_flight:
+            started = self.clock.now()
+            acks = self._pending[key] = asyncio.Queue()
+            ack = None
+            try:
+                for confirmation in range(self.retries + 1):
+                    if confirmation:
+                        MAVLINK_RETRANSMITS.labels("COMMAND_LONG").inc()
+                        logger.debug("Повтор команды %s (%d)", command, confirmation)
+                    self.transport.send("COMMAND_LONG", target_system=target_system,
+                                        target_component=target_component, command=command,
+                                        confirmation=confirmation,
+                                        **{f"param{i + 1}": value for i, value in enumerate(params)})
+                    ack = await self._wait(acks.get(), self.ack_timeout)
+                    if ack is not None:
+                        break
+                # IN_PROGRESS: команда принята и выполняется, окончательный ответ ждем без повторов
+                while ack is not None and ack.result == MAV_RESULT_IN_PROGRESS:
+                    ack = await self._wait(acks.get(), self.command_timeout)
+            finally:
+                self._pending.pop(key, None)
+            if ack is None:
+                raise MavlinkCommandError(f"Нет COMMAND_ACK на команду {command} после {self.retries} повторов")
+            MAVLINK_ACK_SECONDS.labels("COMMAND_LONG").observe(self.clock.now() - started)
+            if ack.result != MAV_RESULT_ACCEPTED:
+                raise MavlinkCommandError(
+                    f"Команда {command} отклонена: {MAV_RESULTS.get(ack.result, ack.result)}", ack.result)
+            return ack
+
+    async def upload_mission(self, items, target_system: int = None, target_component: int = None,
+                             window: int = None):
+        """
+        Загружает миссию по протоколу MISSION_ITEM_INT с окном отправки.
+        :param items: Поля MISSION_ITEM_INT каждой точки без seq и адресата (см. mission_item).
+        :param window: Число точек, отправляемых без запроса. По умолчанию mission_window.
+        """
+        target_system = target_system if target_system is not None else self.transport.target_system
+        target_component = target_component if target_component is not None else self.transport.target_component
+        window = self.mission_window if window is None else window
+        count = len(items)
+        target = {"target_system": target_system, "target_component": target_component}
+        sent_at = {}
+
+        def send_count():
+            self.transport.send("MISSION_COUNT", count=count, mission_type=MAV_MISSION_TYPE_MISSION, **target)
+
+        def send_item(seq):
+            if seq in sent_at:
+                MAVLINK_RETRANSMITS.labels("MISSION_ITEM_INT").inc()
+            self.transport.send("MISSION_ITEM_INT", seq=seq, current=int(seq == 0), **target, **items[seq])
+            sent_at[seq] = self.clock.now()
+
+        async with self._lock((target_system, "mission")):
+            queue = self._uploads[target_system] = asyncio.Queue()
+            started = self.clock.now()
+            try:
+                send_count()
+                next_unsent = min(window, count)
+                for seq in range(next_unsent):
+                    send_item(seq)
+                requested = None
+                silent = 0
+                while True:
+                    message = await self._wait(queue.get(), self.ack_timeout)
+                    if message is None:
+                        silent += 1
+                        if silent > self.retries:
+                            raise MavlinkCommandError(f"Загрузка миссии прервана: нет ответа после {self.retries} повторов")
+                        if requested is None:
+                            # Потерян MISSION_COUNT или первый запрос: аппарат отбросил и точки окна
+                            MAVLINK_RETRANSMITS.labels("MISSION_COUNT").inc()
+                            send_count()
+                            for seq in range(next_unsent):
+                                send_item(seq)
+                        else:
+                            for seq in range(requested, max(next_unsent, requested + 1)):
+                                send_item(seq)
+                        continue
+                    silent = 0
+                    if message.get_type() == "MISSION_ACK":
+                        if message.type != MAV_MISSION_ACCEPTED:
+                            raise MavlinkCommandError(f"Миссия отклонена: MAV_MISSION_RESULT {message.type}",
+                                                      message.type)
+                        break
+                    seq = message.seq
+                    if seq >= count:
+                        continue
+                    requested = seq
+                    if seq not in sent_at or self.clock.now() - sent_at[seq] >= self.ack_timeout:
+                        send_item(seq)
+                    next_unsent = max(next_unsent, seq + 1)
+                    while next_unsent < min(count, seq + 1 + window):
+                        send_item(next_unsent)
+                        next_unsent += 1
+            finally:
+                self._uploads.pop(target_system, None)
+            MAVLINK_ACK_SECONDS.labels("MISSION_COUNT").observe(self.clock.now() - started)
+
+
+class LocalMavlinkVehicle:
+    """
+    Локальная замена автопилота для тестов и бенчмарков канала без pymavlink и аппарата.
+
+    Реализует интерфейс транспорта (send, recv, target_system, target_component).
+    Сообщения в обе стороны доставляются через latency секунд по часам и теряются
+    с вероятностью loss (генератор с заданным зерном, поэтому потери воспроизводимы).
+    Аппарат подтверждает COMMAND_LONG, принимает миссию по протоколу MISSION_ITEM_INT
+    строго по порядку номеров и отвечает MISSION_ACK после последней точки.
+
+    Args:
+        clock (IClock, optional): Часы задержек доставки. По умолчанию RealClock.
+        latency (float, optional): Задержка доставки в одну сторону, с.
+        loss (float, optional): Вероятность потери сообщения.
+        seed (int, optional): Зерно генератора потерь.
+        command_results (dict, optional): {MAV_CMD: MAV_RESULT} для отклоняемых команд.
+        command_durations (dict, optional): {MAV_CMD: секунды}: команда сначала получает
+            IN_PROGRESS, окончательный ответ — через заданное время.
+    """
+
+    def __init__(self, clock: IClock = None, latency: float = 0.01, loss: float = 0.0, seed: int = 0,
+                 command_results: dict = None, command_durations: dict = None, system: int = 1, component: int = 1):
+        self.clock = clock or RealClock()
+        self.latency = latency
+        self.loss = loss
+        self.target_system = system
+        self.target_component = component
+        self.command_results = command_results or {}
+        self.command_durations = command_durations or {}
+        self.received = []  # сообщения, дошедшие до аппарата
+        self.mission = []  # последняя принятая миссия
+        self.lost = 0
+        self._random = random.Random(seed)
+        self._upload = None  # принимаемые точки и их ожидаемое количество
+        self._downlink = asyncio.Queue()
+        self._tasks = set()
+
+    def send(self, message_type: str, **fields):
+        self._transmit(self._handle, MavlinkMessage(message_type.upper(), 255, 0, **fields))
+
+    async def recv(self):
+        return await self._downlink.get()
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def _transmit(self, deliver, message, delay: float = 0.0):
+        if self._random.random() < self.loss:
+            self.lost += 1
+            return
+        task = asyncio.get_running_loop().create_task(self._deliver(deliver, message, delay + self.latency))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, deliver, message, delay):
+        await self.clock.sleep(delay)
+        deliver(message)
+
+    def _reply(self, message_type: str, delay: float = 0.0, **fields):
+        message = MavlinkMessage(message_type, self.target_system, self.target_component, **fields)
+        self._transmit(self._downlink.put_nowait, message, delay)
+
+    def _handle(self, message):
+        self.received.append(message)
+        message_type = message.get_type()
+        if message_type == "COMMAND_LONG":
+            result = self.command_results.get(message.command, MAV_RESULT_ACCEPTED)
+            duration = self.command_durations.get(message.command, 0.0)
+            if duration:
+                self._reply("COMMAND_ACK", command=message.command, result=MAV_RESULT_IN_PROGRESS)
+            self._reply("COMMAND_ACK", duration, command=message.command, result=result)
+        elif message_type == "MISSION_COUNT":
+            self._upload = ([], message.count)
+            self._request_next()
+        elif message_type == "MISSION_ITEM_INT" and self._upload is not None:
+            items, count = self._upload
+            if message.seq == len(items):
+                items.append(message)
+            # Дубликаты и точки не по порядку отбрасываются, аппарат повторяет запрос ожидаемой
+            self._request_next()
+        elif message_type == "MISSION_ITEM_INT" and message.seq < len(self.mission):
+            # Повтор точки после завершения загрузки: MISSION_ACK потерялся
+            self._reply("MISSION_ACK", type=MAV_MISSION_ACCEPTED, mission_type=MAV_MISSION_TYPE_MISSION)
+
+    def _request_next(self):
+        items, count = self._upload
+        if len(items) < count:
+            self._reply("MISSION_REQUEST_INT", seq=len(items), mission_type=MAV_MISSION_TYPE_MISSION)
+        else:
+            self.mission = items
+            self._upload = None
+            self._reply("MISSION_ACK", type=MAV_MISSION_ACCEPTED, mission_type=MAV_MISSION_TYPE_MISSION)
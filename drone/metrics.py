@@ -0,0 +1,321 @@
+import bisect
+import inspect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Тип содержимого текстового формата Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм длительности по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Возвращает дочернюю метрику для значений меток.
+        :param values: Значения меток в порядке labelnames.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Counter(_Metric):
+    """
+    Монотонно растущий счетчик.
+    """
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}_total{self._label_text(values)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """
+    Значение, которое может расти и убывать: размер очереди, число устройств.
+    """
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {_format_value(child.value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """
+    Распределение значений по корзинам с суммой и количеством наблюдений.
+
+    Args:
+        buckets (tuple, optional): Верхние границы корзин. По умолчанию DEFAULT_BUCKETS.
+    """
+    kind = "histogram"
+
+    def __init__(self, registry, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{self._label_text(values, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса.
+
+    Метрики создаются при импорте модулей, а измерения выполняются декораторами
+    timed и counted и контекстным менеджером timer. Когда реестр выключен,
+    обертки сразу вызывают исходную функцию: накладные расходы — проверка одного
+    флага. Реестр включен по умолчанию, переменная окружения DRONE_METRICS=0
+    выключает его при запуске.
+
+    Args:
+        enabled (bool, optional): Выполнять ли измерения. По умолчанию True.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Метрика {name} уже зарегистрирована с другим типом или метками")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """
+        Сбрасывает накопленные значения, сохраняя зарегистрированные метрики.
+        """
+        with self._lock:
+            for metric in self._metrics.values():
+                with metric._lock:
+                    metric._children.clear()
+
+
+# Реестр процесса
+REGISTRY = MetricsRegistry(enabled=os.environ.get("DRONE_METRICS", "1") != "0")
+
+
+def timed(histogram: Histogram, *label_values):
+    """
+    Декоратор: записывает длительность вызова функции или корутины в гистограмму.
+    :param histogram: Гистограмма длительности в секундах.
+    :param label_values: Значения меток гистограммы.
+    """
+    child = histogram.labels(*label_values)
+    registry = histogram.registry
+
+    def decorator(f):
+        if inspect.iscoroutinefunction(f):
+            @wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                if not registry.enabled:
+                    return await f(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await f(*args, **kwargs)
+                finally:
+                    child.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return f(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def counted(counter: Counter, *label_values):
+    """
+    Декоратор: увеличивает счетчик при каждом вызове функции.
+    :param counter: Счетчик вызовов.
+    :param label_values: Значения меток счетчика.
+    """
+    child = counter.labels(*label_values)
+    registry = counter.registry
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if registry.enabled:
+                child.inc()
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def timer(histogram: Histogram, *label_values):
+    """
+    Контекстный менеджер для замера этапа внутри функции, например захвата и кодирования кадра.
+    :param histogram: Гистограмма длительности в секундах.
+    :param label_values: Значения меток гистограммы.
+    """
+    if not histogram.registry.enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(*label_values).observe(time.perf_counter() - started)
+
+
+def instrument_subclasses(cls, method: str, histogram: Histogram):
+    """
+    Подключает к базовому классу замер метода во всех наследниках.
+
+    Вызывается из __init_subclass__ базового класса: если наследник определяет
+    method, он оборачивается timed с меткой — именем класса наследника.
+    :param cls: Класс-наследник.
+    :param method: Имя замеряемого метода.
+    :param histogram: Гистограмма длительности с одной меткой.
+    """
+    function = cls.__dict__.get(method)
+    if function is not None and not getattr(function, "__isabstractmethod__", False):
+        setattr(cls, method, timed(histogram, cls.__name__)(function))
+
+
+def metrics_response():
+    """
+    Возвращает (тело, тип содержимого) для маршрута /metrics.
+    """
+    return REGISTRY.render(), CONTENT_TYPE
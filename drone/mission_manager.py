@@ -1,8 +1,10 @@
 from abc import ABC, abstractmethod
 from drone_controller import ICommand
 import logging
+import os
+import sys
+import profiler
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Интерфейс стратегии полета, определяет метод execute
@@ -76,11 +78,16 @@ class DroneContext:
 
 # Класс менеджера миссий
 class MissionManager:
-    def __init__(self):
+    def __init__(self, path_planner=None):
         """
         Инициализирует менеджер миссий с пустым списком валидированных дронов.
+
+        Args:
+            path_planner (PathPlanner, optional): Планировщик маршрутов миссий. По умолчанию None.
         """
         self.validated_drones = []
+        self.path_planner = path_planner
+        self.assignment_solver = None
 
     def receive_validated_drones(self, valid_drones):
         """
@@ -94,7 +101,7 @@ class MissionManager:
             return
 
         self.validated_drones = valid_drones
-        logger.info(f"Получены валидные дроны: {self.validated_drones}")
+        logger.info("Получены валидные дроны: %s", self.validated_drones)
 
         # Симуляция обработки полученных данных
         self.simulate_mission_assignment()
@@ -107,7 +114,59 @@ class MissionManager:
                 """
         for drone in self.validated_drones:
             drone_id = drone.get('drone_id')
-            logger.info(f"Миссия успешно назначена дрону ID {drone_id}")
+            logger.info("Миссия успешно назначена дрону ID %s", drone_id)
+
+    def plan_routes(self, waypoints):
+        """
+        Планирует маршруты разведки и патрулирования для всех дронов одним пакетом.
+
+        Args:
+            waypoints (dict): Словарь {drone_id: (start, goal)} с ячейками карты.
+
+        Returns:
+            dict: Словарь {drone_id: route}, route равен None, если цель недостижима.
+        """
+        if self.path_planner is None:
+            logger.error("Планировщик маршрутов не подключен к менеджеру миссий.")
+            return {}
+        drone_ids = list(waypoints)
+        routes = self.path_planner.plan_many([waypoints[drone_id] for drone_id in drone_ids])
+        for drone_id, route in zip(drone_ids, routes):
+            if route is None:
+                logger.warning("Маршрут для дрона ID %s не найден", drone_id)
+        return dict(zip(drone_ids, routes))
+
+    def assign_missions(self, missions, drones, energy=None):
+        """
+        Назначает миссии дронам с минимальной суммарной стоимостью.
+
+        Стоимость назначения складывается из расстояния от дрона до старта миссии
+        и предсказанного расхода энергии; дроны без требуемых сенсоров исключаются.
+        Решатель сохраняется в self.assignment_solver для переназначения при выбытии дрона.
+
+        Args:
+            missions (list): Миссии в виде словарей с ключами mission_id, start и sensors.
+            drones (list): Дроны в виде словарей с ключами drone_id, position и sensors.
+            energy (array-like, optional): Предсказанный расход энергии, форма (len(missions), len(drones)).
+
+        Returns:
+            dict: Словарь {mission_id: drone_id}.
+        """
+        # Решатель назначений использует numpy и загружается при первом назначении, а не при импорте модуля
+        from assignment import AssignmentSolver, build_cost_matrix
+
+        cost = build_cost_matrix([m["start"] for m in missions], [d["position"] for d in drones],
+                                 [m.get("sensors", []) for m in missions],
+                                 [d.get("sensors", []) for d in drones], energy)
+        self.assignment_solver = AssignmentSolver(cost)
+        assignment = self.assignment_solver.solve()
+        result = {missions[m]["mission_id"]: drones[d]["drone_id"] for m, d in assignment.items()}
+        for mission in missions:
+            if mission["mission_id"] not in result:
+                logger.warning("Миссия %s осталась без подходящего дрона", mission['mission_id'])
+        for mission_id, drone_id in result.items():
+            logger.info("Миссия %s назначена дрону ID %s", mission_id, drone_id)
+        return result
 
     def check_completeness(self, original_list, received_list):
         """
@@ -124,10 +183,16 @@ class MissionManager:
             logger.info("Полнота передачи списка дронов подтверждена.")
         else:
             logger.warning("Обнаружена неполнота в передаче списка дронов.")
-            logger.debug(f"Оригинальные: {original_ids}, Полученные: {received_ids}")
+            logger.debug("Оригинальные: %s, Полученные: %s", original_ids, received_ids)
 
 # Пример использования
 if __name__ == "__main__":
+    # Общая настройка журнала находится в пакете client в корне репозитория
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from client.logging_config import setup_logging
+    setup_logging()
+    profiler.start_from_env(tag="mission")
+
     # Создаем объект MissionManager
     mission_manager = MissionManager()
 
@@ -0,0 +1,217 @@
+import heapq
+import logging
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Смещения соседних ячеек и длины шагов (4 прямых + 4 диагональных направления)
+_STEPS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+          (1, 1, math.sqrt(2)), (1, -1, math.sqrt(2)), (-1, 1, math.sqrt(2)), (-1, -1, math.sqrt(2))]
+
+
+# Карта местности для планирования маршрутов
+class GridMap:
+    """
+    Карта местности в виде сетки стоимостей прохождения ячеек.
+
+    Стоимость ячейки — множитель затрат энергии на метр пути (1.0 — обычная
+    местность), np.inf — непроходимое препятствие. Каждое изменение карты
+    увеличивает version, что инвалидирует закэшированные маршруты.
+
+    Args:
+        width (int): Ширина карты в ячейках (ось x).
+        height (int): Высота карты в ячейках (ось y).
+        cell_size (float, optional): Размер ячейки в метрах. По умолчанию 1.0.
+    """
+
+    def __init__(self, width: int, height: int, cell_size: float = 1.0):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.costs = np.ones((height, width), dtype=np.float64)
+        self.version = 0
+
+    def in_bounds(self, cell):
+        x, y = cell
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_free(self, cell):
+        return self.in_bounds(cell) and np.isfinite(self.costs[cell[1], cell[0]])
+
+    def set_obstacle(self, cell):
+        """
+        Отмечает ячейку (x, y) как непроходимую.
+        """
+        self.set_cost(cell, np.inf)
+
+    def set_cost(self, cell, cost: float):
+        """
+        Задаёт стоимость прохождения ячейки (x, y).
+        """
+        if cost <= 0:
+            raise ValueError(f"Стоимость ячейки должна быть положительной: {cost}")
+        self.costs[cell[1], cell[0]] = cost
+        self.version += 1
+
+    def set_costs(self, costs):
+        """
+        Заменяет всю сетку стоимостей массивом формы (height, width).
+        """
+        costs = np.asarray(costs, dtype=np.float64)
+        if costs.shape != self.costs.shape:
+            raise ValueError(f"Ожидалась сетка формы {self.costs.shape}, получено {costs.shape}")
+        if np.any(costs <= 0):
+            raise ValueError("Стоимости ячеек должны быть положительными")
+        self.costs = costs.copy()
+        self.version += 1
+
+    def min_cost(self):
+        finite = self.costs[np.isfinite(self.costs)]
+        return float(finite.min()) if finite.size else 1.0
+
+
+# Планировщик маршрутов по алгоритму A* с кэшем маршрутов
+class PathPlanner:
+    """
+    Планировщик маршрутов по сетке карты с алгоритмом A*.
+
+    Эвристика (октильное расстояние до цели, умноженное на минимальную стоимость
+    ячейки) считается для всей карты одним векторизованным проходом NumPy и
+    переиспользуется всеми запросами к одной цели. Готовые маршруты кэшируются
+    по ключу (start, goal, map version) с вытеснением давно не использованных.
+
+    Args:
+        grid_map (GridMap): Карта местности.
+        cache_size (int, optional): Максимальное число маршрутов в кэше. По умолчанию 1024.
+    """
+
+    def __init__(self, grid_map: GridMap, cache_size: int = 1024):
+        self.grid_map = grid_map
+        self.cache_size = cache_size
+        self._routes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, start, goal):
+        """
+        Возвращает маршрут минимальной стоимости между ячейками.
+
+        Args:
+            start (tuple): Начальная ячейка (x, y).
+            goal (tuple): Целевая ячейка (x, y).
+
+        Returns:
+            tuple or None: Ячейки от start до goal включительно или None, если пути нет.
+        """
+        return self.plan_many([(start, goal)])[0]
+
+    def plan_many(self, requests):
+        """
+        Планирует маршруты для набора пар (start, goal) за один вызов.
+
+        Запросы группируются по цели, так что эвристика для каждой цели
+        вычисляется один раз на весь флот.
+
+        Args:
+            requests (list): Список пар (start, goal).
+
+        Returns:
+            list: Маршруты в порядке запросов (None для недостижимых целей).
+        """
+        version = self.grid_map.version
+        routes = [None] * len(requests)
+        pending = {}
+        for i, (start, goal) in enumerate(requests):
+            key = (tuple(start), tuple(goal), version)
+            if key in self._routes:
+                self._routes.move_to_end(key)
+                self.hits += 1
+                routes[i] = self._routes[key]
+            else:
+                pending.setdefault(key, []).append(i)
+
+        heuristics = {}
+        costs = self.grid_map.costs.tolist() if pending else None
+        for key, indices in pending.items():
+            start, goal, _ = key
+            self.misses += 1
+            if goal not in heuristics:
+                heuristics[goal] = self._heuristic(goal)
+            route = self._search(start, goal, costs, heuristics[goal])
+            if route is None:
+                logger.warning("Маршрут из %s в %s не найден", start, goal)
+            self._store(key, route)
+            for i in indices:
+                routes[i] = route
+        return routes
+
+    def route_length(self, route):
+        """
+        Возвращает длину маршрута в метрах.
+        """
+        if not route or len(route) < 2:
+            return 0.0
+        points = np.asarray(route, dtype=np.float64)
+        return float(np.hypot(*np.diff(points, axis=0).T).sum() * self.grid_map.cell_size)
+
+    def clear_cache(self):
+        self._routes.clear()
+
+    def _store(self, key, route):
+        self._routes[key] = route
+        if len(self._routes) > self.cache_size:
+            self._routes.popitem(last=False)
+
+    def _heuristic(self, goal):
+        """Октильное расстояние от каждой ячейки карты до цели."""
+        ys, xs = np.indices(self.grid_map.costs.shape)
+        dx = np.abs(xs - goal[0])
+        dy = np.abs(ys - goal[1])
+        octile = np.maximum(dx, dy) + (math.sqrt(2) - 1) * np.minimum(dx, dy)
+        # Списки Python быстрее поэлементной индексации массивов NumPy во внутреннем цикле A*
+        return (octile * self.grid_map.min_cost()).tolist()
+
+    def _search(self, start, goal, costs, heuristic):
+        grid_map = self.grid_map
+        if not grid_map.is_free(start) or not grid_map.is_free(goal):
+            return None
+        width, height = grid_map.width, grid_map.height
+        best = {start: 0.0}
+        came_from = {}
+        frontier = [(heuristic[start[1]][start[0]], 0.0, start)]
+        while frontier:
+            _, cost, cell = heapq.heappop(frontier)
+            if cell == goal:
+                return self._reconstruct(came_from, cell)
+            if cost > best[cell]:
+                continue
+            x, y = cell
+            for dx, dy, length in _STEPS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                step_cost = costs[ny][nx]
+                if step_cost == math.inf:
+                    continue
+                # Диагональ не должна срезать угол препятствия
+                if dx and dy and (costs[y][nx] == math.inf or costs[ny][x] == math.inf):
+                    continue
+                new_cost = cost + length * step_cost
+                neighbour = (nx, ny)
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    came_from[neighbour] = cell
+                    heapq.heappush(frontier, (new_cost + heuristic[ny][nx], new_cost, neighbour))
+        return None
+
+    @staticmethod
+    def _reconstruct(came_from, cell):
+        route = [cell]
+        while cell in came_from:
+            cell = came_from[cell]
+            route.append(cell)
+        route.reverse()
+        return tuple(route)
@@ -0,0 +1,292 @@
+import argparse
+import json
+import logging
+import os
+import runpy
+import signal
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Интервал выборки стеков по умолчанию, в секундах
+DEFAULT_INTERVAL = 0.005
+FORMATS = ("collapsed", "speedscope")
+
+# Подсистемы и признаки их кадров (фрагменты пути файла). Стек относится к подсистеме
+# самого глубокого кадра с признаком, поэтому обработчик API, вызвавший разбор
+# телеметрии, попадает в telemetry, а не в api.
+SUBSYSTEMS = (
+    ("video", ("device_manager.py", "Dev_mngr_with_requests.py", os.sep + "cv2" + os.sep)),
+    ("telemetry", ("sensor_manager.py", "devices.py", "ingest.py", "flight_recorder.py")),
+    ("mission", ("mission_manager.py", "drone_manager.py", "path_planner.py", "assignment.py",
+                 "energy_model.py", "drone_controller.py", "replay.py", "backends.py", "mavlink_channel.py")),
+    ("api", (os.sep + "server" + os.sep, os.sep + "flask" + os.sep, os.sep + "werkzeug" + os.sep)),
+)
+
+
+def classify(filenames) -> str:
+    """
+    Определяет подсистему стека.
+    :param filenames: Файлы кадров стека от корня к листу.
+    :return: Имя подсистемы из SUBSYSTEMS или "other".
+    """
+    for filename in reversed(filenames):
+        for subsystem, markers in SUBSYSTEMS:
+            if any(marker in filename for marker in markers):
+                return subsystem
+    return "other"
+
+
+class SamplingProfiler:
+    """
+    Выборочный профилировщик всех потоков процесса.
+
+    Фоновый поток каждые interval секунд снимает стеки всех потоков через
+    sys._current_frames и считает одинаковые стеки. Профилируемый код не
+    инструментируется, поэтому накладные расходы определяются только частотой
+    выборки и числом потоков. По окончании окна стеки раскладываются по
+    подсистемам (SUBSYSTEMS) и сохраняются отдельными файлами в формате
+    collapsed stacks (flamegraph.pl, speedscope) или speedscope JSON.
+
+    Args:
+        output_dir (str): Каталог файлов профиля.
+        interval (float, optional): Интервал выборки в секундах. По умолчанию DEFAULT_INTERVAL.
+        fmt (str, optional): Формат файлов: "collapsed" или "speedscope". По умолчанию "collapsed".
+        tag (str, optional): Префикс имен файлов, например процесс: server, client, mission.
+    """
+
+    def __init__(self, output_dir: str, interval: float = DEFAULT_INTERVAL, fmt: str = "collapsed", tag: str = ""):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат профиля: {fmt}")
+        self.output_dir = output_dir
+        self.interval = interval
+        self.fmt = fmt
+        self.tag = tag
+        self.samples = {}  # стек (имена кадров от корня к листу) -> количество выборок
+        self.outputs = []
+        self._frames = {}  # code -> имя кадра
+        self._files = {}  # имя кадра -> файл
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _frame_name(self, code):
+        name = self._frames.get(code)
+        if name is None:
+            name = self._frames[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._files[name] = code.co_filename
+        return name
+
+    def sample(self):
+        """
+        Снимает стеки всех потоков, кроме потока профилировщика.
+        """
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            # Подсистема определяется при сохранении: выборка только считает стеки
+            stack = tuple(stack)
+            self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def _run(self, duration):
+        deadline = time.monotonic() + duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            self.sample()
+            self._stop.wait(self.interval)
+        try:
+            self.outputs = self.save()
+            logger.info("Профиль сохранен: %s", ", ".join(self.outputs))
+        except OSError as e:
+            logger.error("Не удалось сохранить профиль в %s: %s", self.output_dir, e)
+
+    def start(self, duration: float):
+        """
+        Запускает окно профилирования в фоновом потоке.
+        :param duration: Длительность окна в секундах.
+        """
+        self._thread = threading.Thread(target=self._run, args=(duration,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Завершает окно досрочно и ждет сохранения файлов.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.outputs
+
+    def by_subsystem(self) -> dict:
+        """
+        Возвращает выборки по подсистемам: {подсистема: {стек: количество}}.
+        """
+        result = {}
+        for stack, count in self.samples.items():
+            subsystem = classify([self._files[name] for name in stack])
+            result.setdefault(subsystem, {})[stack] = count
+        return result
+
+    def save(self) -> list:
+        """
+        Сохраняет профиль по файлу на подсистему и возвращает пути к файлам.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        prefix = f"{self.tag}-" if self.tag else ""
+        outputs = []
+        for subsystem, stacks in sorted(self.by_subsystem().items()):
+            extension = "collapsed" if self.fmt == "collapsed" else "speedscope.json"
+            path = os.path.join(self.output_dir, f"{prefix}{subsystem}-{stamp}-{os.getpid()}.{extension}")
+            with open(path, "w", encoding="utf-8") as f:
+                if self.fmt == "collapsed":
+                    for stack, count in sorted(stacks.items()):
+                        f.write(f"{';'.join(stack)} {count}\n")
+                else:
+                    json.dump(self._speedscope(f"{prefix}{subsystem}", stacks), f, ensure_ascii=False)
+            outputs.append(path)
+        return outputs
+
+    def _speedscope(self, name, stacks):
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    function, _, location = frame.partition(" (")
+                    file, _, line = location.rstrip(")").rpartition(":")
+                    frames.append({"name": function, "file": file, "line": int(line)})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "drone.profiler",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": name, "unit": "seconds", "startValue": 0,
+                          "endValue": sum(weights), "samples": samples, "weights": weights}],
+        }
+
+
+_lock = threading.Lock()
+_active = None
+
+
+def start_window(seconds: float, output_dir: str = None, fmt: str = None, interval: float = None,
+                 tag: str = None):
+    """
+    Запускает окно профилирования процесса, если другое окно не выполняется.
+
+    Параметры по умолчанию берутся из переменных окружения DRONE_PROFILE_DIR
+    (каталог, по умолчанию profiles), DRONE_PROFILE_FORMAT, DRONE_PROFILE_INTERVAL
+    и DRONE_PROFILE_TAG.
+    :param seconds: Длительность окна в секундах.
+    :return: SamplingProfiler запущенного окна или None, если окно уже выполняется.
+    """
+    global _active
+    with _lock:
+        if _active is not None and _active.running:
+            return None
+        _active = SamplingProfiler(
+            output_dir or os.environ.get("DRONE_PROFILE_DIR", "profiles"),
+            interval or float(os.environ.get("DRONE_PROFILE_INTERVAL", DEFAULT_INTERVAL)),
+            fmt or os.environ.get("DRONE_PROFILE_FORMAT", "collapsed"),
+            tag if tag is not None else os.environ.get("DRONE_PROFILE_TAG", ""))
+        _active.start(seconds)
+        logger.info("Профилирование запущено на %.1f с, каталог %s", seconds, _active.output_dir)
+        return _active
+
+
+def active():
+    """
+    Возвращает профилировщик текущего или последнего окна.
+    """
+    return _active
+
+
+def start_from_env(tag: str = None):
+    """
+    Запускает окно, если задана переменная окружения DRONE_PROFILE (длительность в секундах).
+    :param tag: Префикс файлов профиля, если не задан DRONE_PROFILE_TAG.
+    """
+    seconds = float(os.environ.get("DRONE_PROFILE", 0) or 0)
+    return start_window(seconds, tag=os.environ.get("DRONE_PROFILE_TAG", tag or "")) if seconds > 0 else None
+
+
+def install_signal_handler(signum=getattr(signal, "SIGUSR2", None), seconds: float = 30.0, tag: str = None):
+    """
+    Запускает окно профилирования по сигналу (по умолчанию SIGUSR2) без перезапуска процесса.
+    :param signum: Номер сигнала; на платформах без SIGUSR2 обработчик не устанавливается.
+    :param seconds: Длительность окна; переопределяется DRONE_PROFILE.
+    :param tag: Префикс файлов профиля, если не задан DRONE_PROFILE_TAG.
+    """
+    if signum is None:
+        return
+
+    def handler(received, frame):
+        start_window(float(os.environ.get("DRONE_PROFILE", 0) or 0) or seconds,
+                     tag=os.environ.get("DRONE_PROFILE_TAG", tag or ""))
+
+    signal.signal(signum, handler)
+
+
+def main(argv=None):
+    """
+    Запускает скрипт или модуль с профилировщиком:
+        python -m drone.profiler [--seconds 30] [--tag server] server/main.py [аргументы]
+        python -m drone.profiler --tag client -m client.app
+    Окно запускается сразу, если задан --seconds или DRONE_PROFILE, и по SIGUSR2 в любой момент.
+    """
+    parser = argparse.ArgumentParser(prog="python -m drone.profiler", description="Выборочное профилирование процесса")
+    parser.add_argument("--seconds", type=float, help="Начать окно профилирования сразу, длительность в секундах")
+    parser.add_argument("--output-dir", help="Каталог профилей (DRONE_PROFILE_DIR)")
+    parser.add_argument("--format", choices=FORMATS, help="Формат профилей (DRONE_PROFILE_FORMAT)")
+    parser.add_argument("--interval", type=float, help="Интервал выборки, с (DRONE_PROFILE_INTERVAL)")
+    parser.add_argument("--tag", help="Префикс файлов профиля (DRONE_PROFILE_TAG)")
+    parser.add_argument("-m", dest="module", help="Запустить модуль, а не скрипт")
+    parser.add_argument("target", nargs=argparse.REMAINDER, help="Скрипт и его аргументы")
+    arguments = parser.parse_args(argv)
+    for option, variable in (("output_dir", "DRONE_PROFILE_DIR"), ("format", "DRONE_PROFILE_FORMAT"),
+                             ("interval", "DRONE_PROFILE_INTERVAL"), ("tag", "DRONE_PROFILE_TAG"),
+                             ("seconds", "DRONE_PROFILE")):
+        if getattr(arguments, option) is not None:
+            os.environ[variable] = str(getattr(arguments, option))
+
+    install_signal_handler()
+    start_from_env()
+    if arguments.module:
+        sys.argv = [arguments.module] + arguments.target
+        runpy.run_module(arguments.module, run_name="__main__", alter_sys=True)
+    elif arguments.target:
+        script = arguments.target[0]
+        sys.argv = arguments.target
+        # Как при запуске python script.py: каталог скрипта первым в sys.path
+        sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+        runpy.run_path(script, run_name="__main__")
+    else:
+        parser.error("Не указан скрипт или модуль")
+    if _active is not None:
+        _active.stop()
+
+
+if __name__ == "__main__":
+    # python -m drone.profiler выполняет файл как __main__, а приложение импортирует
+    # модуль как profiler из каталога drone: окна запускаются в этом модуле, одном на процесс
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import profiler
+    profiler.main()
@@ -0,0 +1,234 @@
+import json
+import math
+import time
+
+from clock import IClock, VirtualClock
+from flight_recorder import CHANNELS
+
+# Каналы команд: их записи передаются стратегиям миссий, остальные — наблюдателям сенсоров
+COMMAND_CHANNELS = frozenset({"takeoff", "move_forward", "turn", "land", "return_to_base"})
+
+_CHANNEL_NAMES = {code: name for name, code in CHANNELS.items()}
+
+
+def _decode_position(values):
+    return {"position": tuple(values)}
+
+
+# Преобразование записей телеметрии в данные наблюдателей SensorObserver.update
+DEFAULT_DECODERS = {
+    "telemetry": lambda values: {"values": tuple(values)},
+    "position": _decode_position,
+    "battery": lambda values: {"battery_level": values[0]},
+    "wind": lambda values: {"wind": tuple(values)},
+    "obstacle": lambda values: {"distance": values[0]},
+}
+
+
+def _json_value(value):
+    # Кортежи и числа NumPy приводятся к виду, который совпадает после сохранения трассы в JSON
+    return json.loads(json.dumps(value, default=float))
+
+
+class ReplayCommand:
+    """
+    Записанная команда, которую стратегия миссии выполняет при воспроизведении.
+
+    IFlightStrategy вызывает command.execute() синхронно, поэтому команда не
+    обращается к дрону, а добавляет событие в трассу воспроизведения.
+    """
+
+    def __init__(self, replay, timestamp: float, drone_id: str, name: str, values: tuple):
+        self.timestamp = timestamp
+        self.drone_id = drone_id
+        self.name = name
+        self.values = values
+        self._replay = replay
+
+    def execute(self):
+        self._replay.emit(self.timestamp, "command", self.drone_id, [self.name, list(self.values)])
+
+
+class ReplayResult:
+    """
+    Результат воспроизведения: трасса выходов и затраты времени.
+
+    Args:
+        trace (list): События [время, вид, источник, данные] в порядке возникновения.
+        events (int): Количество воспроизведенных записей.
+        duration (float): Длительность записи в секундах полетного времени.
+        wall_time (float): Реальное время воспроизведения в секундах.
+    """
+
+    def __init__(self, trace: list, events: int, duration: float, wall_time: float):
+        self.trace = trace
+        self.events = events
+        self.duration = duration
+        self.wall_time = wall_time
+
+    @property
+    def speedup(self) -> float:
+        """
+        Во сколько раз воспроизведение быстрее реального полета.
+        """
+        return self.duration / self.wall_time if self.wall_time > 0 else math.inf
+
+    def save(self, path: str):
+        """
+        Сохраняет трассу в JSON как эталон для сравнения последующих прогонов.
+        :param path: Путь к файлу.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"events": self.events, "duration": self.duration, "wall_time": self.wall_time,
+                       "trace": self.trace}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["trace"], data["events"], data["duration"], data["wall_time"])
+
+
+class MissionReplay:
+    """
+    Детерминированное воспроизведение записанного полета.
+
+    Записи FlightDataReader передаются в порядке меток времени: телеметрия
+    декодируется и рассылается наблюдателям через subject.notify_observers
+    (SensorManager), команды собираются в миссии и выполняются стратегиями
+    IFlightStrategy дронов. Миссия дрона — непрерывная последовательность его
+    команд: она передается стратегии, когда приходит телеметрия этого дрона или
+    заканчивается запись.
+
+    Между записями выдерживается пауза (разница меток) / speed на часах clock.
+    С VirtualClock (по умолчанию) паузы не ждут реального времени, но наблюдатели,
+    читающие clock.now(), видят время полета в ускоренном масштабе. Выходы
+    фиксируются в трассе: выполненные команды и изменения значений probes после
+    каждой записи. Трассы двух прогонов сравниваются diff_traces.
+
+    Args:
+        reader (FlightDataReader): Источник записей самописца.
+        subject (SensorManager, optional): Рассылает данные телеметрии наблюдателям.
+        strategies (dict, optional): Стратегии миссий {drone_id: IFlightStrategy}.
+        probes (dict, optional): Наблюдаемые выходы {имя: функция без аргументов}.
+        decoders (dict, optional): Декодеры каналов телеметрии. По умолчанию DEFAULT_DECODERS.
+        clock (IClock, optional): Часы воспроизведения. По умолчанию VirtualClock.
+        speed (float, optional): Ускорение относительно записи. По умолчанию 100.
+    """
+
+    def __init__(self, reader, subject=None, strategies: dict = None, probes: dict = None,
+                 decoders: dict = None, clock: IClock = None, speed: float = 100.0):
+        self.reader = reader
+        self.subject = subject
+        self.strategies = strategies or {}
+        self.probes = probes or {}
+        self.decoders = DEFAULT_DECODERS if decoders is None else decoders
+        self.clock = clock or VirtualClock()
+        self.speed = speed
+        self.trace = []
+        self._probe_values = {}
+        self._pending = {}  # drone_id -> список ReplayCommand текущей миссии
+
+    def emit(self, timestamp: float, kind: str, source: str, payload):
+        """
+        Добавляет событие в трассу воспроизведения.
+        :param timestamp: Метка времени записи, вызвавшей событие.
+        :param kind: Вид события: "command" или "state".
+        :param source: Дрон или имя наблюдаемого выхода.
+        :param payload: Данные события.
+        """
+        self.trace.append([timestamp, kind, source, _json_value(payload)])
+
+    def _flush_mission(self, drone_id: str):
+        commands = self._pending.pop(drone_id, None)
+        if not commands:
+            return
+        strategy = self.strategies.get(drone_id)
+        if strategy is None:
+            for command in commands:
+                command.execute()
+        else:
+            strategy.execute(commands)
+
+    def _sample_probes(self, timestamp: float):
+        for name, probe in self.probes.items():
+            value = _json_value(probe())
+            if self._probe_values.get(name, self) != value:
+                self._probe_values[name] = value
+                self.trace.append([timestamp, "state", name, value])
+
+    async def run(self, start: float = -math.inf, end: float = math.inf) -> ReplayResult:
+        """
+        Воспроизводит записи интервала [start, end).
+        :param start: Начало интервала.
+        :param end: Конец интервала (не включается).
+        :return: ReplayResult с трассой выходов.
+        """
+        self.trace = []
+        self._probe_values = {}
+        self._pending = {}
+        events = 0
+        first = previous = None
+        started = time.perf_counter()
+        self._sample_probes(start if math.isfinite(start) else 0.0)
+        for block in self.reader.segments(start, end):
+            # Столбцы извлекаются из отображенного файла целиком, а не по записи
+            timestamps = block["timestamp"].tolist()
+            drone_ids = block["drone_id"].tolist()
+            channels = block["channel"].tolist()
+            counts = block["count"].tolist()
+            values = block["values"].tolist()
+            for timestamp, drone_id, code, count, row in zip(timestamps, drone_ids, channels, counts, values):
+                if first is None:
+                    first = timestamp
+                elif self.speed:
+                    await self.clock.sleep((timestamp - previous) / self.speed)
+                previous = timestamp
+                drone_id = drone_id.decode("utf-8")
+                channel = _CHANNEL_NAMES.get(code, str(code))
+                row = tuple(row[:count])
+                if channel in COMMAND_CHANNELS:
+                    self._pending.setdefault(drone_id, []).append(
+                        ReplayCommand(self, timestamp, drone_id, channel, row))
+                else:
+                    self._flush_mission(drone_id)
+                    decoder = self.decoders.get(channel)
+                    if decoder is not None and self.subject is not None:
+                        self.subject.notify_observers(decoder(row))
+                self._sample_probes(timestamp)
+                events += 1
+        for drone_id in list(self._pending):
+            self._flush_mission(drone_id)
+        if previous is not None:
+            self._sample_probes(previous)
+        duration = previous - first if first is not None else 0.0
+        return ReplayResult(self.trace, events, duration, time.perf_counter() - started)
+
+
+def diff_traces(expected: list, actual: list, tolerance: float = 1e-9, limit: int = 20) -> list:
+    """
+    Сравнивает трассы двух прогонов воспроизведения.
+    :param expected: Эталонная трасса (например, ReplayResult.load(...).trace).
+    :param actual: Трасса текущего прогона.
+    :param tolerance: Допустимое абсолютное расхождение чисел.
+    :param limit: Максимальное количество возвращаемых расхождений.
+    :return: Список (индекс события, ожидаемое событие, фактическое событие); пустой, если трассы совпадают.
+    """
+    differences = []
+    for index in range(max(len(expected), len(actual))):
+        left = expected[index] if index < len(expected) else None
+        right = actual[index] if index < len(actual) else None
+        if not _same(left, right, tolerance):
+            differences.append((index, left, right))
+            if len(differences) >= limit:
+                break
+    return differences
+
+
+def _same(left, right, tolerance):
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)) \
+            and not isinstance(left, bool) and not isinstance(right, bool):
+        return abs(left - right) <= tolerance
+    if isinstance(left, list) and isinstance(right, list):
+        return len(left) == len(right) and all(_same(a, b, tolerance) for a, b in zip(left, right))
+    return left == right
@@ -1,14 +1,36 @@
+import hashlib
 import jwt
 import logging
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 
-# Настройка логирования
-logging.basicConfig(filename='security.log', level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+# Журнал безопасности; файл security.log подключает client.logging_config.setup_logging
+logger = logging.getLogger('security')
 
 class SafetyCheck:
-    def __init__(self, secret_key: str):
+    """
+    Декоратор команд, пропускающий только вызовы с действительным JWT.
+
+    Проверенные токены хранятся в ограниченном LRU-кэше по SHA-256 дайджесту до
+    истечения claim exp (но не дольше max_ttl), поэтому поток команд от одного
+    оператора не повторяет jwt.decode и проверку HMAC для каждой команды. Кэш
+    защищен блокировкой: один экземпляр декоратора вызывается из разных потоков.
+
+    Args:
+        secret_key (str): Секретный ключ подписи HS256.
+        cache_size (int, optional): Максимальное количество токенов в кэше. По умолчанию 1024.
+        max_ttl (float, optional): Максимальное время жизни записи кэша в секундах. По умолчанию 300.
+    """
+
+    def __init__(self, secret_key: str, cache_size: int = 1024, max_ttl: float = 300.0):
         self.__secret_key = secret_key
+        self.cache_size = cache_size
+        self.max_ttl = max_ttl
+        self.__verified = OrderedDict()  # дайджест токена -> время истечения
+        self.__revoked = {}  # дайджест токена -> время истечения
+        self.__lock = threading.Lock()
 
     def __call__(self, func):
         @wraps(func)
@@ -18,18 +40,54 @@ class SafetyCheck:
                 if self.check_token(token):
                     return func(*args, **kwargs)
                 else:
-                    logging.warning("Команда отклонена: неверный токен")
+                    logger.warning("Команда отклонена: неверный токен")
                     return None
             except Exception as e:
-                logging.error(f"Ошибка при выполнении команды: {e}")
+                logger.error("Ошибка при выполнении команды: %s", e)
                 return None
 
         return wrapper
 
     def check_token(self, token):
+        digest = hashlib.sha256(token.encode('utf-8')).digest() if isinstance(token, str) else None
+        now = time.time()
+        if digest is not None:
+            with self.__lock:
+                if self.__revoked.get(digest, 0) > now:
+                    logger.warning("Токен отозван")
+                    return False
+                expires = self.__verified.get(digest)
+                if expires is not None:
+                    if expires > now:
+                        self.__verified.move_to_end(digest)
+                        return True
+                    del self.__verified[digest]
+        # Подпись проверяется вне блокировки, чтобы не задерживать команды с другими токенами
         try:
-            jwt.decode(token, self.__secret_key, algorithms=['HS256'])
-            return True
+            claims = jwt.decode(token, self.__secret_key, algorithms=['HS256'])
         except jwt.InvalidTokenError as e:
-            logging.warning("Ошибка декодирования токена: %s", e)
-            return False
\ No newline at end of file
+            logger.warning("Ошибка декодирования токена: %s", e)
+            return False
+        if digest is not None:
+            with self.__lock:
+                # Токен мог быть отозван, пока проверялась подпись
+                if self.__revoked.get(digest, 0) > now:
+                    logger.warning("Токен отозван")
+                    return False
+                self.__verified[digest] = min(claims.get('exp', float('inf')), now + self.max_ttl)
+                if len(self.__verified) > self.cache_size:
+                    self.__verified.popitem(last=False)
+        return True
+
+    def revoke(self, token, expires: float = float('inf')):
+        """
+        Отзывает токен: удаляет его из кэша и отклоняет до момента expires.
+        :param token: Отзываемый токен.
+        :param expires: Время истечения токена (claim exp). По умолчанию бессрочно.
+        """
+        digest = hashlib.sha256(token.encode('utf-8')).digest()
+        now = time.time()
+        with self.__lock:
+            self.__verified.pop(digest, None)
+            self.__revoked = {key: value for key, value in self.__revoked.items() if value > now}
+            self.__revoked[digest] = expires
\ No newline at end of file
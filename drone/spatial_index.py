@@ -0,0 +1,230 @@
+import math
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Пространственный индекс позиций дронов на равномерной сетке
+class SpatialIndex:
+    """
+    Индекс позиций дронов на плоскости (x, y) на основе равномерной сетки.
+
+    Каждая позиция попадает в ячейку размером cell_size. Обновление позиции дрона
+    стоит O(1), а запросы по радиусу и поиск ближайшего соседа просматривают только
+    ячейки вокруг точки запроса, а не весь флот. Для проверки минимальной дистанции
+    между дронами размер ячейки лучше выбирать равным этой дистанции.
+
+    Args:
+        cell_size (float): Размер ячейки сетки в метрах.
+    """
+
+    def __init__(self, cell_size: float = 10.0):
+        if cell_size <= 0:
+            raise ValueError(f"Размер ячейки должен быть положительным: {cell_size}")
+        self.cell_size = cell_size
+        self._positions = {}  # drone_id -> (x, y)
+        self._cells = defaultdict(set)  # (cx, cy) -> {drone_id}
+        # Охватывающий прямоугольник занятых ячеек [min_cx, min_cy, max_cx, max_cy]. При удалении
+        # не сужается: завышенная граница остается верной, а пересчет стоил бы обхода всех ячеек.
+        self._bounds = None
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, drone_id):
+        return drone_id in self._positions
+
+    def _cell(self, position):
+        return (math.floor(position[0] / self.cell_size), math.floor(position[1] / self.cell_size))
+
+    def update(self, drone_id, position):
+        """
+        Добавляет дрон в индекс или обновляет его позицию.
+        :param drone_id: Идентификатор дрона.
+        :param position: Координаты (x, y).
+        """
+        position = (float(position[0]), float(position[1]))
+        new_cell = self._cell(position)
+        old_position = self._positions.get(drone_id)
+        if old_position is not None:
+            old_cell = self._cell(old_position)
+            if old_cell != new_cell:
+                self._discard(old_cell, drone_id)
+                self._add(new_cell, drone_id)
+        else:
+            self._add(new_cell, drone_id)
+        self._positions[drone_id] = position
+
+    def _add(self, cell, drone_id):
+        self._cells[cell].add(drone_id)
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            bounds = self._bounds
+            bounds[0], bounds[1] = min(bounds[0], cell[0]), min(bounds[1], cell[1])
+            bounds[2], bounds[3] = max(bounds[2], cell[0]), max(bounds[3], cell[1])
+
+    def remove(self, drone_id):
+        """
+        Удаляет дрон из индекса. Отсутствующий дрон игнорируется.
+        :param drone_id: Идентификатор дрона.
+        """
+        position = self._positions.pop(drone_id, None)
+        if position is not None:
+            self._discard(self._cell(position), drone_id)
+
+    def position(self, drone_id):
+        """
+        Возвращает последнюю известную позицию дрона или None.
+        """
+        return self._positions.get(drone_id)
+
+    def _discard(self, cell, drone_id):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(drone_id)
+            if not members:
+                del self._cells[cell]
+                if not self._cells:
+                    self._bounds = None
+
+    def _ring(self, center, radius):
+        """Ячейки на границе квадрата с полуразмером radius (в ячейках) внутри охватывающего прямоугольника."""
+        cx, cy = center
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        if radius == 0:
+            yield center
+            return
+        x_range = range(max(cx - radius, min_cx), min(cx + radius, max_cx) + 1)
+        for y in (cy - radius, cy + radius):
+            if min_cy <= y <= max_cy:
+                for x in x_range:
+                    yield x, y
+        y_range = range(max(cy - radius + 1, min_cy), min(cy + radius - 1, max_cy) + 1)
+        for x in (cx - radius, cx + radius):
+            if min_cx <= x <= max_cx:
+                for y in y_range:
+                    yield x, y
+
+    def within_radius(self, position, radius: float, exclude=None):
+        """
+        Возвращает дроны в пределах радиуса от точки, отсортированные по расстоянию.
+
+        Args:
+            position (tuple): Координаты точки (x, y).
+            radius (float): Радиус поиска в метрах.
+            exclude (optional): Идентификатор дрона, который нужно исключить из результата.
+
+        Returns:
+            list: Список пар (drone_id, distance).
+        """
+        x, y = position
+        min_cx, min_cy = self._cell((x - radius, y - radius))
+        max_cx, max_cy = self._cell((x + radius, y + radius))
+        radius_sq = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for drone_id in self._cells.get((cx, cy), ()):
+                    if drone_id == exclude:
+                        continue
+                    px, py = self._positions[drone_id]
+                    distance_sq = (px - x) ** 2 + (py - y) ** 2
+                    if distance_sq <= radius_sq:
+                        found.append((drone_id, math.sqrt(distance_sq)))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, position, k: int = 1, exclude=None):
+        """
+        Находит k ближайших к точке дронов.
+
+        Поиск расширяется кольцами ячеек вокруг точки и останавливается, как только
+        ближайшая непросмотренная ячейка оказывается дальше k-го найденного дрона.
+        Кольца ограничены охватывающим прямоугольником занятых ячеек, поэтому запрос
+        вдали от флота не перебирает пустые ячейки между точкой и флотом.
+
+        Args:
+            position (tuple): Координаты точки (x, y).
+            k (int): Количество соседей.
+            exclude (optional): Идентификатор дрона, который нужно исключить из результата.
+
+        Returns:
+            list: Список пар (drone_id, distance), отсортированный по расстоянию.
+        """
+        available = len(self._positions) - (1 if exclude in self._positions else 0)
+        k = min(k, available)
+        if k <= 0:
+            return []
+        x, y = position
+        center = self._cell(position)
+        cx, cy = center
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        # Кольца ближе first_ring не пересекают прямоугольник, после last_ring просмотрены все ячейки
+        first_ring = max(0, min_cx - cx, cx - max_cx, min_cy - cy, cy - max_cy)
+        last_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy)
+        candidates = []
+        ring = first_ring
+        while True:
+            for cell in self._ring(center, ring):
+                for drone_id in self._cells.get(cell, ()):
+                    if drone_id == exclude:
+                        continue
+                    px, py = self._positions[drone_id]
+                    candidates.append((math.hypot(px - x, py - y), drone_id))
+            if len(candidates) >= k:
+                candidates.sort(key=lambda item: item[0])
+                # Все непросмотренные ячейки лежат не ближе ring * cell_size от точки
+                if candidates[k - 1][0] <= ring * self.cell_size or ring >= last_ring:
+                    break
+            ring += 1
+        return [(drone_id, distance) for distance, drone_id in candidates[:k]]
+
+    def separation_violations(self, min_distance: float):
+        """
+        Возвращает все пары дронов, находящихся ближе min_distance друг к другу.
+
+        Каждая пара ячеек просматривается один раз, поэтому при равномерном
+        распределении дронов стоимость запроса линейна по их числу.
+
+        Args:
+            min_distance (float): Минимально допустимая дистанция в метрах.
+
+        Returns:
+            list: Список кортежей (drone_id_a, drone_id_b, distance), отсортированный по расстоянию.
+        """
+        reach = max(1, math.ceil(min_distance / self.cell_size))
+        min_distance_sq = min_distance * min_distance
+        violations = []
+        for (cx, cy), members in self._cells.items():
+            for dx in range(-reach, reach + 1):
+                for dy in range(-reach, reach + 1):
+                    neighbour = (cx + dx, cy + dy)
+                    # Каждая пара ячеек проверяется только в одном направлении
+                    if neighbour < (cx, cy):
+                        continue
+                    others = self._cells.get(neighbour)
+                    if not others:
+                        continue
+                    for drone_a in members:
+                        ax, ay = self._positions[drone_a]
+                        for drone_b in others:
+                            if neighbour == (cx, cy) and not _ordered(drone_a, drone_b):
+                                continue
+                            bx, by = self._positions[drone_b]
+                            distance_sq = (ax - bx) ** 2 + (ay - by) ** 2
+                            if distance_sq < min_distance_sq:
+                                violations.append((drone_a, drone_b, math.sqrt(distance_sq)))
+        violations.sort(key=lambda item: item[2])
+        if violations:
+            logger.warning("Нарушение дистанции между дронами: %d пар(ы)", len(violations))
+        return violations
+
+
+def _ordered(drone_a, drone_b):
+    """Порядок пары внутри одной ячейки, чтобы каждая пара учитывалась один раз.
+
+    Идентификаторы разных типов (1 и "1") упорядочиваются по имени типа, а не приводятся к строке.
+    """
+    return (type(drone_a).__name__, drone_a) < (type(drone_b).__name__, drone_b)
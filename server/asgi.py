@@ -0,0 +1,377 @@
+import asyncio
+import io
+import json
+import math
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt as pyjwt
+from flask_jwt_extended import decode_token
+
+from drone_gateway import DroneGatewayError, NativeAsyncDroneGateway
+from drone_routes import (BROADCAST_SCHEMA, TAKEOFF_SCHEMA, CommandError, broadcast_line, plan_broadcast,
+                          takeoff_request, takeoff_result)
+from idempotency import (IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, IdempotencyCache, IdempotencyConflict,
+                         idempotency_cache, scoped_key)
+from main import app as flask_app
+import rate_limit
+from rate_limit import RateLimitExceeded
+from schema import SchemaError, compile_schema
+from token_cache import token_cache
+
+# Маршруты, которые обрабатываются асинхронно без занятия потока на время ожидания дрона
+TAKEOFF_PATH = re.compile(r"^/drones/(?P<drone_id>[^/]+)/takeoff$")
+COMMANDS_PATH = "/drones/commands"
+
+JSON_HEADERS = [("Content-Type", "application/json")]
+IDEMPOTENT_WAIT_TIMEOUT = 30.0
+
+_validate_takeoff = compile_schema(TAKEOFF_SCHEMA)
+_validate_broadcast = compile_schema(BROADCAST_SCHEMA)
+
+
+class HTTPError(Exception):
+    """Ответ об ошибке, формируемый асинхронным обработчиком.
+
+    Аргументы:
+        status (int): HTTP статус ответа.
+        body (dict): Тело ответа.
+        headers (list): Дополнительные заголовки ответа.
+    """
+
+    def __init__(self, status, body, headers=()):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+        self.headers = list(headers)
+
+
+def _encode(body):
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+async def _send(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+                   + [(b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status, body, headers=()):
+    await _send(send, status, JSON_HEADERS + list(headers), _encode(body))
+
+
+async def _read_body(receive):
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+def _parse_json(scope, body):
+    """Проверяет, что тело запроса — JSON, и разбирает его."""
+    headers = dict(scope["headers"])
+    content_type = headers.get(b"content-type", b"").split(b";")[0].strip()
+    if content_type != b"application/json" and not content_type.endswith(b"+json"):
+        raise HTTPError(400, {"error": "Запрос должен быть в формате JSON"})
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+async def _idempotent(scope, claims, key, body, command):
+    """Выполняет команду один раз на ключ идемпотентности, см. idempotency.idempotent."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        command.close()
+        raise HTTPError(400, {"error": f"Заголовок {IDEMPOTENCY_HEADER} должен содержать от 1 до "
+                                       f"{MAX_KEY_LENGTH} символов"})
+    key = scoped_key(claims.get("sub"), scope["path"], key)
+    try:
+        future, owner = idempotency_cache.begin(key, IdempotencyCache.fingerprint(body))
+    except IdempotencyConflict:
+        command.close()
+        raise HTTPError(422, {"error": f"{IDEMPOTENCY_HEADER} уже использован с другим телом запроса"})
+    if not owner:
+        command.close()
+        try:
+            # shield: отмена ожидания не должна отменять Future владельца
+            status, headers, content = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                                              IDEMPOTENT_WAIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPError(409, {"error": "Команда с этим ключом еще выполняется"})
+        return status, list(headers) + [("Idempotent-Replayed", "true")], content
+    try:
+        status, headers, content = await command
+    except BaseException as e:
+        idempotency_cache.fail(key, future, e)
+        raise
+    idempotency_cache.complete(key, future, status, headers, content)
+    return status, headers, content
+
+
+def _validate(validate, data):
+    try:
+        return validate(data)
+    except SchemaError as e:
+        raise HTTPError(400, {"error": "Запрос не соответствует схеме", "details": e.errors})
+
+
+def authenticate(scope):
+    """Проверяет JWT из заголовка Authorization так же, как authenticated_route.
+
+    Токен декодируется через CachingJWTManager приложения, поэтому подпись уже
+    проверенного токена повторно не проверяется, а тип токена и отзыв проверяются
+    на каждом запросе. Коды ошибок совпадают с ответами Flask-JWT-Extended.
+
+    Аргументы:
+        scope (dict): ASGI scope запроса.
+
+    Возвращает:
+        dict: Claims токена.
+    """
+    header = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = header.partition(" ")
+    if scheme != "Bearer" or not token:
+        raise HTTPError(401, {"msg": "Missing Authorization Header"})
+    try:
+        with flask_app.app_context():
+            claims = decode_token(token)
+    except pyjwt.ExpiredSignatureError:
+        raise HTTPError(401, {"msg": "Token has expired"})
+    except pyjwt.InvalidTokenError as e:
+        raise HTTPError(422, {"msg": str(e)})
+    if claims.get("type") != "access":
+        raise HTTPError(422, {"msg": "Only non-refresh tokens are allowed"})
+    if token_cache.is_revoked(claims.get("jti")):
+        raise HTTPError(401, {"msg": "Token has been revoked"})
+    return claims
+
+
+def _too_many_requests(error):
+    return HTTPError(429, {"error": "Слишком много запросов", "retry_after": round(error.retry_after, 3)},
+                     [("Retry-After", str(max(1, math.ceil(error.retry_after))))])
+
+
+def _check_limits(user_key, drone_key=None):
+    try:
+        rate_limit.check_limits(user_key, drone_key)
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+
+
+async def _admit(user_key, drone_key=None, critical=False):
+    """Занимает место в rate_limit.admission, как rate_limited для маршрутов Flask.
+
+    При отказе токены, списанные _check_limits, возвращаются. Каждому успешному
+    вызову соответствует rate_limit.admission.release().
+    """
+    try:
+        await rate_limit.admission.acquire_async(critical)
+    except RateLimitExceeded as e:
+        rate_limit.refund_limits(user_key, drone_key)
+        raise _too_many_requests(e)
+
+
+class WSGIBridge:
+    """Выполняет WSGI-приложение в пуле потоков и отдает ответ по протоколу ASGI.
+
+    В отличие от asgiref.wsgi.WsgiToAsgi, запросы не сериализуются в одном потоке:
+    каждый выполняется в свободном потоке пула, как в многопоточном werkzeug.
+    Тело ответа собирается целиком, потоковые маршруты обслуживаются нативно.
+
+    Аргументы:
+        wsgi_app: WSGI-приложение.
+        max_workers (int): Размер пула потоков.
+    """
+
+    def __init__(self, wsgi_app, max_workers=32):
+        self.wsgi_app = wsgi_app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wsgi")
+
+    @staticmethod
+    def _environ(scope, body):
+        server_name, server_port = scope.get("server") or ("localhost", 80)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server_name,
+            "SERVER_PORT": str(server_port),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope["headers"]:
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = "HTTP_" + name
+            environ[name] = environ[name] + "," + value if name in environ else value
+        return environ
+
+    def _run(self, environ):
+        response = []
+
+        def start_response(status, headers, exc_info=None):
+            response[:] = [int(status.split(" ", 1)[0]), headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            body = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return response[0], response[1], body
+
+    async def __call__(self, scope, receive, send):
+        body = await _read_body(receive)
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(self._executor, self._run, self._environ(scope, body))
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]})
+        await send({"type": "http.response.body", "body": body})
+
+
+class DroneASGIApp:
+    """ASGI-приложение сервера.
+
+    Команды дронам (взлет и групповая рассылка) выполняются в цикле событий
+    через NativeAsyncDroneGateway: пока дрон отвечает, воркер обслуживает другие
+    запросы, а не держит поток. Остальные маршруты передаются Flask-приложению
+    через WSGIBridge и выполняются в пуле потоков.
+
+    Аргументы:
+        wsgi_app: Flask-приложение для остальных маршрутов.
+        gateway_factory (function): Создает асинхронный шлюз команд в цикле событий воркера.
+    """
+
+    def __init__(self, wsgi_app=flask_app, gateway_factory=NativeAsyncDroneGateway):
+        self.wsgi = WSGIBridge(wsgi_app)
+        self.gateway_factory = gateway_factory
+        self._gateway = None
+
+    @property
+    def gateway(self):
+        # Клиент httpx привязан к циклу событий, поэтому создается в нем при первом запросе
+        if self._gateway is None:
+            self._gateway = self.gateway_factory()
+        return self._gateway
+
+    async def close(self):
+        if self._gateway is not None:
+            await self._gateway.close()
+            self._gateway = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "POST":
+            match = TAKEOFF_PATH.match(scope["path"])
+            if match:
+                return await self._handle(self.takeoff, scope, receive, send, match["drone_id"])
+            if scope["path"] == COMMANDS_PATH:
+                return await self._handle(self.broadcast, scope, receive, send)
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle(self, handler, scope, receive, send, *args):
+        try:
+            await handler(scope, receive, send, *args)
+        except HTTPError as e:
+            await _send_json(send, e.status, e.body, e.headers)
+
+    async def takeoff(self, scope, receive, send, drone_id):
+        """Асинхронный вариант POST /drones/<drone_id>/takeoff с теми же ответами.
+
+        Повтор с тем же заголовком Idempotency-Key ждет результата исходной команды
+        в общем idempotency_cache, а не отправляет команду дрону снова.
+        """
+        claims = authenticate(scope)
+        body = await _read_body(receive)
+        key = dict(scope["headers"]).get(b"idempotency-key")
+        command = self._takeoff(scope, body, claims, drone_id)
+        if key is None:
+            status, headers, content = await command
+        else:
+            status, headers, content = await _idempotent(scope, claims, key.decode("latin-1"), body, command)
+        await _send(send, status, headers, content)
+
+    async def _takeoff(self, scope, body, claims, drone_id):
+        user_key, drone_key = f"user:{claims.get('sub')}", f"drone:{drone_id}"
+        try:
+            _check_limits(user_key, drone_key)
+            await _admit(user_key, drone_key)
+            try:
+                payload = _validate(_validate_takeoff, _parse_json(scope, body))
+                try:
+                    url, command = takeoff_request(drone_id, payload)
+                except CommandError as e:
+                    raise HTTPError(e.status, e.body)
+                try:
+                    response = await self.gateway.post(url, json=command)
+                except DroneGatewayError as e:
+                    response = e
+            finally:
+                rate_limit.admission.release()
+            result, status = takeoff_result(drone_id, response)
+            return status, JSON_HEADERS, _encode(result)
+        except HTTPError as e:
+            return e.status, JSON_HEADERS + e.headers, _encode(e.body)
+
+    async def broadcast(self, scope, receive, send):
+        """Асинхронный вариант POST /drones/commands: результаты передаются потоком NDJSON.
+
+        Место в rate_limit.admission занято до отправки последнего фрагмента тела;
+        посадка и возврат на базу используют резерв мест.
+        """
+        claims = authenticate(scope)
+        user_key = f"user:{claims.get('sub')}"
+        _check_limits(user_key)
+        data = _parse_json(scope, await _read_body(receive))
+        critical = isinstance(data, dict) and data.get("command") in rate_limit.CRITICAL_COMMANDS
+        await _admit(user_key, critical=critical)
+        try:
+            payload = _validate(_validate_broadcast, data)
+            try:
+                commands, max_concurrency, skipped = plan_broadcast(payload)
+            except CommandError as e:
+                raise HTTPError(e.status, e.body)
+
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/x-ndjson")]})
+            for line in skipped:
+                await send({"type": "http.response.body", "body": _encode(line) + b"\n", "more_body": True})
+            async for drone_id, result in self.gateway.broadcast(commands, max_concurrency):
+                line = broadcast_line(drone_id, result)
+                await send({"type": "http.response.body", "body": _encode(line) + b"\n", "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            rate_limit.admission.release()
+
+
+app = DroneASGIApp()
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger('drone_app')
+
+
+class DroneGatewayError(Exception):
+    """Ошибка связи с дроном: таймаут, обрыв соединения или исчерпание повторов."""
+
+
+class DroneGateway:
+    """Шлюз команд дронам с пулом keep-alive соединений на каждый хост.
+
+    Для каждого хоста дрона создается отдельная requests.Session с собственным
+    пулом соединений, поэтому повторные команды не открывают новое TCP-соединение,
+    а зависший дрон не занимает соединения других дронов. Повторы выполняются
+    только при ошибке установки соединения: команда, которая могла дойти до
+    дрона, повторно не отправляется.
+
+    Аргументы:
+        connect_timeout (float): Таймаут установки соединения в секундах.
+        read_timeout (float): Таймаут ожидания ответа в секундах.
+        retries (int): Число повторов при ошибке соединения.
+        backoff_factor (float): Множитель экспоненциальной паузы между повторами.
+        pool_size (int): Максимум keep-alive соединений на хост.
+    """
+
+    def __init__(self, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff_factor=0.1, pool_size=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, url):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    retry = Retry(total=self.retries, connect=self.retries, read=0, status=0,
+                                  other=0, backoff_factor=self.backoff_factor, allowed_methods=None)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                                          max_retries=retry)
+                    session.mount(host, adapter)
+                    self._sessions[host] = session
+        return session
+
+    def post(self, url, json=None):
+        """Отправляет команду дрону методом POST.
+
+        Аргументы:
+            url (str): Полный URL команды дрона.
+            json (dict): Тело команды.
+
+        Возвращает:
+            requests.Response: Ответ дрона.
+
+        Исключения:
+            DroneGatewayError: Если дрон не ответил за отведенное время или недоступен.
+        """
+        try:
+            return self._session(url).post(url, json=json, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.error("Ошибка связи с дроном %s: %s", url, e)
+            raise DroneGatewayError(str(e)) from e
+
+    def broadcast(self, commands, max_concurrency=16):
+        """Рассылает команды нескольким дронам параллельно.
+
+        Аргументы:
+            commands (list): Список кортежей (drone_id, url, json).
+            max_concurrency (int): Максимум одновременно выполняемых команд.
+
+        Возвращает:
+            generator: Пары (drone_id, requests.Response или DroneGatewayError) в порядке завершения.
+        """
+        if not commands:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(commands)),
+                                thread_name_prefix='drone-broadcast') as executor:
+            futures = {executor.submit(self.post, url, json): drone_id for drone_id, url, json in commands}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except DroneGatewayError as e:
+                    yield futures[future], e
+
+    def close(self):
+        """Закрывает все пулы соединений."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+class AsyncDroneGateway:
+    """Асинхронный вариант шлюза команд поверх пулов соединений DroneGateway.
+
+    Блокирующие вызовы выполняются в ограниченном пуле потоков, поэтому число
+    одновременных запросов к дронам не превышает max_workers, а цикл событий
+    не блокируется.
+
+    Аргументы:
+        gateway (DroneGateway): Синхронный шлюз с пулами соединений.
+        max_workers (int): Максимум одновременно выполняемых команд.
+    """
+
+    def __init__(self, gateway=None, max_workers=32):
+        self.gateway = gateway or DroneGateway(pool_size=max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='drone-gateway')
+
+    async def post(self, url, json=None):
+        """Асинхронно отправляет команду дрону. Исключения совпадают с DroneGateway.post."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.gateway.post, url, json)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.gateway.close()
+
+
+class NativeAsyncDroneGateway:
+    """Неблокирующий шлюз команд на httpx.AsyncClient для ASGI-приложения.
+
+    Запросы выполняются в цикле событий без потоков: ожидание ответа дрона не
+    занимает поток воркера. Как и в DroneGateway, у каждого хоста дрона свой
+    клиент с пулом keep-alive соединений, повторяются только ошибки установки
+    соединения, таймауты те же.
+
+    Аргументы:
+        connect_timeout (float): Таймаут установки соединения в секундах.
+        read_timeout (float): Таймаут ожидания ответа в секундах.
+        retries (int): Число повторов при ошибке соединения.
+        pool_size (int): Максимум одновременных соединений с одним хостом.
+    """
+
+    def __init__(self, connect_timeout=2.0, read_timeout=5.0, retries=2, pool_size=100):
+        import httpx  # Необязательная зависимость нужна только ASGI-приложению
+
+        self._httpx = httpx
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self._clients = {}
+
+    def _client(self, url):
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        entry = self._clients.get(host)
+        if entry is None:
+            # Лимиты пула задаются транспорту: параметр limits клиента при явном transport не действует
+            limits = self._httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            transport = self._httpx.AsyncHTTPTransport(retries=self.retries, limits=limits)
+            # Ожидающие соединения запросы держим в семафоре, а не в очереди пула httpcore:
+            # пул перебирает всю очередь при каждом освобождении соединения
+            entry = (self._httpx.AsyncClient(timeout=self.timeout, transport=transport),
+                     asyncio.Semaphore(self.pool_size))
+            self._clients[host] = entry
+        return entry
+
+    async def post(self, url, json=None):
+        """Асинхронно отправляет команду дрону.
+
+        Исключения:
+            DroneGatewayError: Если дрон не ответил за отведенное время или недоступен.
+        """
+        client, slots = self._client(url)
+        try:
+            async with slots:
+                return await client.post(url, json=json)
+        except self._httpx.HTTPError as e:
+            logger.error("Ошибка связи с дроном %s: %s", url, e)
+            raise DroneGatewayError(str(e) or type(e).__name__) from e
+
+    async def broadcast(self, commands, max_concurrency=16):
+        """Асинхронно рассылает команды дронам, см. DroneGateway.broadcast.
+
+        Возвращает:
+            async generator: Пары (drone_id, ответ или DroneGatewayError) в порядке завершения.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def send(drone_id, url, json):
+            async with semaphore:
+                try:
+                    return drone_id, await self.post(url, json)
+                except DroneGatewayError as e:
+                    return drone_id, e
+
+        tasks = [asyncio.ensure_future(send(*command)) for command in commands]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client, _ in clients.values():
+            await client.aclose()
+
+
+# Общий шлюз для обработчиков маршрутов
+gateway = DroneGateway()
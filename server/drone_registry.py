@@ -0,0 +1,247 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import abstractmethod
+from collections.abc import MutableMapping
+
+
+class DroneRegistry(MutableMapping):
+    """Абстрактный реестр зарегистрированных дронов.
+
+    Реестр ведет себя как словарь {drone_id: информация о дроне} и дополнительно
+    хранит номер версии, который увеличивается при каждом изменении. По версии
+    клиенты реестра инвалидируют закэшированные ответы.
+
+    Номер версии начинается с нуля у каждого нового реестра, поэтому вместе с ним
+    используется эпоха — случайный идентификатор экземпляра данных. Пара (эпоха,
+    версия) не повторяется после перезапуска процесса или замены файла базы.
+    """
+
+    @property
+    @abstractmethod
+    def epoch(self):
+        """Идентификатор экземпляра данных реестра, не повторяется между экземплярами."""
+        pass
+
+    @property
+    @abstractmethod
+    def version(self):
+        """Номер версии реестра, растет при каждом изменении."""
+        pass
+
+    @abstractmethod
+    def update_many(self, items):
+        """Добавляет или заменяет несколько дронов за одно изменение версии.
+
+        Аргументы:
+            items (iterable): Пары (drone_id, информация о дроне).
+        """
+        pass
+
+    def snapshot(self):
+        """Возвращает копию реестра в виде обычного словаря."""
+        return dict(self.items())
+
+
+class ShardedDroneRegistry(DroneRegistry):
+    """Потокобезопасный реестр в памяти процесса с блокировками по шардам.
+
+    Дроны распределяются по шардам по хэшу идентификатора, у каждого шарда своя
+    блокировка, поэтому потоки, работающие с разными дронами, не ждут друг друга.
+
+    Аргументы:
+        shards (int): Количество шардов.
+    """
+
+    def __init__(self, shards=16):
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._version = 0
+        self._version_lock = threading.Lock()
+        # Данные в памяти живут только в этом процессе: эпоха новая при каждом запуске
+        self._epoch = uuid.uuid4().hex[:12]
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    @property
+    def version(self):
+        return self._version
+
+    def _index(self, drone_id):
+        return hash(drone_id) % len(self._shards)
+
+    def _bump(self):
+        with self._version_lock:
+            self._version += 1
+
+    def __getitem__(self, drone_id):
+        index = self._index(drone_id)
+        with self._locks[index]:
+            return self._shards[index][drone_id]
+
+    def __setitem__(self, drone_id, info):
+        index = self._index(drone_id)
+        with self._locks[index]:
+            self._shards[index][drone_id] = info
+        self._bump()
+
+    def __delitem__(self, drone_id):
+        index = self._index(drone_id)
+        with self._locks[index]:
+            del self._shards[index][drone_id]
+        self._bump()
+
+    def __contains__(self, drone_id):
+        index = self._index(drone_id)
+        with self._locks[index]:
+            return drone_id in self._shards[index]
+
+    def __iter__(self):
+        return iter([drone_id for drone_id, _ in self.items()])
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def items(self):
+        result = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                result.extend(shard.items())
+        return result
+
+    def update_many(self, items):
+        grouped = {}
+        for drone_id, info in items:
+            grouped.setdefault(self._index(drone_id), []).append((drone_id, info))
+        for index, shard_items in grouped.items():
+            with self._locks[index]:
+                self._shards[index].update(shard_items)
+        self._bump()
+
+    def clear(self):
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+        self._bump()
+
+
+class SQLiteDroneRegistry(DroneRegistry):
+    """Постоянный реестр в файле SQLite, общий для нескольких процессов-воркеров.
+
+    Каждый поток работает через собственное соединение, база открывается в режиме
+    WAL, чтобы чтение не блокировалось записью. Прочитанные записи кэшируются в
+    памяти процесса; кэш сбрасывается, когда номер версии в базе меняется, то есть
+    когда реестр изменил любой процесс.
+
+    Аргументы:
+        path (str): Путь к файлу базы данных.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_complete = False
+        self._cache_version = None
+        self._cache_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS drones (drone_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS registry_meta (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                               "version INTEGER NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO registry_meta (id, version) VALUES (0, 0)")
+            # Эпоха создается вместе с файлом базы и общая для всех воркеров, открывших этот файл
+            connection.execute("CREATE TABLE IF NOT EXISTS registry_epoch (id INTEGER PRIMARY KEY CHECK (id = 0), "
+                               "epoch TEXT NOT NULL)")
+            connection.execute("INSERT OR IGNORE INTO registry_epoch (id, epoch) VALUES (0, ?)",
+                               (uuid.uuid4().hex[:12],))
+        self._epoch = self._connection().execute("SELECT epoch FROM registry_epoch WHERE id = 0").fetchone()[0]
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @property
+    def epoch(self):
+        return self._epoch
+
+    @property
+    def version(self):
+        return self._connection().execute("SELECT version FROM registry_meta WHERE id = 0").fetchone()[0]
+
+    def _validate_cache(self):
+        version = self.version
+        if version != self._cache_version:
+            self._cache = {}
+            self._cache_complete = False
+            self._cache_version = version
+
+    def _write(self, statements):
+        with self._connection() as connection:
+            for sql, parameters in statements:
+                connection.executemany(sql, parameters)
+            connection.execute("UPDATE registry_meta SET version = version + 1 WHERE id = 0")
+
+    def __getitem__(self, drone_id):
+        with self._cache_lock:
+            self._validate_cache()
+            if drone_id in self._cache:
+                return self._cache[drone_id]
+            if self._cache_complete:
+                raise KeyError(drone_id)
+            row = self._connection().execute("SELECT data FROM drones WHERE drone_id = ?", (drone_id,)).fetchone()
+            if row is None:
+                raise KeyError(drone_id)
+            info = json.loads(row[0])
+            self._cache[drone_id] = info
+            return info
+
+    def __setitem__(self, drone_id, info):
+        self.update_many([(drone_id, info)])
+
+    def __delitem__(self, drone_id):
+        if drone_id not in self:
+            raise KeyError(drone_id)
+        self._write([("DELETE FROM drones WHERE drone_id = ?", [(drone_id,)])])
+
+    def __iter__(self):
+        return iter([drone_id for drone_id, _ in self.items()])
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM drones").fetchone()[0]
+
+    def items(self):
+        with self._cache_lock:
+            self._validate_cache()
+            if not self._cache_complete:
+                rows = self._connection().execute("SELECT drone_id, data FROM drones").fetchall()
+                self._cache = {drone_id: json.loads(data) for drone_id, data in rows}
+                self._cache_complete = True
+            return list(self._cache.items())
+
+    def update_many(self, items):
+        rows = [(drone_id, json.dumps(info, ensure_ascii=False)) for drone_id, info in items]
+        self._write([("INSERT OR REPLACE INTO drones (drone_id, data) VALUES (?, ?)", rows)])
+
+    def clear(self):
+        self._write([("DELETE FROM drones", [()])])
+
+
+def create_registry():
+    """Создает реестр дронов по переменной окружения DRONE_REGISTRY_PATH.
+
+    Если переменная задана, используется общий для воркеров SQLite-реестр по этому
+    пути, иначе — реестр в памяти процесса.
+    """
+    path = os.environ.get("DRONE_REGISTRY_PATH")
+    if path:
+        return SQLiteDroneRegistry(path)
+    return ShardedDroneRegistry()
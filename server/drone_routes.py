@@ -1,22 +1,111 @@
-from flask import Blueprint, jsonify, request
-from helpers import validate_json, authenticated_route
-import requests
+import hashlib
+import json
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from helpers import validate_schema, authenticated_route, VersionedCache
+from drone_gateway import gateway, DroneGatewayError
+from drone_registry import create_registry
+from idempotency import idempotent
+from ingest import JSONArrayError, iter_json_array, iter_ndjson
+from rate_limit import is_critical_command, rate_limited
+from schema import DRONE_SCHEMA, Field, SchemaError, compile_schema, validate_drone
 
 # Создаем Blueprint для маршрутов, связанных с управлением дронами
 drone_routes = Blueprint('drone_routes', __name__)
 
-# Хранилище информации о дронах
-drones = {}
+# Хранилище информации о дронах (в памяти процесса или общий SQLite-реестр, см. create_registry)
+drones = create_registry()
+
+# Команды, которые можно разослать группе дронов, и предел параллельности рассылки
+BROADCAST_COMMANDS = {"takeoff", "land", "return_to_base"}
+MAX_BROADCAST_CONCURRENCY = 64
+
+# Схемы тел запросов команд
+TAKEOFF_SCHEMA = {"altitude": Field((int, float), min_value=0)}
+BROADCAST_SCHEMA = {
+    "command": Field(str, required=True, choices=BROADCAST_COMMANDS),
+    "params": Field(dict),
+    "selector": Field(dict),
+    "max_concurrency": Field(int, min_value=1),
+}
+# Параметры рассылаемой команды проверяются той же схемой, что и тело команды одному дрону
+COMMAND_PARAMS_SCHEMAS = {"takeoff": TAKEOFF_SCHEMA, "land": {}, "return_to_base": {}}
+_validate_command_params = {command: compile_schema(schema) for command, schema in COMMAND_PARAMS_SCHEMAS.items()}
+
+# Поля, по которым GET /drones фильтрует дронов, и предельный размер страницы
+FILTER_FIELDS = ("manufacturer", "status")
+MAX_PAGE_SIZE = 1000
+
+# Сериализованные ответы GET /drones, действительные до следующего изменения реестра
+listing_cache = VersionedCache()
+
+def _sorted_snapshot(epoch, version):
+    snapshot = listing_cache.get(version, "snapshot", epoch)
+    if snapshot is None:
+        snapshot = sorted(drones.items())
+        listing_cache.put(version, "snapshot", snapshot, epoch)
+    return snapshot
+
+def _render_listing(epoch, version, cursor, limit, fields, filters):
+    selected = []
+    for drone_id, info in _sorted_snapshot(epoch, version):
+        if cursor is not None and drone_id <= cursor:
+            continue
+        if all(info.get(key) == value for key, value in filters.items()):
+            selected.append((drone_id, info))
+            if limit is not None and len(selected) > limit:
+                break
+    next_cursor = None
+    if limit is not None and len(selected) > limit:
+        selected = selected[:limit]
+        next_cursor = selected[-1][0]
+    if fields is not None:
+        selected = [(drone_id, {key: info[key] for key in fields if key in info}) for drone_id, info in selected]
+    return current_app.json.dumps(dict(selected)) + "\n", next_cursor
 
 @drone_routes.route("/drones", methods=["GET"])
 @authenticated_route
 def get_drones():
-    """Возвращает список всех зарегистрированных дронов.
+    """Возвращает зарегистрированных дронов с фильтрацией, проекцией и постраничной выдачей.
+
+    Параметры запроса: manufacturer и status (фильтры), fields (поля через запятую),
+    limit (размер страницы) и cursor (идентификатор последнего дрона предыдущей
+    страницы из заголовка X-Next-Cursor). Ответ снабжается ETag по эпохе и версии
+    реестра, сериализованное тело переиспользуется до следующего изменения реестра.
 
     Returns:
-        Response: JSON-ответ с информацией о всех дронах и HTTP статус 200.
+        Response: JSON-ответ с информацией о дронах и HTTP статус 200,
+                  HTTP статус 304, если данные не изменились с указанного If-None-Match,
+                  или сообщение об ошибке и HTTP статус 400 при неверных параметрах.
     """
-    return jsonify(drones), 200
+    limit = request.args.get("limit")
+    if limit is not None:
+        if not limit.isdigit() or not 0 < int(limit) <= MAX_PAGE_SIZE:
+            return jsonify({"error": f"Параметр limit должен быть от 1 до {MAX_PAGE_SIZE}"}), 400
+        limit = int(limit)
+    cursor = request.args.get("cursor")
+    fields = request.args.get("fields")
+    fields = tuple(field for field in fields.split(",") if field) if fields is not None else None
+    filters = {key: request.args[key] for key in FILTER_FIELDS if key in request.args}
+
+    # Версия начинается с нуля в каждом новом реестре, эпоха исключает ложный 304 после перезапуска
+    epoch, version = drones.epoch, drones.version
+    key = ("listing", cursor, limit, fields, tuple(sorted(filters.items())))
+    cached = listing_cache.get(version, key, epoch)
+    if cached is None:
+        body, next_cursor = _render_listing(epoch, version, cursor, limit, fields, filters)
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+        cached = (body, f"{epoch}-{version}-{digest}", next_cursor)
+        listing_cache.put(version, key, cached, epoch)
+    body, etag, next_cursor = cached
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype="application/json")
+    response.set_etag(etag)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
 
 @drone_routes.route("/drones/<drone_id>", methods=["GET"])
 @authenticated_route
@@ -36,40 +125,250 @@ def get_drone(drone_id):
     return jsonify({"error": "Дрон не найден"}), 404
 
 @drone_routes.route("/drones", methods=["POST"])
-@validate_json
-def create_drone():
+@validate_schema(DRONE_SCHEMA)
+def create_drone(payload):
     """Создает новый дрон на основе данных из запроса.
 
+    Args:
+        payload (dict): Тело запроса, проверенное по схеме DRONE_SCHEMA.
+
     Returns:
         Response: JSON-ответ с сообщением об успешном создании дрона и HTTP статус 201,
-                  или сообщение об ошибке и HTTP статус 404, если не передан идентификатор дрона.
+                  сообщение об ошибке и HTTP статус 400, если данные не соответствуют схеме,
+                  или HTTP статус 404, если передан пустой идентификатор дрона.
     """
-    drone_id = request.json.get("drone_id")
+    drone_id = payload["drone_id"]
     if drone_id:
-        drones[drone_id] = request.json
+        drones[drone_id] = payload
         return jsonify({"message": f"Дрон {drone_id} добавлен"}), 201
     return jsonify({"error": "Не передан id дрона"}), 404
 
+@drone_routes.route("/drones/bulk", methods=["POST"])
+@authenticated_route
+def create_drones_bulk():
+    """Регистрирует пакет дронов из NDJSON или JSON-массива.
+
+    Тело запроса разбирается потоково, каждая запись проверяется по схеме дрона,
+    корректные записи добавляются в реестр одной пакетной операцией. Ошибки
+    отдельных записей возвращаются в ответе и не отменяют пакет.
+
+    Returns:
+        Response: JSON-ответ с количеством добавленных дронов и списком ошибок
+                  (номер строки или элемента и описание) и HTTP статус 200,
+                  сообщение об ошибке и HTTP статус 400, если нарушена разметка JSON-массива
+                  (пакет не добавляется), или HTTP статус 415 для другого формата тела.
+    """
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        records = iter_ndjson(request.stream)
+    elif request.is_json:
+        records = ((index, record, None) for index, record in iter_json_array(request.stream))
+    else:
+        return jsonify({"error": "Тело запроса должно быть в формате NDJSON или JSON-массива"}), 415
+
+    valid = []
+    errors = []
+    try:
+        for line, record, error in records:
+            if error is None:
+                try:
+                    valid.append((validate_drone(record)["drone_id"], record))
+                    continue
+                except SchemaError as e:
+                    error = str(e)
+            errors.append({"line": line, "error": error})
+    except JSONArrayError as e:
+        # Границы элементов после ошибки разметки неизвестны: пакет отклоняется целиком
+        return jsonify({"error": f"Некорректный JSON-массив: {e}", "line": e.index}), 400
+    if valid:
+        drones.update_many(valid)
+    return jsonify({"inserted": len(valid), "errors": errors}), 200
+
 @drone_routes.route("/drones/<drone_id>/takeoff", methods=["POST"])
 @authenticated_route
-@validate_json
-def takeoff_drone(drone_id):
+@idempotent()
+@rate_limited(per_drone=True)
+@validate_schema(TAKEOFF_SCHEMA)
+def takeoff_drone(drone_id, payload):
     """Команда для взлета дрона.
 
+    С заголовком Idempotency-Key повтор запроса не отправляет команду дрону
+    повторно, а получает результат исходной команды (см. idempotent).
+
     Args:
         drone_id (str): Идентификатор дрона.
+        payload (dict): Тело запроса, проверенное по схеме TAKEOFF_SCHEMA.
 
     Returns:
         Response: JSON-ответ с сообщением об успешном взлете и HTTP статус 200,
                   или сообщение об ошибке и HTTP статус 404, если дрон не зарегистрирован,
-                  или HTTP статус 500, если взлет завершился неудачно.
+                  HTTP статус 409, если команда с тем же ключом идемпотентности еще выполняется
+                  или у дрона не задан адрес управления control_url,
+                  HTTP статус 422, если ключ идемпотентности использован с другим телом,
+                  HTTP статус 429, если превышен лимит команд или сервер перегружен,
+                  HTTP статус 500, если взлет завершился неудачно,
+                  или HTTP статус 504, если дрон не ответил.
+    """
+    try:
+        url, body = takeoff_request(drone_id, payload)
+    except CommandError as e:
+        return jsonify(e.body), e.status
+    try:
+        response = gateway.post(url, json=body)
+    except DroneGatewayError as e:
+        response = e
+    body, status = takeoff_result(drone_id, response)
+    return jsonify(body), status
+
+class CommandError(Exception):
+    """Команду нельзя отправить дрону; ответ общий для Flask-маршрутов и asgi.
+
+    Args:
+        status (int): HTTP статус ответа.
+        body (dict): Тело ответа.
+    """
+
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+def takeoff_request(drone_id, payload):
+    """Готовит команду взлета дрону.
+
+    Args:
+        drone_id (str): Идентификатор дрона.
+        payload (dict): Тело запроса, проверенное по схеме TAKEOFF_SCHEMA.
+
+    Returns:
+        tuple: Адрес команды и тело запроса к дрону.
+
+    Raises:
+        CommandError: 404, если дрон не зарегистрирован, или 409, если не задан control_url.
+    """
+    drone_info = drones.get(drone_id)
+    if drone_info is None:
+        raise CommandError(404, {"error": f"Дрон c id: {drone_id} не зарегистрирован"})
+    control_url = drone_info.get("control_url")
+    if not control_url:
+        raise CommandError(409, {"error": f"У дрона id: {drone_id} не задан адрес управления control_url"})
+    return control_url + "/takeoff", {"altitude": payload.get("altitude")}
+
+def takeoff_result(drone_id, response):
+    """Преобразует ответ дрона на команду взлета в ответ сервера.
+
+    Args:
+        drone_id (str): Идентификатор дрона.
+        response: Ответ дрона или DroneGatewayError, если дрон не ответил.
+
+    Returns:
+        tuple: Тело и HTTP статус ответа (200, 500 или 504).
     """
-    if drone_id not in drones:
-        return jsonify({"error": f"Дрон c id: {drone_id} не зарегистрирован"}), 404
-    altitude = request.json.get("altitude")
-    drone_info = drones[drone_id]
-    drone_url = drone_info.get("control_url") + "/takeoff"
-    response = requests.post(drone_url, json={"altitude": altitude})
+    if isinstance(response, DroneGatewayError):
+        return {"error": f"Дрон id: {drone_id} не отвечает"}, 504
     if response.status_code == 200:
-        return jsonify({"message": response.json().get("message")}), 200
-    return jsonify({"error": f"Ошибка взлета дрона id: {drone_id}"}), 500
\ No newline at end of file
+        return {"message": response.json().get("message")}, 200
+    return {"error": f"Ошибка взлета дрона id: {drone_id}"}, 500
+
+def select_drones(selector):
+    """Отбирает зарегистрированные дроны по селектору.
+
+    Args:
+        selector (dict): Условия отбора: drone_ids (список идентификаторов) и/или
+                         значения полей дрона, например manufacturer или status.
+                         Пустой селектор выбирает все дроны.
+
+    Returns:
+        list: Пары (drone_id, информация о дроне).
+    """
+    drone_ids = selector.get("drone_ids")
+    fields = {key: value for key, value in selector.items() if key != "drone_ids"}
+    candidates = drones.items() if drone_ids is None else ((d, drones[d]) for d in drone_ids if d in drones)
+    return [(drone_id, info) for drone_id, info in candidates
+            if all(info.get(key) == value for key, value in fields.items())]
+
+@drone_routes.route("/drones/commands", methods=["POST"])
+@authenticated_route
+@rate_limited(critical=is_critical_command)
+@validate_schema(BROADCAST_SCHEMA)
+def broadcast_command(payload):
+    """Рассылает команду группе дронов параллельно.
+
+    Тело запроса проверяется по схеме BROADCAST_SCHEMA: command (takeoff, land или
+    return_to_base), params (тело команды), selector (условия отбора дронов) и
+    max_concurrency (предел параллельности). Посадка и возврат на базу используют
+    резерв мест контроля допуска (rate_limit.CRITICAL_COMMANDS).
+
+    Маршрут не идемпотентен: заголовок Idempotency-Key не учитывается, и повтор
+    запроса рассылает команду снова. Для безопасных повторов используйте команды
+    отдельным дронам.
+
+    Returns:
+        Response: Поток NDJSON с результатом по каждому дрону по мере завершения
+                  (статус 409 для дронов без адреса управления control_url)
+                  и HTTP статус 200, сообщение об ошибке и HTTP статус 400,
+                  или HTTP статус 429, если превышен лимит команд или сервер перегружен.
+    """
+    try:
+        commands, max_concurrency, skipped = plan_broadcast(payload)
+    except CommandError as e:
+        return jsonify(e.body), e.status
+
+    def generate():
+        for line in skipped:
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        for drone_id, result in gateway.broadcast(commands, max_concurrency):
+            yield json.dumps(broadcast_line(drone_id, result), ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), status=200, mimetype="application/x-ndjson")
+
+def plan_broadcast(payload):
+    """Готовит групповую рассылку команды.
+
+    Args:
+        payload (dict): Тело запроса, проверенное по схеме BROADCAST_SCHEMA.
+
+    Returns:
+        tuple: Команды (drone_id, адрес, тело) для шлюза, предел параллельности и
+               строки результата для отобранных дронов без адреса управления control_url.
+
+    Raises:
+        CommandError: 400, если params не соответствуют схеме команды или
+                      selector.drone_ids не является списком строк.
+    """
+    command = payload["command"]
+    params = payload.get("params") or {}
+    selector = payload.get("selector") or {}
+    errors = []
+    try:
+        _validate_command_params[command](params)
+    except SchemaError as e:
+        errors.extend(f"params: {error}" for error in e.errors)
+    drone_ids = selector.get("drone_ids")
+    if drone_ids is not None and (not isinstance(drone_ids, list)
+                                  or not all(isinstance(drone_id, str) for drone_id in drone_ids)):
+        errors.append("поле selector.drone_ids должно быть списком строк")
+    if errors:
+        raise CommandError(400, {"error": "Запрос не соответствует схеме", "details": errors})
+    max_concurrency = min(payload.get("max_concurrency", 16), MAX_BROADCAST_CONCURRENCY)
+    commands = []
+    skipped = []
+    for drone_id, info in select_drones(selector):
+        if info.get("control_url"):
+            commands.append((drone_id, info["control_url"] + "/" + command, params))
+        else:
+            skipped.append({"drone_id": drone_id, "status": 409, "error": "не задан адрес управления control_url"})
+    return commands, max_concurrency, skipped
+
+def broadcast_line(drone_id, result):
+    """Строка NDJSON-результата рассылки для одного дрона.
+
+    Args:
+        drone_id (str): Идентификатор дрона.
+        result: Ответ дрона или DroneGatewayError.
+
+    Returns:
+        dict: drone_id, HTTP статус ответа дрона (504, если дрон не ответил) и описание ошибки.
+    """
+    if isinstance(result, DroneGatewayError):
+        return {"drone_id": drone_id, "status": 504, "error": str(result)}
+    return {"drone_id": drone_id, "status": result.status_code}
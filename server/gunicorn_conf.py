@@ -0,0 +1,24 @@
+import os
+
+# Конфигурация запуска ASGI-приложения под gunicorn с воркерами uvicorn (из корня репозитория):
+#   gunicorn -c server/gunicorn_conf.py --chdir server asgi:app
+# Без gunicorn: uvicorn --app-dir server --workers 4 asgi:app
+# Приложение загружается до fork (preload_app), поэтому общее хранилище лимитов
+# в разделяемой памяти (RATE_LIMIT_SHM_NAME) и его блокировка наследуются воркерами.
+# Для общего между воркерами реестра дронов задайте DRONE_REGISTRY_PATH.
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+keepalive = 5
+timeout = 30
+graceful_timeout = 10
+
+
+def post_fork(server, worker):
+    # Поток записи журнала QueueListener не наследуется при fork, поэтому журнал
+    # настраивается в каждом воркере; корень репозитория добавлен в sys.path в main
+    from client.logging_config import setup_logging
+
+    setup_logging()
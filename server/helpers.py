@@ -1,31 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import verify_jwt_in_request
+from schema import SchemaError, compile_schema
 
-def validate_json(f):
-    """Декоратор для проверки, что запрос содержит данные в формате JSON.
+# Накопленное время проверки схем по маршрутам: {имя функции: [число запросов, суммарное время в нс]}
+validation_timings = {}
+_timings_lock = threading.Lock()
 
-    Этот декоратор проверяет, что входящий запрос имеет содержимое в формате JSON.
-    Если это не так, возвращается ошибка 400 с описательным сообщением.
+def validate_schema(schema, allow_extra=True):
+    """Декоратор для проверки тела JSON-запроса по схеме.
+
+    Схема компилируется один раз при объявлении маршрута. Тело запроса
+    разбирается один раз, проверенный словарь передается обработчику в
+    именованном аргументе payload, поэтому типы полей в обработчике гарантированы.
+    Время каждой проверки накапливается в validation_timings.
 
     Аргументы:
-        f (function): Функция, которую необходимо декорировать.
+        schema (dict): Словарь {имя поля: Field}.
+        allow_extra (bool): Разрешены ли поля, отсутствующие в схеме.
 
     Возвращает:
-        function: Декорированная функция, включающая проверку JSON.
+        function: Декоратор, возвращающий ошибку 400 с перечнем нарушений схемы.
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not request.is_json:
-            return jsonify({"error": "Запрос должен быть в формате JSON"}), 400
-        return f(*args, **kwargs)
-    return decorated_function
+    validate = compile_schema(schema, allow_extra)
+
+    def decorator(f):
+        with _timings_lock:
+            timings = validation_timings.setdefault(f.__name__, [0, 0])
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not request.is_json:
+                return jsonify({"error": "Запрос должен быть в формате JSON"}), 400
+            data = request.get_json(silent=True)
+            started = time.perf_counter_ns()
+            try:
+                payload = validate(data)
+            except SchemaError as e:
+                return jsonify({"error": "Запрос не соответствует схеме", "details": e.errors}), 400
+            finally:
+                elapsed = time.perf_counter_ns() - started
+                # Обработчики выполняются в нескольких потоках, а += над элементом списка не атомарен
+                with _timings_lock:
+                    timings[0] += 1
+                    timings[1] += elapsed
+            return f(*args, payload=payload, **kwargs)
+        return decorated_function
+    return decorator
+
+def validation_stats():
+    """Возвращает среднее время проверки схемы по маршрутам в микросекундах."""
+    with _timings_lock:
+        return {name: total / count / 1000 for name, (count, total) in validation_timings.items() if count}
 
 def authenticated_route(f):
     """Декоратор для обеспечения JWT-аутентификации на маршруте.
 
     Этот декоратор применяет JWT-аутентификацию к оборачиваемой функции,
     гарантируя, что пользователь аутентифицирован перед доступом к маршруту.
+    Повторная проверка подписи уже проверенного токена пропускается в
+    CachingJWTManager (см. token_cache), а проверка отзыва и загрузка
+    пользователя выполняются на каждом запросе.
 
     Аргументы:
         f (function): Функция, которую необходимо декорировать.
@@ -34,7 +72,51 @@ def authenticated_route(f):
         function: Декорированная функция, требующая JWT-аутентификацию.
     """
     @wraps(f)
-    @jwt_required()
     def decorated_function(*args, **kwargs):
+        verify_jwt_in_request()
         return f(*args, **kwargs)
     return decorated_function
+
+
+class VersionedCache:
+    """Ограниченный LRU-кэш значений, действительных для одной версии данных.
+
+    При обращении с новой версией все ранее сохраненные значения сбрасываются,
+    поэтому кэш никогда не возвращает данные, устаревшие после изменения реестра.
+    Значение, вычисленное по более старой версии той же эпохи (запрос, начатый до
+    изменения реестра), не сохраняется и не вытесняет значения новой версии.
+    Смена эпохи (другой экземпляр реестра) всегда сбрасывает кэш.
+
+    Аргументы:
+        maxsize (int): Максимальное количество значений в кэше.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._epoch = None
+        self._version = None
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key, epoch=None):
+        """Возвращает значение для версии и ключа или None."""
+        with self._lock:
+            if epoch != self._epoch or version != self._version:
+                return None
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def put(self, version, key, value, epoch=None):
+        """Сохраняет значение для версии и ключа; значения устаревшей версии игнорируются."""
+        with self._lock:
+            if epoch == self._epoch and self._version is not None and version < self._version:
+                return
+            if epoch != self._epoch or version != self._version:
+                self._values = OrderedDict()
+                self._epoch = epoch
+                self._version = version
+            self._values[key] = value
+            if len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
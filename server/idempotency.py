@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError
+from functools import wraps
+
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# Заголовки, которые не сохраняются вместе с ответом: их формирует сервер при каждой отправке
+TRANSPORT_HEADERS = frozenset({"content-length", "connection", "keep-alive", "transfer-encoding", "date"})
+
+
+class IdempotencyConflict(Exception):
+    """Ключ идемпотентности повторно использован с другим телом запроса."""
+
+
+class IdempotencyCache:
+    """Ограниченный TTL-кэш выполняющихся и завершенных команд по ключу идемпотентности.
+
+    Первый запрос с ключом становится владельцем записи и выполняет команду,
+    повторы с тем же ключом получают тот же concurrent.futures.Future и ждут его
+    результата, а не отправляют команду дрону снова. Завершенный ответ хранится
+    ttl секунд. Ответы 429 и 5xx после завершения не сохраняются: ожидающие
+    повторы получают их, но следующий повтор выполнит команду заново. При
+    переполнении вытесняются самые старые завершенные записи; выполняющиеся
+    команды не вытесняются, иначе повтор отправил бы команду дрону второй раз.
+    Кэш общий для потоков Flask и цикла событий ASGI, но не для процессов-воркеров.
+
+    Аргументы:
+        maxsize (int): Максимальное количество ключей в кэше.
+        ttl (float): Время хранения завершенного ответа в секундах.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ключ -> (истекает, отпечаток тела, Future)
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    @staticmethod
+    def fingerprint(body):
+        return hashlib.sha256(body).digest()
+
+    def begin(self, key, fingerprint):
+        """Регистрирует запрос с ключом.
+
+        Аргументы:
+            key (str): Ключ идемпотентности с областью действия (пользователь и маршрут).
+            fingerprint (bytes): Отпечаток тела запроса.
+
+        Возвращает:
+            tuple: (Future с ответом (статус, заголовки, тело), True для владельца записи).
+
+        Исключения:
+            IdempotencyConflict: Если ключ уже использован с другим телом запроса.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                if entry[1] != fingerprint:
+                    raise IdempotencyConflict(key)
+                self.replays += 1
+                return entry[2], False
+            future = Future()
+            # Пока команда выполняется, запись не истекает
+            self._entries[key] = (float("inf"), fingerprint, future)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._evict(len(self._entries) - self.maxsize)
+            return future, True
+
+    def _evict(self, count):
+        # Вызывается под self._lock; выполняющиеся записи (срок inf) пропускаются
+        victims = []
+        for key, entry in self._entries.items():
+            if entry[0] != float("inf"):
+                victims.append(key)
+                if len(victims) == count:
+                    break
+        for key in victims:
+            del self._entries[key]
+
+    def complete(self, key, future, status, headers, body):
+        """Сохраняет ответ владельца и передает его ожидающим повторам."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is future:
+                if status == 429 or status >= 500:
+                    del self._entries[key]
+                else:
+                    self._entries[key] = (time.monotonic() + self.ttl, entry[1], future)
+        future.set_result((status, headers, body))
+
+    def fail(self, key, future, error):
+        """Снимает запись после исключения владельца, ожидающие повторы получают исключение."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is future:
+                del self._entries[key]
+        future.set_exception(error)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Общий кэш идемпотентных команд сервера
+idempotency_cache = IdempotencyCache()
+
+
+def scoped_key(subject, path, key):
+    """Ключ идемпотентности действует только для своего пользователя и маршрута."""
+    return f"{subject}\x00{path}\x00{key}"
+
+
+def idempotent(wait_timeout=30.0):
+    """Декоратор идемпотентных команд по заголовку Idempotency-Key.
+
+    Применяется после authenticated_route и до rate_limited, поэтому повтор не
+    расходует лимит команд. Повтор выполняющейся команды ждет ее результата,
+    повтор завершенной получает сохраненный ответ (со всеми заголовками, кроме
+    TRANSPORT_HEADERS) и заголовок Idempotent-Replayed. Запросы без заголовка
+    выполняются как обычно. Потоковые ответы не кэшируются, поэтому декоратор
+    применяется только к маршрутам с ответом целиком.
+
+    Аргументы:
+        wait_timeout (float): Сколько секунд повтор ждет завершения исходной команды.
+
+    Возвращает:
+        function: Декоратор маршрута.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if key is None:
+                return f(*args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"Заголовок {IDEMPOTENCY_HEADER} должен содержать от 1 до "
+                                         f"{MAX_KEY_LENGTH} символов"}), 400
+            key = scoped_key(get_jwt().get("sub"), request.path, key)
+            try:
+                future, owner = idempotency_cache.begin(key, IdempotencyCache.fingerprint(request.get_data()))
+            except IdempotencyConflict:
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} уже использован с другим телом запроса"}), 422
+            if not owner:
+                try:
+                    status, headers, body = future.result(wait_timeout)
+                except TimeoutError:
+                    return jsonify({"error": "Команда с этим ключом еще выполняется"}), 409
+                response = make_response(body, status, headers)
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            try:
+                response = make_response(f(*args, **kwargs))
+            except BaseException as e:
+                idempotency_cache.fail(key, future, e)
+                raise
+            headers = [(name, value) for name, value in response.headers
+                       if name.lower() not in TRANSPORT_HEADERS]
+            idempotency_cache.complete(key, future, response.status_code, headers, response.get_data())
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,139 @@
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+def iter_ndjson(stream, chunk_size=CHUNK_SIZE):
+    """Разбирает поток NDJSON построчно, не загружая тело запроса целиком.
+
+    Аргументы:
+        stream: Бинарный поток тела запроса.
+        chunk_size (int): Размер читаемого блока в байтах.
+
+    Возвращает:
+        generator: Тройки (номер строки, объект или None, сообщение об ошибке или None).
+    """
+    buffer = b""
+    line_number = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop() if chunk else b""
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except ValueError as e:
+                yield line_number, None, f"некорректный JSON: {e}"
+        if not chunk:
+            return
+
+
+class JSONArrayError(ValueError):
+    """Нарушена разметка JSON-массива: после нее элементы нельзя разобрать надежно.
+
+    Атрибуты:
+        index (int): Номер элемента, на котором обнаружена ошибка.
+    """
+
+    def __init__(self, index, message):
+        super().__init__(message)
+        self.index = index
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE):
+    """Разбирает JSON-массив объектов по мере чтения потока.
+
+    Элементы декодируются по одному через JSONDecoder.raw_decode, поэтому в памяти
+    держится только текущий недочитанный фрагмент, а не весь массив. Разделители
+    проверяются строго: пропущенная или лишняя запятая и запятая перед ] — ошибка
+    разметки, как и в json.loads.
+
+    Аргументы:
+        stream: Бинарный поток тела запроса.
+        chunk_size (int): Размер читаемого блока в байтах.
+
+    Возвращает:
+        generator: Пары (номер элемента, объект).
+
+    Исключения:
+        JSONArrayError: Тело не является корректным JSON-массивом.
+    """
+    buffer = ""
+    position = 0
+    index = 0
+    started = False
+    finished = False
+    expect_value = True  # после [ и после запятой ожидается элемент, после элемента — запятая или ]
+    eof = False
+    pending = b""
+    while not finished:
+        if not eof:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            pending += chunk
+            try:
+                text = pending.decode("utf-8")
+                pending = b""
+            except UnicodeDecodeError:
+                # Многобайтовый символ разрезан границей блока: дочитываем следующий блок
+                if not eof:
+                    continue
+                raise JSONArrayError(index + 1, "некорректная кодировка UTF-8")
+            buffer = buffer[position:] + text
+            position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise JSONArrayError(1, "тело запроса должно быть JSON-массивом")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                if expect_value and index > 0:
+                    raise JSONArrayError(index + 1, "лишняя запятая перед концом массива")
+                finished = True
+                position += 1
+                break
+            if buffer[position] == ",":
+                if expect_value:
+                    raise JSONArrayError(index + 1, "пропущен элемент массива перед запятой")
+                expect_value = True
+                position += 1
+                continue
+            if not expect_value:
+                raise JSONArrayError(index + 1, "пропущена запятая между элементами массива")
+            try:
+                record, end = _decoder.raw_decode(buffer, position)
+            except ValueError as e:
+                if eof:
+                    raise JSONArrayError(index + 1, f"некорректный JSON: {e}")
+                break  # Элемент еще не дочитан
+            if end == len(buffer) and not eof:
+                break  # Число или литерал на границе блока может продолжиться в следующем
+            index += 1
+            position = end
+            expect_value = False
+            yield index, record
+        if eof and not finished:
+            raise JSONArrayError(index + 1, "JSON-массив не завершен")
+    # После закрывающей скобки допустимы только пробельные символы
+    while True:
+        if buffer[position:].strip(_WHITESPACE):
+            raise JSONArrayError(index + 1, "данные после конца JSON-массива")
+        if eof:
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer, position = chunk.decode("utf-8", errors="replace"), 0
@@ -1,12 +1,95 @@
-from flask import Flask
-from flask_jwt_extended import JWTManager
+import os
+import sys
+import time
+
+from flask import Flask, Response, g, jsonify, request
 from drone_routes import drone_routes
+from helpers import authenticated_route
+from token_cache import CachingJWTManager, token_cache
+
+# Корень репозитория в sys.path: общая настройка журнала client.logging_config;
+# каталог drone: metrics и profiler импортируются по тем же именам, что и в drone
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "drone")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import profiler
+from metrics import REGISTRY, metrics_response
+
+REQUEST_SECONDS = REGISTRY.histogram("server_request_duration_seconds", "Время обработки запросов сервером",
+                                     ("endpoint",))
+
+# Максимальная длительность окна профилирования, запускаемого через /admin/profile
+MAX_PROFILE_SECONDS = 600
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'my_secret_key'
-jwt = JWTManager(app)
+jwt = CachingJWTManager(app, cache=token_cache)
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    """Отклоняет токены, отозванные через token_cache.revoke."""
+    return token_cache.is_revoked(jwt_payload.get("jti"))
 
 app.register_blueprint(drone_routes)
 
+
+@app.before_request
+def start_request_timer():
+    if REGISTRY.enabled:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def observe_request_duration(response):
+    # Для потоковых ответов замеряется время до начала передачи тела
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.labels(request.endpoint or "unknown").observe(time.perf_counter() - started)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики процесса в текстовом формате Prometheus.
+
+    Returns:
+        Response: Текст всех метрик общего реестра.
+    """
+    body, content_type = metrics_response()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/admin/profile', methods=['POST'])
+@authenticated_route
+def start_profiling():
+    """Запускает окно выборочного профилирования процесса сервера.
+
+    Тело запроса: {"seconds": 30, "format": "collapsed" | "speedscope"}. Профили
+    сохраняются по подсистемам в каталог DRONE_PROFILE_DIR.
+
+    Returns:
+        Response: 202 с каталогом профилей, 400 при неверных параметрах,
+        409 если окно уже выполняется.
+    """
+    data = request.get_json(silent=True) or {}
+    seconds = data.get("seconds", 30)
+    fmt = data.get("format", "collapsed")
+    if not isinstance(seconds, (int, float)) or not 0 < seconds <= MAX_PROFILE_SECONDS \
+            or fmt not in profiler.FORMATS:
+        return jsonify({"error": f"seconds должен быть от 0 до {MAX_PROFILE_SECONDS}, "
+                                 f"format — один из {', '.join(profiler.FORMATS)}"}), 400
+    window = profiler.start_window(seconds, fmt=fmt, tag="server")
+    if window is None:
+        return jsonify({"error": "Профилирование уже выполняется"}), 409
+    return jsonify({"seconds": seconds, "output_dir": window.output_dir}), 202
+
+
 if __name__ == '__main__':
+    from client.logging_config import setup_logging
+
+    setup_logging()
+    profiler.install_signal_handler(tag="server")
+    profiler.start_from_env(tag="server")
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,394 @@
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from multiprocessing import shared_memory
+
+from flask import Response, jsonify, request
+from flask_jwt_extended import get_jwt
+
+try:
+    import fcntl
+except ImportError:  # Windows: общая блокировка только через наследование multiprocessing.Lock
+    fcntl = None
+
+# Команды, критичные по задержке: используют резерв мест AdmissionController
+CRITICAL_COMMANDS = frozenset({"land", "return_to_base"})
+
+
+class RateLimitExceeded(Exception):
+    """Запрос отклонен ограничителем.
+
+    Аргументы:
+        retry_after (float): Через сколько секунд имеет смысл повторить запрос.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Повторите через {retry_after:.2f} с")
+        self.retry_after = retry_after
+
+
+def _take(tokens, updated, now, rate, burst, cost):
+    """Пополняет корзину на момент now и пытается списать cost токенов.
+
+    Отрицательный cost возвращает токены в корзину (не выше burst).
+    Возвращает новое состояние (tokens, updated) и время ожидания (0, если токены списаны).
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return min(burst, tokens - cost), now, 0.0
+    return tokens, now, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Хранилище корзин токенов в памяти процесса."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, updated, wait = _take(tokens, updated, now, rate, burst, cost)
+            self._buckets[key] = (tokens, updated)
+        return wait
+
+
+class _FileLock:
+    """Межпроцессная блокировка на flock файла, общего для всех процессов с тем же именем.
+
+    Блокировка flock принадлежит открытому файлу, поэтому потоки одного процесса
+    дополнительно разделяются threading.Lock, а после fork файл открывается заново.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._file = None
+        self._pid = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            if self._pid != os.getpid():
+                self._file = open(self.path, "a+b")
+                self._pid = os.getpid()
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+
+class SharedMemoryBucketStore:
+    """Хранилище корзин токенов в разделяемой памяти для нескольких воркеров.
+
+    Корзины лежат в фиксированной таблице слотов (хэш ключа, токены, время
+    обновления) в multiprocessing.shared_memory. Доступ к таблице разделяется
+    блокировкой flock файла, имя которого выводится из имени сегмента, поэтому
+    воркеры могут как унаследовать хранилище после fork, так и подключиться к
+    существующему сегменту по имени. Вместо нее можно передать lock, общий для
+    всех процессов (например, multiprocessing.Lock, созданный до fork); без fcntl
+    это единственный вариант. При переполнении таблицы вытесняется корзина,
+    обновлявшаяся раньше всех в окне поиска.
+
+    Аргументы:
+        name (str): Имя сегмента разделяемой памяти.
+        slots (int): Количество слотов таблицы.
+        probe (int): Длина окна линейного поиска слота.
+        lock: Блокировка, общая для всех процессов, использующих сегмент.
+    """
+
+    _SLOT = struct.Struct("<Qdd")
+
+    def __init__(self, name=None, slots=4096, probe=8, lock=None):
+        self.slots = slots
+        self.probe = probe
+        size = self._SLOT.size * slots
+        try:
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._memory.buf[:size] = bytes(size)
+            created = True
+        except FileExistsError:
+            self._memory = shared_memory.SharedMemory(name=name)
+            created = False
+        if lock is None:
+            if fcntl is not None:
+                lock = _FileLock(os.path.join(tempfile.gettempdir(), f"{self._memory.name.lstrip('/')}.lock"))
+            elif created:
+                lock = multiprocessing.Lock()
+            else:
+                self._memory.close()
+                raise ValueError("Без fcntl подключение к существующему сегменту требует общей блокировки lock")
+        self._lock = lock
+
+    def take(self, key, rate, burst, cost=1.0):
+        # Ноль зарезервирован под пустой слот
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+        now = time.time()
+        buffer = self._memory.buf
+        with self._lock:
+            start = key_hash % self.slots
+            target = None
+            stalest = None
+            for step in range(self.probe):
+                offset = ((start + step) % self.slots) * self._SLOT.size
+                slot_hash, tokens, updated = self._SLOT.unpack_from(buffer, offset)
+                if slot_hash == key_hash:
+                    target = (offset, tokens, updated)
+                    break
+                if slot_hash == 0 and target is None:
+                    target = (offset, burst, now)
+                    break
+                if stalest is None or updated < stalest[2]:
+                    stalest = (offset, burst, updated)
+            if target is None:
+                target = (stalest[0], burst, now)
+            offset, tokens, updated = target
+            tokens, updated, wait = _take(tokens, updated, now, rate, burst, cost)
+            self._SLOT.pack_into(buffer, offset, key_hash, tokens, updated)
+        return wait
+
+    def close(self, unlink=False):
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+            if isinstance(self._lock, _FileLock):
+                try:
+                    os.remove(self._lock.path)
+                except OSError:
+                    pass
+
+
+class TokenBucketLimiter:
+    """Ограничитель частоты запросов по алгоритму корзины токенов.
+
+    Аргументы:
+        rate (float): Скорость пополнения, запросов в секунду.
+        burst (float): Емкость корзины — допустимый всплеск запросов.
+        store: Хранилище корзин (MemoryBucketStore или SharedMemoryBucketStore).
+    """
+
+    def __init__(self, rate, burst, store=None):
+        self.rate = rate
+        self.burst = burst
+        self.store = store or MemoryBucketStore()
+
+    def check(self, key, cost=1.0):
+        """Списывает токены для ключа.
+
+        Исключения:
+            RateLimitExceeded: Если токенов в корзине недостаточно.
+        """
+        wait = self.store.take(key, self.rate, self.burst, cost)
+        if wait > 0:
+            raise RateLimitExceeded(wait)
+
+    def refund(self, key, cost=1.0):
+        """Возвращает токены, списанные check для запроса, который не был выполнен."""
+        self.store.take(key, self.rate, self.burst, -cost)
+
+
+class AdmissionController:
+    """Глобальный контроль допуска запросов с очередью и сбросом нагрузки.
+
+    Одновременно обрабатывается не более max_concurrent обычных запросов, еще до
+    max_queue ждут освобождения места не дольше queue_timeout; остальные сразу
+    отклоняются. Критичные по задержке команды (посадка, возврат на базу) могут
+    использовать дополнительные reserved мест, недоступные обычным запросам,
+    поэтому остаются отзывчивыми при перегрузке.
+
+    Аргументы:
+        max_concurrent (int): Предел одновременно обрабатываемых обычных запросов.
+        reserved (int): Дополнительные места только для критичных команд.
+        max_queue (int): Максимальная длина очереди ожидания.
+        queue_timeout (float): Максимальное время ожидания в очереди в секундах.
+    """
+
+    def __init__(self, max_concurrent=32, reserved=4, max_queue=64, queue_timeout=1.0):
+        self.max_concurrent = max_concurrent
+        self.reserved = reserved
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, critical=False):
+        """Контекст обработки запроса.
+
+        Исключения:
+            RateLimitExceeded: Если очередь переполнена или время ожидания истекло.
+        """
+        self.acquire(critical)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, critical=False):
+        """Занимает место обработки запроса; каждому успешному вызову соответствует release.
+
+        Исключения:
+            RateLimitExceeded: Если очередь переполнена или время ожидания истекло.
+        """
+        limit = self._limit(critical)
+        with self._condition:
+            if self._active >= limit:
+                if self._waiting >= self.max_queue:
+                    raise RateLimitExceeded(self.queue_timeout)
+                self._waiting += 1
+                try:
+                    admitted = self._condition.wait_for(lambda: self._active < limit, self.queue_timeout)
+                finally:
+                    self._waiting -= 1
+                if not admitted:
+                    raise RateLimitExceeded(self.queue_timeout)
+            self._active += 1
+
+    async def acquire_async(self, critical=False):
+        """Вариант acquire для обработчиков в цикле событий.
+
+        Свободное место занимается сразу; ожидание в очереди выполняется в потоке
+        пула, чтобы не останавливать цикл событий. Место, полученное после отмены
+        ожидания, освобождается.
+
+        Исключения:
+            RateLimitExceeded: Если очередь переполнена или время ожидания истекло.
+        """
+        with self._condition:
+            if self._active < self._limit(critical):
+                self._active += 1
+                return
+        waiting = asyncio.get_running_loop().run_in_executor(None, self.acquire, critical)
+        try:
+            await asyncio.shield(waiting)
+        except asyncio.CancelledError:
+            waiting.add_done_callback(lambda future: future.exception() is None and self.release())
+            raise
+
+    def _limit(self, critical):
+        return self.max_concurrent + (self.reserved if critical else 0)
+
+    def release(self):
+        """Освобождает место, занятое acquire или acquire_async."""
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+
+def _create_store():
+    name = os.environ.get("RATE_LIMIT_SHM_NAME")
+    return SharedMemoryBucketStore(name) if name else MemoryBucketStore()
+
+
+# Ограничители сервера: по пользователю, по дрону и общий контроль допуска.
+# Переменная окружения RATE_LIMIT_SHM_NAME включает общее для воркеров хранилище корзин.
+_store = _create_store()
+user_limiter = TokenBucketLimiter(rate=20, burst=40, store=_store)
+drone_limiter = TokenBucketLimiter(rate=5, burst=10, store=_store)
+admission = AdmissionController()
+
+
+def _too_many_requests(error):
+    response = jsonify({"error": "Слишком много запросов", "retry_after": round(error.retry_after, 3)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+
+def check_limits(user_key, drone_key=None):
+    """Списывает токены пользователя и, если задан drone_key, дрона.
+
+    Если корзина дрона пуста, токен пользователя возвращается: отклоненная
+    команда не расходует его лимит.
+
+    Исключения:
+        RateLimitExceeded: Если превышен лимит пользователя или дрона.
+    """
+    user_limiter.check(user_key)
+    if drone_key is not None:
+        try:
+            drone_limiter.check(drone_key)
+        except RateLimitExceeded:
+            user_limiter.refund(user_key)
+            raise
+
+
+def refund_limits(user_key, drone_key=None):
+    """Возвращает токены, списанные check_limits для запроса, который не был допущен к обработке.
+
+    Аргументы:
+        user_key (str): Ключ пользователя, переданный check_limits.
+        drone_key (str): Ключ дрона, переданный check_limits, или None.
+    """
+    user_limiter.refund(user_key)
+    if drone_key is not None:
+        drone_limiter.refund(drone_key)
+
+
+def is_critical_command():
+    """Проверяет, что команда в теле запроса (поле command) критична по задержке."""
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get("command") in CRITICAL_COMMANDS
+
+
+def rate_limited(per_drone=False, critical=False):
+    """Декоратор ограничения частоты и допуска команд.
+
+    Применяется после authenticated_route: пользователь определяется по claim sub
+    токена. Превышение лимита или перегрузка сервера дают ответ 429 с заголовком
+    Retry-After. Место в AdmissionController занято до конца ответа: у потокового
+    ответа — до закрытия генератора, а не до возврата из обработчика.
+
+    Аргументы:
+        per_drone (bool): Ограничивать также частоту команд одному дрону (по drone_id маршрута).
+        critical (bool | callable): Команда критична по задержке и может использовать резерв мест.
+            Функция без аргументов вычисляется для каждого запроса, например is_critical_command.
+
+    Возвращает:
+        function: Декоратор маршрута.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            user_key = f"user:{get_jwt().get('sub') or request.remote_addr}"
+            drone_key = f"drone:{kwargs.get('drone_id')}" if per_drone else None
+            try:
+                check_limits(user_key, drone_key)
+            except RateLimitExceeded as e:
+                return _too_many_requests(e)
+            try:
+                admission.acquire(critical() if callable(critical) else critical)
+            except RateLimitExceeded as e:
+                # Отклоненный при перегрузке запрос не расходует лимиты вызывающего
+                refund_limits(user_key, drone_key)
+                return _too_many_requests(e)
+            try:
+                response = f(*args, **kwargs)
+            except BaseException:
+                admission.release()
+                raise
+            if isinstance(response, Response) and response.is_streamed:
+                response.call_on_close(admission.release)
+            else:
+                admission.release()
+            return response
+        return decorated_function
+    return decorator
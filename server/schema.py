@@ -0,0 +1,110 @@
+class SchemaError(Exception):
+    """Ошибка проверки данных по схеме.
+
+    Аргументы:
+        errors (list): Сообщения об ошибках по каждому полю.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class Field:
+    """Описание поля схемы.
+
+    Аргументы:
+        types (type или tuple): Допустимые типы значения.
+        required (bool): Обязательно ли поле.
+        choices (iterable): Допустимые значения поля.
+        min_value (float): Минимальное значение для числовых полей.
+        max_value (float): Максимальное значение для числовых полей.
+    """
+
+    def __init__(self, types, required=False, choices=None, min_value=None, max_value=None):
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.choices = frozenset(choices) if choices is not None else None
+        self.min_value = min_value
+        self.max_value = max_value
+
+
+def _compile_field(name, field):
+    """Собирает проверку одного поля из минимального набора условий."""
+    types = field.types
+    # bool является подклассом int, но в числовые поля JSON попадать не должен
+    reject_bool = bool not in types and any(issubclass(bool, t) for t in types)
+    type_names = " или ".join(t.__name__ for t in types)
+    checks = []
+    if field.choices is not None:
+        choices = field.choices
+        checks.append(lambda value: None if value in choices else f"поле {name} должно быть одним из {sorted(choices)}")
+    if field.min_value is not None:
+        min_value = field.min_value
+        checks.append(lambda value: None if value >= min_value else f"поле {name} должно быть не меньше {min_value}")
+    if field.max_value is not None:
+        max_value = field.max_value
+        checks.append(lambda value: None if value <= max_value else f"поле {name} должно быть не больше {max_value}")
+
+    def check(value):
+        if not isinstance(value, types) or (reject_bool and isinstance(value, bool)):
+            return f"поле {name} должно иметь тип {type_names}"
+        for extra_check in checks:
+            error = extra_check(value)
+            if error:
+                return error
+        return None
+
+    return check
+
+
+def compile_schema(fields, allow_extra=True):
+    """Компилирует схему в функцию проверки.
+
+    Проверки всех полей собираются один раз, поэтому проверка запроса сводится к
+    проходу по заранее подготовленному списку функций без разбора схемы.
+
+    Аргументы:
+        fields (dict): Словарь {имя поля: Field}.
+        allow_extra (bool): Разрешены ли поля, отсутствующие в схеме.
+
+    Возвращает:
+        function: Функция validate(data), возвращающая data или выбрасывающая SchemaError.
+    """
+    compiled = tuple((name, field.required, _compile_field(name, field)) for name, field in fields.items())
+    known = frozenset(fields)
+
+    def validate(data):
+        if not isinstance(data, dict):
+            raise SchemaError(["ожидается JSON-объект"])
+        errors = []
+        for name, required, check in compiled:
+            if name in data:
+                error = check(data[name])
+                if error:
+                    errors.append(error)
+            elif required:
+                errors.append(f"отсутствует обязательное поле {name}")
+        if not allow_extra:
+            errors.extend(f"неизвестное поле {name}" for name in data.keys() - known)
+        if errors:
+            raise SchemaError(errors)
+        return data
+
+    return validate
+
+
+# Схема записи о дроне в реестре
+DRONE_SCHEMA = {
+    "drone_id": Field(str, required=True),
+    "control_url": Field(str),
+    "model": Field(str),
+    "manufacturer": Field(str),
+    "status": Field(str),
+    "sensors": Field(list),
+    "max_speed": Field((int, float), min_value=0),
+    "max_altitude": Field((int, float), min_value=0),
+    "battery_capacity": Field((int, float), min_value=0),
+}
+
+validate_drone = compile_schema(DRONE_SCHEMA)
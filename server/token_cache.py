@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from flask_jwt_extended import JWTManager
+
+
+class TokenCache:
+    """Ограниченный LRU-кэш проверенных JWT.
+
+    Хранит не сами токены, а их SHA-256 дайджесты вместе с декодированными
+    заголовком и claims. Запись действительна до claim exp (но не дольше max_ttl),
+    поэтому просроченный токен никогда не принимается из кэша. Отозванные jti
+    удаляются из кэша и запоминаются до истечения их срока действия.
+
+    Аргументы:
+        maxsize (int): Максимальное количество токенов в кэше.
+        max_ttl (float): Максимальное время жизни записи в секундах.
+    """
+
+    def __init__(self, maxsize=4096, max_ttl=300.0):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # дайджест -> (истекает, jti, заголовок, claims)
+        self._revoked = {}  # jti -> время истечения токена
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        """Возвращает пару (заголовок, claims) для проверенного токена или None."""
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, jti, header, claims = entry
+            if expires <= time.time() or jti in self._revoked:
+                del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return header, claims
+
+    def put(self, token, header, claims):
+        """Сохраняет токен, прошедший полную проверку подписи и срока действия."""
+        expires = min(claims.get("exp", float("inf")), time.time() + self.max_ttl)
+        jti = claims.get("jti")
+        digest = self._digest(token)
+        with self._lock:
+            if jti in self._revoked:
+                return
+            self._entries[digest] = (expires, jti, header, claims)
+            self._entries.move_to_end(digest)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def revoke(self, jti, expires=None):
+        """Отзывает токен по jti и удаляет его из кэша.
+
+        Аргументы:
+            jti (str): Идентификатор токена.
+            expires (float): Время истечения токена (claim exp); до него jti считается
+                отозванным. Если не задано, jti отзывается бессрочно.
+        """
+        now = time.time()
+        with self._lock:
+            self._revoked[jti] = expires if expires is not None else float("inf")
+            self._revoked = {key: value for key, value in self._revoked.items() if value > now}
+            for digest in [d for d, entry in self._entries.items() if entry[1] == jti]:
+                del self._entries[digest]
+
+    def is_revoked(self, jti):
+        """Проверяет, отозван ли токен с данным jti."""
+        with self._lock:
+            expires = self._revoked.get(jti)
+            return expires is not None and expires > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Общий кэш проверенных токенов сервера
+token_cache = TokenCache()
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager, который не проверяет подпись уже проверенного токена повторно.
+
+    Кэш стоит за verify_jwt_in_request: заменяется только декодирование токена,
+    а проверка типа токена, token_in_blocklist_loader, загрузка пользователя и
+    заполнение контекста запроса по-прежнему выполняются flask_jwt_extended на
+    каждом запросе.
+
+    Аргументы:
+        app (Flask): Приложение, как в JWTManager.
+        cache (TokenCache): Кэш проверенных токенов. По умолчанию token_cache.
+    """
+
+    def __init__(self, app=None, cache=None, **kwargs):
+        self.cache = cache if cache is not None else token_cache
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # Токены с CSRF-значением и проверка с allow_expired идут полным путем
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        cached = self.cache.get(encoded_token)
+        if cached is not None:
+            return cached[1]
+        claims = super()._decode_jwt_from_config(encoded_token)
+        self.cache.put(encoded_token, jwt.get_unverified_header(encoded_token), claims)
+        return claims
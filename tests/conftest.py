@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Модули пакетов drone и server импортируют соседей напрямую (from clock import ...),
+# поэтому каталоги пакетов добавляются в sys.path так же, как при запуске из них.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for package_dir in ("drone", "server"):
+    path = os.path.join(ROOT, package_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,106 @@
+"""Замер времени импорта точек входа проекта.
+
+Запуск из корня репозитория:
+    python -m tests.import_benchmark [--repeats 5] [--top 5]
+
+Каждая точка входа импортируется в отдельном процессе интерпретатора, как при
+запуске сервиса: измеряется время импорта модуля (медиана повторов), список
+загруженных тяжелых зависимостей (HEAVY_MODULES) и самые дорогие модули по
+данным python -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Точки входа: {имя: (каталог в sys.path, импортируемый модуль)}.
+# Модули drone и server запускаются из своих каталогов, client и YetOne — из корня как пакеты.
+ENTRY_POINTS = {
+    "server.main": ("server", "main"),
+    "server.asgi": ("server", "asgi"),
+    "drone.drone_manager": ("drone", "drone_manager"),
+    "drone.mission_manager": ("drone", "mission_manager"),
+    "drone.drone_controller": ("drone", "drone_controller"),
+    "client.app": ("", "client.app"),
+    "client.device_manager": ("", "client.device_manager"),
+    "YetOne.api_interface": ("", "YetOne.api_interface"),
+}
+
+# Зависимости, которые должны загружаться только при использовании своих бэкендов
+HEAVY_MODULES = ("pygame", "airsim", "pymavlink", "cv2", "numpy")
+
+_PROBE = """
+import importlib, json, sys, time
+sys.path.insert(0, {path!r})
+started = time.perf_counter()
+try:
+    importlib.import_module({module!r})
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "error": error,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def _run(entry, extra_args=()):
+    directory, module = ENTRY_POINTS[entry]
+    code = _PROBE.format(path=os.path.join(ROOT, directory), module=module, heavy=HEAVY_MODULES)
+    # Профилирование и метрики не должны влиять на замер
+    environment = {**os.environ, "DRONE_PROFILE": "0"}
+    return subprocess.run([sys.executable, *extra_args, "-c", code], cwd=ROOT, env=environment,
+                          capture_output=True, text=True, check=True)
+
+
+def slowest_imports(entry, top=5):
+    """Возвращает самые дорогие модули точки входа: [(модуль, мс с учетом вложенных импортов)].
+
+    Учитываются только импорты верхнего уровня по данным python -X importtime.
+    """
+    stderr = _run(entry, ("-X", "importtime")).stderr
+    costs = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("  ") and not name.startswith("   "):
+            costs.append((name.strip(), int(cumulative) / 1000.0))
+    return sorted(costs, key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure(entry, repeats=5):
+    """Импортирует точку входа repeats раз в новых процессах.
+
+    Returns:
+        dict: Медиана времени импорта в мс, загруженные тяжелые зависимости и ошибка импорта.
+    """
+    runs = [json.loads(_run(entry).stdout.strip().splitlines()[-1]) for _ in range(repeats)]
+    return {"ms": statistics.median(run["seconds"] for run in runs) * 1000.0,
+            "heavy": runs[-1]["heavy"], "error": runs[-1]["error"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="Сколько самых дорогих модулей показать")
+    parser.add_argument("entries", nargs="*", default=sorted(ENTRY_POINTS))
+    arguments = parser.parse_args(argv)
+    results = {}
+    for entry in arguments.entries:
+        result = results[entry] = measure(entry, arguments.repeats)
+        status = f"ошибка импорта: {result['error']}" if result["error"] else \
+            f"тяжелые зависимости: {', '.join(result['heavy']) or 'нет'}"
+        print(f"{entry}: {result['ms']:.1f} мс, {status}")
+        if arguments.top:
+            for name, ms in slowest_imports(entry, arguments.top):
+                print(f"    {name}: {ms:.1f} мс")
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
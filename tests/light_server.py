@@ -1,7 +1,18 @@
+import os
+import threading
+import time
+
 from flask import Flask, request, jsonify
 
 app = Flask(__name__)
 
+# Искусственная задержка ответа на команду взлета, имитирует медленный канал связи с дроном
+RESPONSE_DELAY = float(os.environ.get('DRONE_RESPONSE_DELAY', 0))
+
+# Число одновременно выполняемых команд взлета и его максимум с последнего сброса
+takeoff_concurrency = {"active": 0, "peak": 0}
+_concurrency_lock = threading.Lock()
+
 # Модель данных
 class DroneModel:
     def __init__(self):
@@ -96,6 +107,22 @@ def update_speed():
 def check_battery():
     return jsonify(drone_controller.monitor_battery())
 
+@app.route('/takeoff', methods=['POST'])
+def takeoff():
+    data = request.get_json()
+    new_altitude = data.get('altitude', 10)
+    with _concurrency_lock:
+        takeoff_concurrency["active"] += 1
+        takeoff_concurrency["peak"] = max(takeoff_concurrency["peak"], takeoff_concurrency["active"])
+    try:
+        if RESPONSE_DELAY:
+            time.sleep(RESPONSE_DELAY)
+    finally:
+        with _concurrency_lock:
+            takeoff_concurrency["active"] -= 1
+    drone_controller.change_altitude(new_altitude)
+    return jsonify({"message": f"Взлет на высоту {new_altitude} м выполнен"})
+
 @app.route('/return_to_base', methods=['POST'])
 def return_to_base():
     return jsonify(drone_controller.return_to_base())
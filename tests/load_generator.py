@@ -0,0 +1,327 @@
+"""Генератор HTTP-нагрузки с заданной частотой и гистограммами задержек.
+
+Запуск из корня репозитория против уже запущенного сервиса:
+    python -m tests.load_generator --url http://127.0.0.1:5000 --mix light --rate 200 --duration 30 \
+        [--weights status=8,position=1,takeoff=1] [--connections 64] [--token JWT] \
+        [--output results.json] [--compare baseline.json]
+
+Смеси запросов: light — дрон-заглушка tests/light_server.py, server — server/main.py
+(при --mix server генератор регистрирует дронов с адресом --drone-url и, если
+не задан --token, создает токен оператора), client — страницы клиентского приложения.
+
+Нагрузка открытая: i-й запрос назначается на момент start + i / rate и задержка
+считается от назначенного момента, а не от фактической отправки. Если сервис не
+успевает, очередь растет и это видно в p99/p999, а не скрывается снижением
+частоты (coordinated omission). Результат сохраняется в JSON и сравнивается с
+результатом другой версии через --compare.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import sys
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+# Разрядность поддиапазона гистограммы: относительная погрешность значения не больше 1 / 2**(SUB_BUCKET_BITS - 1)
+SUB_BUCKET_BITS = 8
+REPORTED_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+# Вид запроса смеси: path и body могут содержать {drone} — идентификатор случайного дрона
+RequestKind = namedtuple("RequestKind", "name method path body weight")
+
+MIXES = {
+    "light": [
+        RequestKind("status", "GET", "/status", None, 8),
+        RequestKind("battery", "GET", "/battery", None, 2),
+        RequestKind("position", "POST", "/position", {"position": [10, 20]}, 2),
+        RequestKind("takeoff", "POST", "/takeoff", {"altitude": 10}, 1),
+    ],
+    "server": [
+        RequestKind("fleet", "GET", "/drones?limit=50", None, 4),
+        RequestKind("status", "GET", "/drones/{drone}", None, 8),
+        RequestKind("takeoff", "POST", "/drones/{drone}/takeoff", {"altitude": 10}, 1),
+    ],
+    "client": [
+        RequestKind("index", "GET", "/", None, 4),
+        RequestKind("control_panel", "GET", "/control-panel", None, 1),
+    ],
+}
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в стиле HDR Histogram.
+
+    Значения хранятся в микросекундах в логарифмически-линейных корзинах: каждый
+    диапазон [2**k, 2**(k+1)) делится на 2**(SUB_BUCKET_BITS - 1) равных корзин,
+    поэтому точность относительная и не зависит от масштаба, а память не зависит
+    от количества измерений. Перцентили возвращают верхнюю границу корзины.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.minimum = math.inf
+        self.maximum = 0
+        self._sum = 0
+
+    @staticmethod
+    def _index(value):
+        shift = max(value.bit_length() - SUB_BUCKET_BITS, 0)
+        return (shift << SUB_BUCKET_BITS) | (value >> shift)
+
+    @staticmethod
+    def _highest_equivalent(index):
+        shift = index >> SUB_BUCKET_BITS
+        return (((index & ((1 << SUB_BUCKET_BITS) - 1)) + 1) << shift) - 1
+
+    def record(self, seconds):
+        """Добавляет измерение задержки в секундах."""
+        value = max(int(seconds * 1e6), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self._sum += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self._sum += other._sum
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, percent):
+        """Возвращает задержку в микросекундах, не превышенную percent процентами измерений."""
+        if not self.total:
+            return 0
+        rank = max(math.ceil(self.total * percent / 100.0), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest_equivalent(index), self.maximum)
+        return self.maximum
+
+    def summary(self):
+        """Сводка для отчета: количество, среднее, минимум, максимум и перцентили в микросекундах."""
+        summary = {"count": self.total, "mean_us": self._sum / self.total if self.total else 0.0,
+                   "min_us": self.minimum if self.total else 0, "max_us": self.maximum}
+        for percent in REPORTED_PERCENTILES:
+            summary[f"p{percent:g}".replace(".", "")] = self.percentile(percent)
+        return summary
+
+    def to_dict(self):
+        return {"summary": self.summary(),
+                "buckets": [[self._highest_equivalent(index), self.counts[index]] for index in sorted(self.counts)]}
+
+
+async def http_request(connection, host, port, method, path, body=None, headers=None):
+    """Отправляет запрос HTTP/1.1 через keep-alive соединение и возвращает (статус, соединение).
+
+    Генератор нагрузки написан на потоках asyncio, а не на httpx: пул соединений
+    httpx сам расходует больше процессорного времени, чем измеряемые серверы.
+    """
+    if connection is None:
+        connection = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    head = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    if body is not None:
+        head += "Content-Type: application/json\r\n"
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                 f"Content-Length: {len(payload)}\r\n{head}\r\n".encode("latin-1") + payload)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        writer.close()
+        raise ConnectionError("Сервер закрыл соединение")
+    length = None
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    if not keep_alive:
+        writer.close()
+        connection = None
+    return int(status_line.split()[1]), connection
+
+
+def _render(value, drone):
+    if isinstance(value, str):
+        return value.replace("{drone}", drone)
+    if isinstance(value, dict):
+        return {key: _render(item, drone) for key, item in value.items()}
+    return value
+
+
+async def run_load(url, mix, rate, duration, connections=64, headers=None, drone_ids=("D000",), seed=0):
+    """Нагружает сервис смесью запросов с частотой rate в течение duration секунд.
+
+    Args:
+        url (str): Базовый адрес сервиса, например http://127.0.0.1:5000.
+        mix (list): Виды запросов RequestKind с весами.
+        rate (float): Целевая частота запросов в секунду.
+        duration (float): Длительность нагрузки в секундах.
+        connections (int): Количество keep-alive соединений (одновременных запросов).
+        headers (dict): Заголовки всех запросов, например авторизация.
+        drone_ids (sequence): Идентификаторы для подстановки {drone}.
+        seed (int): Зерно выбора видов запросов и дронов; одинаковое зерно дает одинаковую последовательность.
+
+    Returns:
+        dict: Отчет: частота, пропускная способность, статусы и гистограммы задержек.
+    """
+    target = urlsplit(url)
+    host, port = target.hostname, target.port or 80
+    rng = random.Random(seed)
+    total = int(rate * duration)
+    kinds = rng.choices(mix, weights=[kind.weight for kind in mix], k=total)
+    drones = [rng.choice(drone_ids) for _ in range(total)]
+    overall = LatencyHistogram()
+    by_kind = {kind.name: LatencyHistogram() for kind in mix}
+    statuses = {}
+    errors = {}
+    counter = iter(range(total))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def worker():
+        connection = None
+        for i in counter:
+            intended = start + i / rate
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = kinds[i]
+            try:
+                status, connection = await http_request(connection, host, port, kind.method,
+                                                        _render(kind.path, drones[i]),
+                                                        _render(kind.body, drones[i]), headers)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                connection = None
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latency = loop.time() - intended
+            overall.record(latency)
+            by_kind[kind.name].record(latency)
+            statuses[status] = statuses.get(status, 0) + 1
+        if connection is not None:
+            connection[1].close()
+
+    await asyncio.gather(*(worker() for _ in range(connections)))
+    elapsed = loop.time() - start
+    return {
+        "url": url,
+        "target_rate": rate,
+        "duration": duration,
+        "connections": connections,
+        "requests": total,
+        "elapsed": elapsed,
+        "throughput": overall.total / elapsed if elapsed else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "errors": errors,
+        "latency": overall.to_dict(),
+        "kinds": {name: histogram.summary() for name, histogram in by_kind.items()},
+    }
+
+
+def compare(baseline, current):
+    """Сравнивает два отчета: {показатель: (эталон, текущее значение, отношение)}."""
+    rows = {"throughput": (baseline["throughput"], current["throughput"])}
+    for key in ("p50", "p99", "p999", "max_us"):
+        rows[key] = (baseline["latency"]["summary"][key], current["latency"]["summary"][key])
+    return {key: (old, new, new / old if old else math.inf) for key, (old, new) in rows.items()}
+
+
+def parse_weights(mix, weights):
+    """Переопределяет веса смеси строкой вида status=8,takeoff=1."""
+    overrides = dict(item.split("=") for item in weights.split(",")) if weights else {}
+    unknown = set(overrides) - {kind.name for kind in mix}
+    if unknown:
+        raise ValueError(f"Неизвестные виды запросов: {', '.join(sorted(unknown))}")
+    mix = [kind._replace(weight=float(overrides.get(kind.name, kind.weight))) for kind in mix]
+    return [kind for kind in mix if kind.weight > 0]
+
+
+async def _prepare_server(url, drone_url, count):
+    target = urlsplit(url)
+    connection = None
+    drone_ids = [f"LOADGEN{i:04d}" for i in range(count)]
+    for drone_id in drone_ids:
+        _, connection = await http_request(connection, target.hostname, target.port or 80, "POST", "/drones",
+                                           {"drone_id": drone_id, "control_url": drone_url})
+    if connection is not None:
+        connection[1].close()
+    return drone_ids
+
+
+def _operator_token():
+    from tests.load_test import _tokens
+    return _tokens(1)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="light")
+    parser.add_argument("--weights", help="Веса видов запросов, например status=8,takeoff=1")
+    parser.add_argument("--rate", type=float, default=100.0, help="Запросов в секунду")
+    parser.add_argument("--duration", type=float, default=10.0, help="Секунд нагрузки")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--token", help="JWT оператора для --mix server")
+    parser.add_argument("--drone-url", default="http://127.0.0.1:5000", help="Адрес дрона для --mix server")
+    parser.add_argument("--drones", type=int, default=10, help="Количество дронов для --mix server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл JSON для результата")
+    parser.add_argument("--compare", help="Файл JSON предыдущего результата для сравнения")
+    arguments = parser.parse_args(argv)
+
+    mix = parse_weights(MIXES[arguments.mix], arguments.weights)
+    headers = {}
+    drone_ids = ("D000",)
+    if arguments.mix == "server":
+        headers["Authorization"] = f"Bearer {arguments.token or _operator_token()}"
+        drone_ids = asyncio.run(_prepare_server(arguments.url, arguments.drone_url, arguments.drones))
+    report = asyncio.run(run_load(arguments.url, mix, arguments.rate, arguments.duration,
+                                  arguments.connections, headers, drone_ids, arguments.seed))
+    report["mix"] = {kind.name: kind.weight for kind in mix}
+
+    summary = report["latency"]["summary"]
+    print(f"{report['throughput']:.1f} запросов/с при целевых {arguments.rate:g}, статусы {report['statuses']}"
+          + (f", ошибки {report['errors']}" if report["errors"] else ""))
+    print("задержка, мс: " + ", ".join(f"{label} {summary[key] / 1000:.2f}" for label, key in
+                                       (("p50", "p50"), ("p90", "p90"), ("p99", "p99"), ("p99.9", "p999"),
+                                        ("max", "max_us"))))
+    for name, kind_summary in report["kinds"].items():
+        print(f"  {name}: {kind_summary['count']} запросов, p50 {kind_summary['p50'] / 1000:.2f} мс, "
+              f"p99 {kind_summary['p99'] / 1000:.2f} мс")
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for key, (old, new, ratio) in compare(baseline, report).items():
+            print(f"{key}: {old:.1f} -> {new:.1f} ({ratio:.2f}x)")
+    return report
+
+
+if __name__ == "__main__":
+    logging.captureWarnings(True)
+    main(sys.argv[1:])
@@ -0,0 +1,153 @@
+"""Нагрузочное сравнение текущего WSGI-сервера и ASGI-приложения на команде взлета.
+
+Запуск из корня репозитория:
+    python -m tests.load_test [--requests 1000] [--concurrency 100] [--delay 0.05] [--workers 1]
+
+Дрон-заглушка tests/light_server.py (отвечает с задержкой delay), WSGI-сервер
+(как app.run, многопоточный werkzeug) и ASGI-приложение под uvicorn запускаются
+отдельными процессами, как в эксплуатации. Генератор нагрузки отправляет
+команды взлета с заданной параллельностью и печатает число запросов в секунду.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from tests.load_generator import http_request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, "server")
+
+# Всплески ограничителей rate_limit.user_limiter и rate_limit.drone_limiter
+USER_BURST = 40
+DRONE_BURST = 10
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Сервер на порту {port} не запустился")
+
+
+def _spawn(arguments, port, environment):
+    process = subprocess.Popen([sys.executable] + arguments, cwd=ROOT, env={**os.environ, **environment},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_for_port(port)
+    return process
+
+
+def _serve(kind, port):
+    """Точка входа дочернего процесса: дрон-заглушка или текущий WSGI-сервер."""
+    sys.path.insert(0, SERVER_DIR)
+    from werkzeug.serving import make_server
+
+    if kind == "drone":
+        from tests.light_server import app
+    else:
+        from main import app
+    make_server("127.0.0.1", port, app, threaded=True).serve_forever()
+
+
+def _tokens(count):
+    sys.path.insert(0, SERVER_DIR)
+    from flask_jwt_extended import create_access_token
+    from main import app
+
+    with app.app_context():
+        return [create_access_token(identity=f"operator{i}") for i in range(count)]
+
+
+async def _load(port, tokens, drone_url, requests, concurrency):
+    # Команды распределяются по операторам и дронам так, чтобы каждый укладывался
+    # в свой всплеск ограничителя частоты и замерялась пропускная способность, а не 429
+    drone_count = requests // DRONE_BURST + 1
+    connection = None
+    for i in range(drone_count):
+        _, connection = await http_request(connection, "127.0.0.1", port, "POST", "/drones",
+                                           {"drone_id": f"LOAD{i:05d}", "control_url": drone_url})
+    if connection is not None:
+        connection[1].close()
+
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        worker_connection = None
+        for i in counter:
+            status, worker_connection = await http_request(
+                worker_connection, "127.0.0.1", port, "POST", f"/drones/LOAD{i % drone_count:05d}/takeoff", {"altitude": 10},
+                {"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+            statuses[status] = statuses.get(status, 0) + 1
+        if worker_connection is not None:
+            worker_connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started), statuses
+
+
+def run(requests=1000, concurrency=100, delay=0.05, workers=1, registry_path=None):
+    """Нагружает оба сервера и возвращает {имя сервера: (запросов в секунду, {статус: количество})}.
+
+    При workers > 1 воркеры ASGI-приложения делят SQLite-реестр по пути registry_path.
+    """
+    drone_port = _free_port()
+    drone = _spawn(["-m", "tests.load_test", "--serve", "drone", str(drone_port)], drone_port,
+                   {"DRONE_RESPONSE_DELAY": str(delay)})
+    tokens = _tokens(requests // USER_BURST + 1)
+    environment = {"DRONE_REGISTRY_PATH": registry_path} if registry_path else {}
+    results = {}
+    try:
+        for name in ("wsgi", "asgi"):
+            port = _free_port()
+            if name == "wsgi":
+                arguments = ["-m", "tests.load_test", "--serve", "wsgi", str(port)]
+            else:
+                arguments = ["-m", "uvicorn", "--app-dir", SERVER_DIR, "--port", str(port),
+                             "--workers", str(workers), "--log-level", "warning", "asgi:app"]
+            server = _spawn(arguments, port, environment)
+            try:
+                results[name] = asyncio.run(_load(port, tokens,
+                                                  f"http://127.0.0.1:{drone_port}", requests, concurrency))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        drone.terminate()
+        drone.wait()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--registry-path", help="SQLite-реестр, общий для воркеров (нужен при --workers > 1)")
+    parser.add_argument("--serve", nargs=2, metavar=("KIND", "PORT"), help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    if arguments.serve:
+        _serve(arguments.serve[0], int(arguments.serve[1]))
+    else:
+        logging.captureWarnings(True)
+        results = run(arguments.requests, arguments.concurrency, arguments.delay, arguments.workers,
+                      arguments.registry_path)
+        for server_name, (rps, statuses) in results.items():
+            successful = rps * statuses.get(200, 0) / arguments.requests
+            print(f"{server_name}: {rps:.1f} запросов/с, из них успешных {successful:.1f}/с, статусы {statuses}")
@@ -0,0 +1,216 @@
+"""Бенчмарки горячих путей проекта на pytest-benchmark.
+
+Зависимость pytest-benchmark в проекте не объявлена (в репозитории нет файла
+зависимостей и конфигурации CI), поэтому без нее модуль пропускается целиком:
+    pip install pytest-benchmark
+
+Эталон и шаг CI, сравнивающий с ним прогон, в репозиторий не входят: эталон
+снимается на машине CI, где и будут выполняться сравнения.
+
+Сохранение эталона (один раз на машине CI, файл коммитится вместе с изменением):
+    python -m pytest tests/test_benchmarks.py --benchmark-only \
+        --benchmark-storage=tests/.benchmarks --benchmark-save=baseline
+
+Проверка в CI: прогон завершается ошибкой, если среднее время какого-либо пути
+выросло больше чем на 25% относительно эталона:
+    python -m pytest tests/test_benchmarks.py --benchmark-only \
+        --benchmark-storage=tests/.benchmarks --benchmark-compare=0001 \
+        --benchmark-compare-fail=mean:25%
+
+Бэкенды дронов сравниваются на общей нагрузке backends.STANDARD_WORKLOAD. Симулятор
+замеряется всегда, остальные — если заданы их адреса, например:
+    DRONE_BENCHMARK_BACKENDS="mavlink=udpin:0.0.0.0:14550,airsim=127.0.0.1"
+
+Эталоны pytest-benchmark хранит по каталогам платформы и версии Python, поэтому
+сравнение выполняется только с эталоном той же конфигурации.
+"""
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+import requests
+from flask import jsonify
+from flask_jwt_extended import create_access_token
+from werkzeug.serving import make_server
+
+pytest.importorskip("pytest_benchmark", reason="бенчмарки требуют pytest-benchmark: pip install pytest-benchmark")
+
+import backends
+import drone_routes
+from client.sensor_manager import SensorManager, SensorObserver
+from clock import VirtualClock
+from main import app
+from schema import validate_drone
+from tests import light_server
+
+FLEET_SIZE = 1000
+
+
+@pytest.fixture
+def drone_manager(monkeypatch):
+    """Фикстура: модуль drone_manager с флотом из FLEET_SIZE дронов."""
+    import drone_manager
+
+    fleet = [{"drone_id": f"D{i:04d}", "model": "Phantom 4", "manufacturer": "DJI" if i % 2 else "AirSim",
+              "sensors": ["Camera", "GPS", "Altimeter", "Anemometer"], "max_speed": 20,
+              "max_altitude": 6000, "battery_capacity": 60 + i % 40} for i in range(FLEET_SIZE)]
+    monkeypatch.setattr(drone_manager, "DRONE_DATABASE", fleet)
+    # drone_logger создается в точке входа модуля
+    monkeypatch.setattr(drone_manager, "drone_logger", drone_manager.DroneLogger(), raising=False)
+    return drone_manager
+
+
+@pytest.mark.benchmark(group="drone_manager")
+def test_benchmark_fleet_selection(benchmark, drone_manager):
+    selected = benchmark(drone_manager.select_drone_for_mission, 75)
+    assert len(selected) == FLEET_SIZE * 25 // 40
+
+
+@pytest.mark.benchmark(group="drone_manager")
+def test_benchmark_fleet_approval(benchmark, drone_manager):
+    def approve():
+        return [drone_manager.approve_drone_for_mission(f"D{i:04d}") for i in range(0, FLEET_SIZE, 10)]
+
+    approved = benchmark(approve)
+    assert all(approved)
+
+
+@pytest.mark.benchmark(group="drone_manager")
+def test_benchmark_drone_factory_get_drone(benchmark, drone_manager):
+    factory = drone_manager.DJIDroneFactory()
+    arguments = ("DJI001", "Phantom 4", "DJI", ["Camera", "GPS", "Altimeter", "Anemometer"], 20, 6000, 80)
+    first = factory.get_drone(*arguments)
+    assert benchmark(factory.get_drone, *arguments) is first
+
+
+class _CountingObserver(SensorObserver):
+    def __init__(self):
+        self.updates = 0
+
+    def update(self, data):
+        self.updates += 1
+
+
+class _ConstantSensor:
+    def __init__(self, value):
+        self.value = value
+
+    def read_data(self):
+        return self.value
+
+
+@pytest.mark.benchmark(group="client")
+def test_benchmark_sensor_manager_read_sensors(benchmark):
+    manager = SensorManager()
+    for i in range(50):
+        # Имена типов различаются, иначе показания затирают друг друга в результате read_sensors
+        manager.add_sensor(type(f"Sensor{i}", (_ConstantSensor,), {})(i))
+    observers = [_CountingObserver() for _ in range(50)]
+    for observer in observers:
+        manager.add_observer(observer)
+    assert len(benchmark(manager.read_sensors)) == 50
+    assert observers[0].updates == observers[-1].updates > 0
+
+
+class _FrameCapture:
+    """Источник кадров 640x480 вместо cv2.VideoCapture."""
+
+    def __init__(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        return True, self.frame
+
+
+@pytest.mark.benchmark(group="client")
+def test_benchmark_mjpeg_encode_per_frame(benchmark):
+    pytest.importorskip("cv2")
+    from client.device_manager import DeviceManager
+
+    manager = DeviceManager()
+    manager.camera_device = type("Camera", (), {"capture": _FrameCapture()})()
+    stream = manager.video_stream()
+    chunk = benchmark(next, stream)
+    assert chunk.startswith(b"--frame\r\nContent-Type: image/jpeg")
+
+
+@pytest.mark.benchmark(group="server")
+def test_benchmark_light_server_json(benchmark):
+    status = light_server.drone_view.display_status(light_server.drone_model)
+    with light_server.app.app_context():
+        response = benchmark(jsonify, status)
+    assert response.get_json()["battery_level"] == status["battery_level"]
+
+
+@pytest.mark.benchmark(group="server")
+def test_benchmark_validate_drone(benchmark):
+    record = {"drone_id": "DJI001", "model": "Phantom 4", "manufacturer": "DJI",
+              "sensors": ["Camera", "GPS"], "max_speed": 20, "max_altitude": 6000, "battery_capacity": 80}
+    assert benchmark(validate_drone, record) == record
+
+
+@pytest.fixture
+def drones_endpoint():
+    """Фикстура: сервер с флотом из 100 дронов в отдельном потоке и авторизованная сессия."""
+    drone_routes.drones.clear()
+    with app.app_context():
+        token = create_access_token(identity="benchmark")
+    for i in range(100):
+        drone_routes.drones[f"D{i:03d}"] = {"manufacturer": "DJI", "status": "operational",
+                                           "control_url": f"http://drone{i}"}
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+    yield session, f"http://127.0.0.1:{server.server_port}/drones"
+    session.close()
+    server.shutdown()
+    thread.join()
+    drone_routes.drones.clear()
+
+
+@pytest.mark.benchmark(group="server")
+def test_benchmark_get_drones_latency(benchmark, drones_endpoint):
+    session, url = drones_endpoint
+    response = benchmark(session.get, url, params={"limit": 50})
+    assert response.status_code == 200
+    assert len(response.json()) == 50
+
+
+@pytest.mark.benchmark(group="auth")
+@pytest.mark.parametrize("cached", [True, False], ids=["cached", "uncached"])
+def test_benchmark_authenticated_route(benchmark, drones_endpoint, monkeypatch, cached):
+    from token_cache import token_cache
+
+    if not cached:
+        monkeypatch.setattr(token_cache, "get", lambda token: None)
+    session, url = drones_endpoint
+    assert benchmark(session.get, url + "/missing").status_code == 404
+
+
+def _backend_uris():
+    """Адреса бэкендов из DRONE_BENCHMARK_BACKENDS: {имя: URI}."""
+    value = os.environ.get("DRONE_BENCHMARK_BACKENDS", "")
+    return dict(item.split("=", 1) for item in value.split(",") if "=" in item)
+
+
+@pytest.mark.benchmark(group="backends")
+@pytest.mark.parametrize("name", ["simulator"] + sorted(set(_backend_uris()) - {"simulator"}))
+def test_benchmark_backend_workload(benchmark, name):
+    options = {"clock": VirtualClock()} if name == "simulator" else {}
+    backend = backends.get_backend(name, _backend_uris().get(name), **options)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(backend.connect())
+        durations = benchmark(lambda: loop.run_until_complete(backends.run_workload(backend)))
+        loop.run_until_complete(backend.close())
+    finally:
+        loop.close()
+    assert len(durations) == len(backends.STANDARD_WORKLOAD)
@@ -0,0 +1,112 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+from client import logging_config
+from client.sensor_manager import SENSOR_READ_SECONDS, Altimeter, GPSSensor, SensorManager
+from tests import import_benchmark
+
+
+@pytest.fixture
+def log_setup(tmp_path):
+    """Фикстура: асинхронная подсистема логирования с файлами во временном каталоге."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    listener = logging_config.setup_logging(log_file=str(tmp_path / "app.log"), console=False,
+                                            log_files={"security": str(tmp_path / "security.log")})
+    yield listener, tmp_path
+    logging_config.stop_logging()
+    root.handlers[:] = saved_handlers
+    root.setLevel(saved_level)
+
+
+def test_logging_writes_through_queue_listener(log_setup):
+    """Тест: записи уходят в файлы из потока QueueListener, журнал безопасности — в свой файл."""
+    listener, tmp_path = log_setup
+    handlers = logging.getLogger().handlers
+    assert sum(isinstance(handler, logging_config.DeferredQueueHandler) for handler in handlers) == 1
+    assert not any(type(handler) in (logging.FileHandler, logging.StreamHandler) for handler in handlers)
+    logging.getLogger("security").warning("Токен отозван")
+    logging.getLogger("drone_manager").info("Drone %s selected for mission.", "DJI001")
+    logging_config.stop_logging()
+
+    app_log = (tmp_path / "app.log").read_text(encoding="utf-8")
+    security_log = (tmp_path / "security.log").read_text(encoding="utf-8")
+    assert "Drone DJI001 selected for mission." in app_log
+    assert "Токен отозван" in app_log and "Токен отозван" in security_log
+    assert "DJI001" not in security_log
+
+
+def test_security_debug_records_reach_security_log(log_setup):
+    """Тест: DEBUG журнала безопасности пишется в его файл, но не в общий журнал уровня INFO."""
+    _, tmp_path = log_setup
+    logging.getLogger("security").debug("Проверка токена оператора")
+    logging.getLogger("drone_manager").debug("Отладка менеджера")
+    logging_config.stop_logging()
+    assert "Проверка токена оператора" in (tmp_path / "security.log").read_text(encoding="utf-8")
+    # Файл создается при первой записи: в общий журнал не попало ни одной
+    assert not (tmp_path / "app.log").exists()
+
+
+def test_client_modules_run_with_python_m(tmp_path):
+    """Тест: клиентские модули запускаются как python -m client.<модуль> и настраивают журнал."""
+    environment = {**os.environ, "PYTHONPATH": import_benchmark.ROOT}
+    result = subprocess.run([sys.executable, "-m", "client.devices"], cwd=tmp_path, env=environment,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "Camera telemetry" in (tmp_path / "app.log").read_text(encoding="utf-8")
+
+
+def test_frequent_messages_are_sampled(log_setup):
+    """Тест: покадровое сообщение пишется один раз на 100 кадров."""
+    _, tmp_path = log_setup
+    camera_logger = logging.getLogger("Camera")
+    for _ in range(250):
+        camera_logger.info("Кадр успешно обработан.")
+    logging_config.stop_logging()
+    assert (tmp_path / "app.log").read_text(encoding="utf-8").count("Кадр успешно обработан.") == 3
+
+
+def test_deferred_handler_formats_mutable_arguments_eagerly():
+    """Тест: запись с изменяемым аргументом форматируется сразу, с неизменяемыми — в потоке журнала."""
+    handler = logging_config.DeferredQueueHandler(None)
+    telemetry = {"altitude": 10}
+    eager = handler.prepare(logging.LogRecord("t", logging.INFO, __file__, 1, "Телеметрия %s", (telemetry,), None))
+    telemetry["altitude"] = 20
+    lazy = handler.prepare(logging.LogRecord("t", logging.INFO, __file__, 1, "Кадр %d", (7,), None))
+    assert eager.getMessage() == "Телеметрия {'altitude': 10}"
+    assert lazy.args == (7,) and lazy.getMessage() == "Кадр 7"
+
+
+def test_logging_overhead_report(tmp_path):
+    """Тест: отчет о накладных расходах содержит время вызова для всех вариантов."""
+    report = logging_config.measure_overhead(calls=2000, directory=str(tmp_path))
+    assert set(report) == {"sync", "queued", "sampled"}
+    assert all(overhead > 0 for overhead in report.values())
+    assert report["sampled"] < report["sync"]
+
+
+def test_sensor_reads_are_timed_in_shared_registry():
+    """Тест: read_data сенсоров замеряется в общем реестре метрик процесса."""
+    from metrics import REGISTRY
+
+    assert "drone.metrics" not in sys.modules
+    manager = SensorManager()
+    manager.add_sensor(Altimeter())
+    manager.add_sensor(GPSSensor())
+    before = sum(SENSOR_READ_SECONDS.labels("GPSSensor").counts)
+    manager.read_sensors()
+    assert sum(SENSOR_READ_SECONDS.labels("GPSSensor").counts) == before + 1
+    text = REGISTRY.render()
+    assert 'client_sensor_read_duration_seconds_count{sensor="Altimeter"}' in text
+    assert "# TYPE client_sensors gauge" in text
+
+
+def test_device_manager_loads_opencv_lazily():
+    """Тест: cv2 не загружается при импорте менеджера устройств, только при захвате видео."""
+    result = import_benchmark.measure("client.device_manager", repeats=1)
+    assert result["error"] is None
+    assert "cv2" not in result["heavy"]
@@ -0,0 +1,970 @@
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import backends
+from assignment import INFEASIBLE_COST, AssignmentSolver, build_cost_matrix
+from clock import RealClock, VirtualClock
+from energy_model import EnergyModel, MissionPlan
+from flight_recorder import FlightDataReader, FlightRecorder
+import metrics
+from metrics import MetricsRegistry, timed
+import mavlink_channel
+from mavlink_channel import LocalMavlinkVehicle, MavlinkCommandChannel, MavlinkCommandError, mission_item
+from path_planner import GridMap, PathPlanner
+import profiler
+from replay import DEFAULT_DECODERS, MissionReplay, ReplayResult, diff_traces
+from spatial_index import SpatialIndex
+
+
+def test_virtual_clock_sleep_is_instant():
+    """Тест: виртуальная задержка сдвигает время без реального ожидания."""
+    clock = VirtualClock()
+
+    async def patrol():
+        for _ in range(100):
+            await clock.sleep(1)
+
+    started = time.perf_counter()
+    asyncio.run(patrol())
+    assert clock.now() == 100
+    assert time.perf_counter() - started < 1
+
+
+def test_virtual_clock_wakes_tasks_in_deadline_order():
+    """Тест: параллельные задачи пробуждаются в порядке сроков."""
+    clock = VirtualClock()
+    events = []
+
+    async def worker(name, delay, repeats):
+        for _ in range(repeats):
+            await clock.sleep(delay)
+            events.append((clock.now(), name))
+
+    async def run():
+        await asyncio.gather(worker("slow", 3, 2), worker("fast", 1, 4))
+
+    asyncio.run(run())
+    assert events == [(1, "fast"), (2, "fast"), (3, "slow"), (3, "fast"), (4, "fast"), (6, "slow")]
+
+
+def test_virtual_clocks_share_event_loop():
+    """Тест: двое часов в одном цикле событий и опрос через asyncio.sleep(0) не останавливают время."""
+    clocks = VirtualClock(), VirtualClock()
+    stopped = asyncio.Event()
+
+    async def worker(clock, delay):
+        for _ in range(5):
+            await clock.sleep(delay)
+        return clock.now()
+
+    async def poller():
+        polls = 0
+        while not stopped.is_set():
+            polls += 1
+            await asyncio.sleep(0)
+        return polls
+
+    async def run():
+        polling = asyncio.ensure_future(poller())
+        finished = await asyncio.wait_for(asyncio.gather(worker(clocks[0], 1), worker(clocks[1], 3)), timeout=5)
+        stopped.set()
+        return finished, await polling
+
+    finished, polls = asyncio.run(run())
+    assert finished == [5, 15]
+    assert polls > 0
+
+
+def test_virtual_clock_manual_advance():
+    """Тест: ручной сдвиг времени и запрет отрицательных задержек."""
+    clock = VirtualClock(start=10)
+    clock.advance(2.5)
+    assert clock.now() == 12.5
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+
+
+def test_real_clock_is_monotonic():
+    """Тест: часы реального времени не идут назад."""
+    clock = RealClock()
+    first = clock.now()
+    asyncio.run(clock.sleep(0))
+    assert clock.now() >= first
+
+
+def test_drone_controller_uses_injected_clock():
+    """Тест: команды DroneController используют переданные часы."""
+    from drone_controller import DroneController, MoveForward, Takeoff, Turn
+
+    clock = VirtualClock()
+    drone = DroneController(clock=clock)
+
+    async def mission():
+        await Takeoff(drone).execute()
+        for _ in range(50):
+            await MoveForward(drone, 10).execute()
+            await Turn(drone, 90).execute()
+
+    asyncio.run(mission())
+    assert clock.now() == 101
+
+
+def _brute_force_pairs(positions, min_distance):
+    ids = sorted(positions)
+    pairs = set()
+    for i, a in enumerate(ids):
+        for b in ids[i + 1:]:
+            if math.dist(positions[a], positions[b]) < min_distance:
+                pairs.add(frozenset((a, b)))
+    return pairs
+
+
+@pytest.fixture
+def fleet_positions():
+    """Фикстура: псевдослучайные позиции флота из 300 дронов."""
+    rng = random.Random(42)
+    return {f"D{i:03d}": (rng.uniform(-500, 500), rng.uniform(-500, 500)) for i in range(300)}
+
+
+def test_spatial_index_queries_match_brute_force(fleet_positions):
+    """Тест: запросы индекса совпадают с полным перебором."""
+    index = SpatialIndex(cell_size=25)
+    for drone_id, position in fleet_positions.items():
+        index.update(drone_id, position)
+
+    point = (12.0, -40.0)
+    expected = sorted(fleet_positions, key=lambda d: math.dist(point, fleet_positions[d]))
+    assert [d for d, _ in index.nearest(point, k=5)] == expected[:5]
+
+    in_radius = {d for d, p in fleet_positions.items() if math.dist(point, p) <= 60}
+    assert {d for d, _ in index.within_radius(point, 60)} == in_radius
+
+    violations = index.separation_violations(20)
+    assert {frozenset((a, b)) for a, b, _ in violations} == _brute_force_pairs(fleet_positions, 20)
+
+
+def test_spatial_index_incremental_update_and_remove():
+    """Тест: перемещение и удаление дронов обновляют индекс."""
+    index = SpatialIndex(cell_size=10)
+    index.update("A", (0, 0))
+    index.update("B", (100, 100))
+    assert index.nearest((90, 90), exclude="B") == [("A", math.hypot(90, 90))]
+
+    index.update("A", (95, 95))
+    assert index.separation_violations(10)[0][:2] in (("A", "B"), ("B", "A"))
+
+    index.remove("A")
+    assert "A" not in index
+    assert index.within_radius((95, 95), 5) == []
+    assert len(index) == 1
+
+
+def test_spatial_index_far_query_scans_only_occupied_area(fleet_positions, monkeypatch):
+    """Тест: запрос вдали от флота перебирает ячейки только внутри охватывающего прямоугольника."""
+    index = SpatialIndex(cell_size=25)
+    for drone_id, position in fleet_positions.items():
+        index.update(drone_id, position)
+    ring = index._ring
+    visited = []
+    monkeypatch.setattr(index, "_ring", lambda center, radius: visited.extend(ring(center, radius)) or ring(center, radius))
+
+    point = (1e7, -1e7)
+    expected = sorted(fleet_positions, key=lambda d: math.dist(point, fleet_positions[d]))
+    assert [d for d, _ in index.nearest(point, k=3)] == expected[:3]
+    # Сетка флота — 40x40 ячеек, без ограничения перебирались бы кольца радиусом ~400000 ячеек
+    assert len(visited) <= 41 * 41
+
+
+def test_spatial_index_distinguishes_id_types():
+    """Тест: идентификаторы 1 и "1" в одной ячейке образуют пару нарушения дистанции."""
+    index = SpatialIndex(cell_size=10)
+    index.update(1, (0, 0))
+    index.update("1", (1, 1))
+    assert [frozenset((a, b)) for a, b, _ in index.separation_violations(5)] == [frozenset((1, "1"))]
+
+
+@pytest.fixture
+def walled_map():
+    """Фикстура: карта 20x20 со стеной x=10 и проходом в верхнем ряду."""
+    grid_map = GridMap(20, 20)
+    for y in range(1, 20):
+        grid_map.set_obstacle((10, y))
+    return grid_map
+
+
+def test_path_planner_routes_around_obstacles(walled_map):
+    """Тест: A* обходит стену через проход."""
+    planner = PathPlanner(walled_map)
+    route = planner.plan((0, 10), (19, 10))
+    assert route[0] == (0, 10) and route[-1] == (19, 10)
+    assert (10, 0) in route
+    assert all(walled_map.is_free(cell) for cell in route)
+    assert planner.plan((0, 10), (10, 5)) is None
+
+
+def test_path_planner_energy_aware_costs():
+    """Тест: маршрут избегает дорогих по энергии ячеек."""
+    grid_map = GridMap(10, 3)
+    for x in range(1, 9):
+        grid_map.set_cost((x, 1), 10.0)
+    route = PathPlanner(grid_map).plan((0, 1), (9, 1))
+    assert not any(cell[1] == 1 for cell in route[1:-1])
+
+
+def test_path_planner_batch_and_cache(walled_map):
+    """Тест: пакетное планирование, кэш и инвалидация по версии карты."""
+    planner = PathPlanner(walled_map, cache_size=2)
+    requests = [((0, y), (19, 19)) for y in range(5)] + [((0, 0), (19, 19))]
+    routes = planner.plan_many(requests)
+    assert routes[0] is routes[-1]
+    assert planner.misses == 5
+
+    planner.plan((0, 4), (19, 19))
+    assert planner.hits == 1
+
+    walled_map.set_obstacle((10, 0))
+    assert planner.plan((0, 4), (19, 19)) is None
+    assert planner.misses == 6
+
+
+def test_mission_manager_plans_fleet_routes(walled_map):
+    """Тест: менеджер миссий планирует маршруты для всего флота."""
+    from mission_manager import MissionManager
+
+    manager = MissionManager(path_planner=PathPlanner(walled_map))
+    routes = manager.plan_routes({"DJI001": ((0, 0), (19, 19)), "AIRSIM001": ((0, 5), (10, 5))})
+    assert routes["DJI001"][-1] == (19, 19)
+    assert routes["AIRSIM001"] is None
+
+
+@pytest.fixture
+def survey_plan():
+    """Фикстура: план с взлетом на 50 м, полетом 2 км и посадкой."""
+    return MissionPlan([(0, 0, 0), (0, 0, 50), (1000, 0, 50), (1000, 1000, 50), (1000, 1000, 0)], speed=10)
+
+
+def test_energy_model_grows_with_distance_climb_and_wind(survey_plan):
+    """Тест: расход растет с ветром, а набор высоты дороже спуска."""
+    model = EnergyModel()
+    calm = model.predict(survey_plan)
+    assert model.predict(survey_plan, wind_speed=5) > calm
+    legs = model.leg_energy(survey_plan)
+    assert legs.shape == (4,)
+    assert legs[0] > legs[-1]
+
+
+def test_energy_model_filters_fleet_vectorized(survey_plan):
+    """Тест: векторизованная проверка совпадает с поштучной."""
+    model = EnergyModel()
+    capacities = np.array([20.0, 40.0, 80.0, 200.0])
+    speeds = np.array([15.0, 10.0, 5.0, 20.0])
+    mask, required = model.feasible(survey_plan, capacities, speeds, wind_speed=2)
+    for capacity, speed, ok, energy in zip(capacities, speeds, mask, required):
+        expected = model.predict(survey_plan, min(speed, survey_plan.speed), wind_speed=2)
+        assert energy == pytest.approx(expected)
+        assert ok == (expected <= capacity * (1 - model.reserve))
+
+
+def test_energy_tracker_reevaluates_in_flight(survey_plan):
+    """Тест: трекер переоценивает остаток при усилении ветра."""
+    model = EnergyModel()
+    full = model.predict(survey_plan)
+    tracker = model.tracker(survey_plan, capacity=full * 2)
+    assert tracker.update(leg=2, battery_level=60)
+    calm_remaining = tracker.remaining_energy()
+    assert tracker.update(leg=2, battery_level=60, wind_speed=8) is False
+    assert tracker.remaining_energy() > calm_remaining
+    assert tracker.update(leg=len(survey_plan), battery_level=25)
+
+
+def test_mission_plan_from_route():
+    """Тест: план из маршрута планировщика включает взлет и посадку."""
+    plan = MissionPlan.from_route(((0, 0), (1, 0), (2, 1)), speed=5, altitude=30, cell_size=10)
+    assert plan.climbs[0] == 30 and plan.climbs[-1] == -30
+    assert plan.distances.sum() == pytest.approx(10 + math.hypot(10, 10))
+
+
+def _brute_force_assignment(cost):
+    rows, cols = cost.shape
+    if rows <= cols:
+        return min(sum(cost[i, p[i]] for i in range(rows)) for p in itertools.permutations(range(cols), rows))
+    return min(sum(cost[p[j], j] for j in range(cols)) for p in itertools.permutations(range(rows), cols))
+
+
+@pytest.mark.parametrize("shape", [(4, 4), (3, 6), (6, 3)])
+def test_assignment_solver_is_optimal(shape):
+    """Тест: венгерский алгоритм находит оптимум полного перебора."""
+    rng = np.random.default_rng(7)
+    for _ in range(5):
+        cost = rng.uniform(0, 100, size=shape)
+        solver = AssignmentSolver(cost)
+        assignment = solver.solve()
+        assert len(assignment) == min(shape)
+        assert len(set(assignment.values())) == len(assignment)
+        assert solver.total_cost() == pytest.approx(_brute_force_assignment(cost))
+
+
+def test_assignment_solver_incremental_drone_dropout():
+    """Тест: после выбытия дрона переназначение совпадает с полным пересчетом."""
+    rng = np.random.default_rng(11)
+    cost = rng.uniform(0, 100, size=(5, 8))
+    solver = AssignmentSolver(cost)
+    dropped = solver.solve()[2]
+    assignment = solver.remove_drone(dropped)
+    assert dropped not in assignment.values()
+    reduced = np.delete(cost, dropped, axis=1)
+    assert solver.total_cost() == pytest.approx(_brute_force_assignment(reduced))
+
+
+def test_cost_matrix_excludes_missing_sensors():
+    """Тест: дрон без требуемого сенсора не получает миссию."""
+    cost = build_cost_matrix([(0, 0), (100, 0)], [(1, 0), (99, 0)],
+                             [["Camera"], ["GPS"]], [["GPS"], ["Camera", "GPS"]])
+    assert cost[0, 0] == INFEASIBLE_COST
+    assert AssignmentSolver(cost).solve() == {0: 1, 1: 0}
+
+
+def test_mission_manager_assigns_missions():
+    """Тест: менеджер миссий назначает ближайшие подходящие дроны."""
+    from mission_manager import MissionManager
+
+    missions = [{"mission_id": "recon", "start": (0, 0), "sensors": ["Camera"]},
+                {"mission_id": "patrol", "start": (50, 50), "sensors": ["GPS"]}]
+    drones = [{"drone_id": "DJI001", "position": (49, 49), "sensors": ["Camera", "GPS"]},
+              {"drone_id": "AIRSIM001", "position": (1, 1), "sensors": ["Camera"]}]
+    assert MissionManager().assign_missions(missions, drones) == {"recon": "AIRSIM001", "patrol": "DJI001"}
+
+
+@pytest.fixture
+def safety_check(tmp_path, monkeypatch):
+    """Фикстура: SafetyCheck с журналом security.log во временном каталоге."""
+    monkeypatch.chdir(tmp_path)
+    from security import SafetyCheck
+    return SafetyCheck("drone-secret-key-for-tests-0123456789")
+
+
+def _token(exp_in=3600, **claims):
+    import jwt
+    return jwt.encode({"sub": "operator", "exp": int(time.time()) + exp_in, **claims},
+                      "drone-secret-key-for-tests-0123456789", algorithm="HS256")
+
+
+def test_safety_check_caches_verified_tokens(safety_check, monkeypatch):
+    """Тест: повторная проверка токена не вызывает jwt.decode."""
+    import jwt
+    calls = []
+    original_decode = jwt.decode
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: calls.append(1) or original_decode(*a, **kw))
+
+    @safety_check
+    def takeoff(token=None):
+        return "ok"
+
+    token = _token()
+    assert [takeoff(token=token) for _ in range(100)] == ["ok"] * 100
+    assert len(calls) == 1
+    assert takeoff(token="forged") is None
+
+
+def test_safety_check_respects_exp_and_revocation(safety_check, monkeypatch):
+    """Тест: кэш не продлевает жизнь просроченного или отозванного токена."""
+    import jwt
+    token = _token(exp_in=2)
+    assert safety_check.check_token(token)
+    calls = []
+    monkeypatch.setattr(jwt, "decode", lambda *a, **kw: calls.append(1) or {})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 5)
+    safety_check.check_token(token)
+    assert calls == [1]  # После exp запись кэша не используется, токен проверяется заново
+    monkeypatch.undo()
+
+    token = _token()
+    assert safety_check.check_token(token)
+    safety_check.revoke(token)
+    assert not safety_check.check_token(token)
+
+
+def test_safety_check_cache_benchmark(safety_check):
+    """Бенчмарк: накладные расходы проверки токена на команду до и после кэша."""
+    import jwt
+    token = _token()
+    rounds = 2000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        jwt.decode(token, "drone-secret-key-for-tests-0123456789", algorithms=["HS256"])
+    uncached = (time.perf_counter() - started) / rounds
+    started = time.perf_counter()
+    for _ in range(rounds):
+        safety_check.check_token(token)
+    cached = (time.perf_counter() - started) / rounds
+    print(f"SafetyCheck: jwt.decode {uncached * 1e6:.1f} мкс, кэш {cached * 1e6:.1f} мкс")
+    assert cached < uncached
+
+
+def test_flight_recorder_round_trip_and_resume(tmp_path):
+    """Тест: записи читаются обратно, повторно открытый самописец дописывает сегмент."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=16)
+    recorder.record("D001", "position", (1.0, 2.0, 30.0), timestamp=1.0)
+    recorder.record("D002", "battery", (87.5,), timestamp=2.0)
+    recorder.close()
+
+    recorder = FlightRecorder(str(tmp_path), segment_records=16)
+    with pytest.raises(ValueError):
+        recorder.record("D001", "telemetry", (), timestamp=1.5)
+    recorder.record("D001", "turn", (90.0,), timestamp=3.0)
+    recorder.close()
+
+    records = FlightDataReader(str(tmp_path)).read()
+    assert len(list(tmp_path.iterdir())) == 1
+    assert records["timestamp"].tolist() == [1.0, 2.0, 3.0]
+    assert records["drone_id"].tolist() == [b"D001", b"D002", b"D001"]
+    assert records["values"][0, :records["count"][0]].tolist() == [1.0, 2.0, 30.0]
+
+
+def test_flight_recorder_resumes_after_oldest_segment_is_deleted(tmp_path):
+    """Тест: после удаления старого сегмента новый получает следующий номер и не затирает существующие."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=4)
+    recorder.record_many(np.arange(12.0), ["D001"] * 12, "battery", np.arange(12.0).reshape(-1, 1))
+    recorder.close()
+    segments = sorted(tmp_path.iterdir())
+    assert [path.name for path in segments] == ["segment-000001.fdr", "segment-000002.fdr", "segment-000003.fdr"]
+    segments[0].unlink()
+
+    recorder = FlightRecorder(str(tmp_path), segment_records=4)
+    recorder.record("D001", "battery", (12.0,), timestamp=12.0)
+    recorder.close()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "segment-000002.fdr", "segment-000003.fdr", "segment-000004.fdr"]
+    assert FlightDataReader(str(tmp_path)).read()["timestamp"].tolist() == list(np.arange(4.0, 13.0))
+
+
+def test_flight_recorder_rejects_long_drone_ids(tmp_path):
+    """Тест: идентификатор длиннее 16 байт UTF-8 отклоняется, а не обрезается молча."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=16)
+    recorder.record("Д" * 8, "battery", (50.0,), timestamp=1.0)
+    with pytest.raises(ValueError):
+        recorder.record("Д" * 9, "battery", (50.0,), timestamp=2.0)
+    with pytest.raises(ValueError):
+        recorder.record_many([2.0, 3.0], ["D001", "MAVLINK-VEHICLE-0001"], "battery", [[1.0], [2.0]])
+    recorder.close()
+    assert FlightDataReader(str(tmp_path)).read()["drone_id"].tolist() == ["Д".encode("utf-8") * 8]
+
+
+def test_flight_recorder_rotates_and_seeks_time_ranges(tmp_path):
+    """Тест: пакетная запись делится на сегменты, выборка по времени совпадает с полным перебором."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=100)
+    timestamps = np.arange(1000) * 0.1
+    drone_ids = [f"D{i % 4:03d}" for i in range(1000)]
+    values = np.column_stack([timestamps, -timestamps])
+    recorder.record_many(timestamps[:250], drone_ids[:250], "position", values[:250])
+    recorder.record_many(timestamps[250:], drone_ids[250:], "position", values[250:])
+    recorder.close()
+
+    reader = FlightDataReader(str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 10
+    assert len(reader) == 1000
+    selected = reader.read(25.0, 55.0)
+    expected = (timestamps >= 25.0) & (timestamps < 55.0)
+    assert np.array_equal(selected["timestamp"], timestamps[expected])
+    assert np.array_equal(selected["values"][:, 1], -timestamps[expected])
+    own = reader.read(25.0, 55.0, drone_id="D002", channel="position")
+    assert set(own["drone_id"]) == {b"D002"}
+    assert len(own) == np.count_nonzero(expected & (np.arange(1000) % 4 == 2))
+    assert len(reader.read(200.0, 300.0)) == 0
+
+
+def test_flight_data_reader_is_zero_copy(tmp_path):
+    """Тест: выборка внутри сегмента — представление отображенного файла, а не копия."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=1000)
+    recorder.record_many(np.arange(500, dtype=float), "D001", "telemetry", np.ones((500, 3)))
+    recorder.flush()
+
+    reader = FlightDataReader(str(tmp_path))
+    window = reader.read(100.0, 200.0)
+    assert len(window) == 100
+    assert np.shares_memory(window, reader.segments()[0])
+
+    recorder.record("D001", "telemetry", (2.0,), timestamp=600.0)
+    reader.refresh()
+    assert len(reader) == 501
+    recorder.close()
+
+
+def test_drone_controller_records_commands(tmp_path):
+    """Тест: DroneController пишет команды в самописец с временем своих часов."""
+    from drone_controller import DroneController, MoveForward, Takeoff, Turn
+
+    clock = VirtualClock()
+    recorder = FlightRecorder(str(tmp_path), segment_records=16)
+    drone = DroneController(clock=clock, recorder=recorder, drone_id="D007")
+
+    async def mission():
+        await Takeoff(drone).execute()
+        await MoveForward(drone, 10).execute()
+        await Turn(drone, 90).execute()
+
+    asyncio.run(mission())
+    records = FlightDataReader(str(tmp_path)).read(drone_id="D007")
+    assert records["timestamp"].tolist() == [0.0, 1.0, 2.0]
+    assert records["values"][1:, 0].tolist() == [10.0, 90.0]
+
+
+@pytest.fixture
+def recorded_flight(tmp_path):
+    """Фикстура: десять минут записи с датчиком препятствий на 10 Гц и миссиями патрулирования."""
+    recorder = FlightRecorder(str(tmp_path), segment_records=1024)
+    rng = np.random.default_rng(7)
+    for minute in range(10):
+        start = minute * 60.0
+        recorder.record("D001", "takeoff", (), timestamp=start)
+        recorder.record("D001", "move_forward", (10.0 + minute,), timestamp=start)
+        recorder.record("D001", "turn", (90.0,), timestamp=start)
+        timestamps = start + 0.1 + np.arange(599) * 0.1
+        recorder.record_many(timestamps, "D001", "obstacle", rng.uniform(0.0, 50.0, (599, 1)))
+    recorder.close()
+    return FlightDataReader(str(tmp_path))
+
+
+def _replay(reader, threshold=10):
+    from client.sensor_manager import SensorManager
+    from mission_manager import PatrolMissionStrategy
+    from tests.light_client import DroneController, DroneModel, ObstacleSensor
+
+    class QuietView:
+        def display_status(self, model):
+            pass
+
+        def alert(self, message):
+            pass
+
+    class TunedObstacleSensor(ObstacleSensor):
+        def update(self, data):
+            if data["distance"] < threshold:
+                model = self.controller.model
+                self.controller.change_position((model.position[0] + 10, model.position[1]))
+
+    controller = DroneController(DroneModel(), QuietView())
+    sensors = SensorManager()
+    sensors.add_observer(ObstacleSensor(controller) if threshold == 10 else TunedObstacleSensor(controller))
+    replay = MissionReplay(reader, subject=sensors, strategies={"D001": PatrolMissionStrategy(2)},
+                           probes={"position": lambda: controller.model.position},
+                           decoders={"obstacle": DEFAULT_DECODERS["obstacle"]})
+    return asyncio.run(replay.run())
+
+
+def test_mission_replay_is_deterministic(recorded_flight, tmp_path, capsys):
+    """Тест: два прогона одной записи дают одинаковые трассы, в том числе после сохранения в JSON."""
+    first = _replay(recorded_flight)
+    second = _replay(recorded_flight)
+    capsys.readouterr()
+
+    assert first.events == len(recorded_flight) == 6020
+    commands = [event for event in first.trace if event[1] == "command"]
+    # Патрулирование повторяет каждую миссию из трех команд дважды
+    assert len(commands) == 60
+    assert commands[:3] == [[0.0, "command", "D001", ["takeoff", []]],
+                            [0.0, "command", "D001", ["move_forward", [10.0]]],
+                            [0.0, "command", "D001", ["turn", [90.0]]]]
+    assert any(event[1] == "state" and event[2] == "position" and event[3][0] > 0 for event in first.trace)
+    assert diff_traces(first.trace, second.trace) == []
+
+    first.save(str(tmp_path / "baseline.json"))
+    assert diff_traces(ReplayResult.load(str(tmp_path / "baseline.json")).trace, second.trace) == []
+    assert first.duration == pytest.approx(599.9)
+    assert first.speedup > 100
+
+
+def test_mission_replay_detects_control_regression(recorded_flight, capsys):
+    """Тест: изменение порога реакции на препятствие видно в расхождении трасс."""
+    baseline = _replay(recorded_flight)
+    changed = _replay(recorded_flight, threshold=12)
+    capsys.readouterr()
+
+    differences = diff_traces(baseline.trace, changed.trace, limit=5)
+    assert len(differences) == 5
+    index, expected, actual = differences[0]
+    assert expected != actual and index > 0
+
+
+def test_metrics_render_prometheus_text():
+    """Тест: счетчики, измерители и гистограммы выводятся в текстовом формате Prometheus."""
+    registry = MetricsRegistry()
+    requests_total = registry.counter("requests", "Запросы", ("route",))
+    queue_size = registry.gauge("queue_size", "Размер очереди")
+    latency = registry.histogram("latency_seconds", "Задержка", buckets=(0.1, 1.0))
+    requests_total.labels('/drones"').inc(2)
+    queue_size.set(3)
+    queue_size.dec()
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert '# TYPE requests counter\nrequests_total{route="/drones\\""} 2.0' in text
+    assert "queue_size 2.0" in text
+    assert 'latency_seconds_bucket{le="0.1"} 1\nlatency_seconds_bucket{le="1.0"} 2\n' \
+           'latency_seconds_bucket{le="+Inf"} 3\nlatency_seconds_sum 5.55\nlatency_seconds_count 3' in text
+    with pytest.raises(ValueError):
+        registry.gauge("requests", "Запросы", ("route",))
+
+
+def test_metrics_time_commands_and_database(tmp_path):
+    """Тест: команды ICommand и методы DatabaseAccess замеряются без изменения их кода."""
+    import sqlite3
+
+    from database_access import DB_SECONDS, DatabaseAccess
+    from drone_controller import COMMAND_SECONDS, DroneController, MoveForward, Takeoff
+
+    database = str(tmp_path / "drones.db")
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE drones (drone_id TEXT)")
+    before = sum(COMMAND_SECONDS.labels("Takeoff").counts)
+    drone = DroneController(clock=VirtualClock())
+
+    async def mission():
+        await Takeoff(drone).execute()
+        await MoveForward(drone, 5).execute()
+        return await DatabaseAccess(database).get_drones()
+
+    assert asyncio.run(mission()) == []
+    assert sum(COMMAND_SECONDS.labels("Takeoff").counts) == before + 1
+    assert sum(DB_SECONDS.labels("get_drones").counts) >= 1
+    assert 'drone_command_duration_seconds_count{command="MoveForward"}' in metrics.REGISTRY.render()
+
+
+def test_metrics_disabled_overhead_is_negligible():
+    """Тест: выключенный реестр не измеряет, а обертка добавляет доли микросекунды."""
+    registry = MetricsRegistry(enabled=False)
+    histogram = registry.histogram("calls_seconds", "Вызовы")
+
+    def work():
+        return 1
+
+    wrapped = timed(histogram)(work)
+    assert wrapped() == 1 and sum(histogram.labels().counts) == 0
+    calls = 100000
+    started = time.perf_counter()
+    for _ in range(calls):
+        work()
+    plain = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(calls):
+        wrapped()
+    overhead = (time.perf_counter() - started - plain) / calls
+    assert overhead < 1e-6
+    registry.enabled = True
+    wrapped()
+    assert sum(histogram.labels().counts) == 1
+
+
+def test_sampling_profiler_splits_stacks_by_subsystem(walled_map, tmp_path):
+    """Тест: окно профилирования сохраняет стеки планировщика маршрутов в профиль подсистемы mission."""
+    window = profiler.start_window(0.3, output_dir=str(tmp_path), interval=0.001, tag="test")
+    assert window is not None
+    assert profiler.start_window(0.3, output_dir=str(tmp_path)) is None
+    deadline = time.monotonic() + 0.4
+    while window.running and time.monotonic() < deadline:
+        PathPlanner(walled_map).plan((0, 10), (19, 10))
+    outputs = window.stop()
+
+    mission = [path for path in outputs if os.path.basename(path).startswith("test-mission-")]
+    assert len(mission) == 1
+    with open(mission[0], encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("plan (path_planner.py:" in line for line in lines)
+    assert profiler.classify(["/srv/server/drone_routes.py", "/srv/client/sensor_manager.py"]) == "telemetry"
+
+
+def test_sampling_profiler_speedscope_export(tmp_path):
+    """Тест: профиль speedscope ссылается на общие кадры и хранит веса выборок в секундах."""
+    sampler = profiler.SamplingProfiler(str(tmp_path), interval=0.01, fmt="speedscope")
+    # Поток профилировщика не попадает в выборку, поэтому стек этого теста снимается из другого потока
+    for _ in range(3):
+        thread = threading.Thread(target=sampler.sample)
+        thread.start()
+        thread.join()
+    (path,) = [path for path in sampler.save() if "other" in os.path.basename(path)]
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    profile = document["profiles"][0]
+    assert profile["type"] == "sampled" and profile["unit"] == "seconds"
+    assert sum(profile["weights"]) == pytest.approx(0.03)
+    frames = document["shared"]["frames"]
+    assert all(0 <= index < len(frames) for sample in profile["samples"] for index in sample)
+    assert any(frame["name"] == "test_sampling_profiler_speedscope_export" for frame in frames)
+
+
+def test_simulator_backend_runs_workload_in_virtual_time():
+    """Тест: симулятор выполняет общую нагрузку с кинематикой и разрядом батареи за виртуальное время."""
+    clock = VirtualClock()
+    backend = backends.get_backend("Simulator", clock=clock, speed=10, climb_rate=2, yaw_rate=90)
+
+    async def flight():
+        await backend.connect()
+        await backend.send_command("takeoff", altitude=10)
+        await backend.send_command("move_forward", distance=20)
+        await backend.send_command("turn", degree=90)
+        await backend.send_command("move_forward", distance=10)
+        return await backend.get_telemetry()
+
+    telemetry = asyncio.run(flight())
+    # 10 м / 2 м/с + 20 м / 10 м/с + 90° / 90°/с + 10 м / 10 м/с
+    assert clock.now() == pytest.approx(9.0)
+    assert (telemetry["x"], telemetry["y"], telemetry["altitude"]) == pytest.approx((20, 10, 10))
+    assert telemetry["heading"] == 90 and telemetry["in_air"]
+    assert telemetry["battery"] == pytest.approx(100 * (1 - 150 * 9 / 3600 / 80))
+    assert asyncio.run(backend.get_image()).startswith(b"P6 64 48 255\n")
+
+    asyncio.run(backends.run_workload(backend, [("return_to_base", {}), ("land", {})]))
+    assert not backend.in_air and backend.altitude == 0
+
+
+def test_backend_rejects_invalid_commands():
+    """Тест: неизвестные команды и параметры, команды без подключения и на земле отклоняются."""
+    backend = backends.get_backend("simulator", clock=VirtualClock())
+    with pytest.raises(ValueError):
+        asyncio.run(backend.send_command("flip"))
+    with pytest.raises(ValueError):
+        asyncio.run(backend.send_command("turn", angle=90))
+    with pytest.raises(backends.BackendError):
+        asyncio.run(backend.send_command("takeoff"))
+    asyncio.run(backend.connect())
+    with pytest.raises(backends.BackendError):
+        asyncio.run(backend.send_command("move_forward", distance=5))
+
+
+@pytest.mark.parametrize("name", ["simulator", "airsim", "mavlink"])
+def test_backend_methods_require_connection(name):
+    """Тест: до connect все методы бэкенда отклоняются BackendError, а не AttributeError."""
+    backend = backends.get_backend(name)
+    calls = [backend.send_command("land"), backend.get_telemetry(), backend.get_image()]
+    if name == "mavlink":
+        calls.append(backend.upload_mission([(55.75, 37.62, 20)]))
+    for call in calls:
+        with pytest.raises(backends.BackendError):
+            asyncio.run(call)
+
+
+def test_backend_registry_and_entry_points(monkeypatch):
+    """Тест: бэкенды выбираются по производителю, сторонние регистрируются через точки входа."""
+    import drone_manager
+
+    assert isinstance(drone_manager.DroneAPIFactory.get_drone_api("DJI", "udpin:0.0.0.0:14550"),
+                      backends.MavLinkBackend)
+    assert isinstance(drone_manager.DroneAPIFactory.get_drone_api("AirSim", None), backends.AirSimBackend)
+    # Неизвестный производитель больше не получает AirSim по умолчанию
+    assert drone_manager.DroneAPIFactory.get_drone_api("Parrot", None) is None
+    assert not drone_manager.check_manufacturer_api("Parrot")
+
+    class PluginBackend(backends.SimulatorBackend):
+        pass
+
+    class BrokenEntryPoint:
+        name, value = "broken", "missing_module:Backend"
+
+        def load(self):
+            raise ImportError("missing_module")
+
+    class PluginEntryPoint:
+        name, value = "Plugin", "plugin:PluginBackend"
+
+        def load(self):
+            return PluginBackend
+
+    monkeypatch.setattr(backends, "BACKENDS", dict(backends.BACKENDS))
+    monkeypatch.setattr(backends, "_entry_points_loaded", False)
+    monkeypatch.setattr(backends.metadata, "entry_points",
+                        lambda group: [BrokenEntryPoint(), PluginEntryPoint()] if group == backends.ENTRY_POINT_GROUP else [])
+    assert isinstance(backends.get_backend("plugin"), PluginBackend)
+    assert backends.available_backends() == ["airsim", "mavlink", "plugin", "simulator"]
+    with pytest.raises(ValueError):
+        backends.get_backend("broken")
+
+
+def test_backend_commands_are_timed_per_backend():
+    """Тест: время команд попадает в гистограмму с метками бэкенда и команды."""
+    metrics.REGISTRY.clear()
+    backend = backends.get_backend("simulator", clock=VirtualClock())
+    asyncio.run(backend.connect())
+    asyncio.run(backends.run_workload(backend))
+    text = metrics.REGISTRY.render()
+    assert 'drone_backend_command_duration_seconds_count{backend="simulator",command="move_forward"} 2' in text
+    assert 'drone_backend_command_duration_seconds_count{backend="simulator",command="land"} 1' in text
+
+
+def _run_channel(scenario, **vehicle_options):
+    """Выполняет scenario(channel, vehicle, clock) на канале к локальной замене аппарата в виртуальном времени."""
+    clock = VirtualClock()
+    vehicle = LocalMavlinkVehicle(clock, latency=0.05, **vehicle_options)
+    channel = MavlinkCommandChannel(vehicle, clock, ack_timeout=0.5, retries=3)
+
+    async def run():
+        channel.start()
+        try:
+            return await scenario(channel, vehicle, clock)
+        finally:
+            await channel.close()
+            vehicle.close()
+
+    return asyncio.run(run())
+
+
+def test_mavlink_commands_in_flight_are_acknowledged_in_one_round_trip():
+    """Тест: разные команды ожидают COMMAND_ACK одновременно, а не по очереди."""
+    async def scenario(channel, vehicle, clock):
+        acks = await asyncio.gather(*(channel.command_long(command) for command in (
+            mavlink_channel.MAV_CMD_NAV_TAKEOFF, mavlink_channel.MAV_CMD_CONDITION_YAW,
+            mavlink_channel.MAV_CMD_IMAGE_START_CAPTURE)))
+        return acks, clock.now(), vehicle.received
+
+    acks, elapsed, received = _run_channel(scenario)
+    assert [ack.result for ack in acks] == [mavlink_channel.MAV_RESULT_ACCEPTED] * 3
+    assert elapsed == pytest.approx(0.1)
+    assert len(received) == 3
+
+
+def test_mavlink_command_is_retransmitted_until_acknowledged():
+    """Тест: потерянные команды и подтверждения повторяются с увеличением confirmation."""
+    metrics.REGISTRY.clear()
+
+    async def scenario(channel, vehicle, clock):
+        for _ in range(10):
+            await channel.command_long(mavlink_channel.MAV_CMD_NAV_LAND)
+        return vehicle.received, vehicle.lost
+
+    received, lost = _run_channel(scenario, loss=0.15, seed=1)
+    assert lost > 0
+    assert max(message.confirmation for message in received) > 0
+    assert 'drone_mavlink_retransmits_total{message="COMMAND_LONG"}' in metrics.REGISTRY.render()
+
+
+def test_mavlink_command_errors():
+    """Тест: отказ аппарата и отсутствие подтверждения после всех повторов завершаются ошибкой."""
+    async def rejected(channel, vehicle, clock):
+        await channel.command_long(mavlink_channel.MAV_CMD_NAV_TAKEOFF)
+
+    with pytest.raises(MavlinkCommandError) as error:
+        _run_channel(rejected, command_results={mavlink_channel.MAV_CMD_NAV_TAKEOFF: 4})
+    assert error.value.result == 4
+
+    async def unanswered(channel, vehicle, clock):
+        try:
+            await channel.command_long(mavlink_channel.MAV_CMD_NAV_LAND)
+        except MavlinkCommandError as e:
+            return e.result, clock.now()
+
+    assert _run_channel(unanswered, loss=1.0) == (None, pytest.approx(4 * 0.5))
+
+
+def test_mavlink_in_progress_extends_wait_without_retransmit():
+    """Тест: после IN_PROGRESS долгая команда ждет окончательный ответ без повторов."""
+    async def scenario(channel, vehicle, clock):
+        await channel.command_long(mavlink_channel.MAV_CMD_NAV_TAKEOFF)
+        return clock.now(), len(vehicle.received)
+
+    elapsed, sent = _run_channel(scenario, command_durations={mavlink_channel.MAV_CMD_NAV_TAKEOFF: 2.0})
+    assert elapsed == pytest.approx(2.1)
+    assert sent == 1
+
+
+def test_mavlink_mission_upload_is_pipelined():
+    """Тест: окно отправки загружает миссию за один обмен вместо обмена на каждую точку."""
+    waypoints = [mission_item(55.75 + i * 1e-4, 37.62, 20) for i in range(50)]
+
+    def upload(window, **vehicle_options):
+        async def scenario(channel, vehicle, clock):
+            await channel.upload_mission(waypoints, window=window)
+            return clock.now(), vehicle.mission
+
+        return _run_channel(scenario, **vehicle_options)
+
+    sequential, mission = upload(0)
+    assert sequential == pytest.approx(51 * 0.1)
+    pipelined, mission = upload(64)
+    assert pipelined == pytest.approx(0.1)
+    assert [item.seq for item in mission] == list(range(50))
+    assert mission[10].x == 557510000 and mission[10].z == 20.0
+
+    lossy, mission = upload(16, loss=0.2, seed=3)
+    assert [item.seq for item in mission] == list(range(50))
+
+
+def test_mavlink_backend_over_local_vehicle():
+    """Тест: бэкенд MAVLink выполняет общую нагрузку и загружает миссию через канал без pymavlink."""
+    clock = VirtualClock()
+    vehicle = LocalMavlinkVehicle(clock, latency=0.05)
+    backend = backends.get_backend("mavlink", transport=vehicle, clock=clock)
+
+    async def flight():
+        await backend.connect()
+        await backends.run_workload(backend)
+        await backend.upload_mission([(55.75, 37.62, 20), (55.76, 37.63, 30)])
+        await backend.close()
+
+    asyncio.run(flight())
+    types = [message.get_type() for message in vehicle.received]
+    assert types.count("COMMAND_LONG") == 4
+    assert types.count("SET_POSITION_TARGET_LOCAL_NED") == 3
+    assert len(vehicle.mission) == 2
+
+
+def test_mavlink_backend_image_waits_do_not_leak():
+    """Тест: get_image и wait_message не оставляют ожиданий после таймаута и отказа команды съемки."""
+    clock = VirtualClock()
+    vehicle = LocalMavlinkVehicle(clock, latency=0.05)
+    backend = backends.get_backend("mavlink", transport=vehicle, clock=clock)
+
+    async def flight():
+        await backend.connect()
+        try:
+            assert await backend.channel.wait_message("CAMERA_IMAGE_CAPTURED", 1.0) is None
+            assert await backend.get_image(timeout=1.0) is None
+            vehicle.command_results[mavlink_channel.MAV_CMD_IMAGE_START_CAPTURE] = 4
+            with pytest.raises(MavlinkCommandError):
+                await backend.get_image(timeout=60.0)
+            await asyncio.sleep(0)
+            return dict(backend.channel._waiters), clock.now()
+        finally:
+            await backend.close()
+
+    waiters, elapsed = asyncio.run(flight())
+    assert waiters == {}
+    assert elapsed < 60
+
+
+class _IdleConnection:
+    """Соединение pymavlink без входящих сообщений."""
+    target_system = 1
+    target_component = 1
+
+    def recv_match(self, blocking=True, timeout=None):
+        time.sleep(timeout or 0)
+
+    def close(self):
+        pass
+
+
+def test_mavlink_mission_window_is_opt_in_on_pymavlink_links():
+    """Тест: по соединению pymavlink миссия загружается по запросам, пока окно не задано для аппарата."""
+    async def window(transport, **options):
+        backend = backends.get_backend("mavlink", transport=transport, **options)
+        await backend.connect()
+        try:
+            return backend.channel.mission_window
+        finally:
+            await backend.close()
+
+    assert asyncio.run(window(mavlink_channel.PymavlinkTransport(_IdleConnection()))) == 0
+    assert asyncio.run(window(mavlink_channel.PymavlinkTransport(_IdleConnection()), mission_window=16)) == 16
+    assert asyncio.run(window(LocalMavlinkVehicle(VirtualClock()))) == 32
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests import import_benchmark
+
+
+@pytest.mark.parametrize("entry", ["drone.drone_manager", "drone.mission_manager", "drone.drone_controller",
+                                   "YetOne.api_interface"])
+def test_entry_point_does_not_load_drone_backends(entry):
+    """Тест: точки входа не загружают бэкенды AirSim, DJI, симулятор и numpy (HEAVY_MODULES) при импорте."""
+    result = import_benchmark.measure(entry, repeats=1)
+    assert result["error"] is None
+    assert result["heavy"] == []
+
+
+def test_yetone_drone_manager_runs_as_script(tmp_path):
+    """Тест: python YetOne/drone_manager.py находит бэкенды drone без настройки PYTHONPATH."""
+    script = os.path.join(import_benchmark.ROOT, "YetOne", "drone_manager.py")
+    environment = {name: value for name, value in os.environ.items() if name != "PYTHONPATH"}
+    result = subprocess.run([sys.executable, script], cwd=tmp_path, env=environment,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "is approved for flight and mission" in result.stderr
+
+
+def test_mission_manager_is_created_on_first_use(monkeypatch):
+    """Тест: менеджер миссий и его зависимости загружаются при первом обращении и создаются один раз."""
+    import drone_manager
+
+    monkeypatch.setattr(drone_manager, "_mission_manager", None)
+    manager = drone_manager.get_mission_manager()
+    assert "mission_manager" in sys.modules
+    assert drone_manager.get_mission_manager() is manager
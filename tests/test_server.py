@@ -0,0 +1,905 @@
+import asyncio
+import io
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+from werkzeug.serving import make_server
+
+import drone_routes
+import rate_limit
+from drone_gateway import AsyncDroneGateway, DroneGateway, DroneGatewayError
+from drone_registry import ShardedDroneRegistry, SQLiteDroneRegistry
+from helpers import VersionedCache, validation_stats
+from idempotency import IdempotencyCache, IdempotencyConflict
+from ingest import iter_json_array
+from main import app
+from rate_limit import (AdmissionController, MemoryBucketStore, RateLimitExceeded,
+                        SharedMemoryBucketStore, TokenBucketLimiter)
+from schema import Field, SchemaError, compile_schema, validate_drone
+from token_cache import token_cache
+from tests import import_benchmark, light_server, load_generator
+from tests.load_generator import LatencyHistogram
+
+
+@pytest.fixture
+def drone_server():
+    """Фикстура: локальный дрон-заглушка tests/light_server.py в отдельном потоке."""
+    server = make_server("127.0.0.1", 0, light_server.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def silent_drone():
+    """Фикстура: дрон, который принимает соединение, но никогда не отвечает."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(8)
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}"
+    listener.close()
+
+
+@pytest.fixture
+def client():
+    """Фикстура: тестовый клиент сервера и заголовок авторизации."""
+    drone_routes.drones.clear()
+    with app.app_context():
+        token = create_access_token(identity="operator")
+    with app.test_client() as test_client:
+        yield test_client, {"Authorization": f"Bearer {token}"}
+    drone_routes.drones.clear()
+
+
+def test_gateway_reuses_connections(drone_server):
+    """Тест: команды одному дрону идут через одну keep-alive сессию."""
+    gateway = DroneGateway()
+    for altitude in (10, 20, 30):
+        response = gateway.post(drone_server + "/takeoff", json={"altitude": altitude})
+        assert response.status_code == 200
+    assert len(gateway._sessions) == 1
+    gateway.close()
+
+
+def test_gateway_read_timeout(silent_drone):
+    """Тест: зависший дрон не блокирует поток дольше таймаута чтения."""
+    gateway = DroneGateway(connect_timeout=0.5, read_timeout=0.2)
+    with pytest.raises(DroneGatewayError):
+        gateway.post(silent_drone + "/takeoff", json={"altitude": 10})
+
+
+def test_gateway_connection_refused():
+    """Тест: недоступный дрон дает DroneGatewayError после ограниченных повторов."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    gateway = DroneGateway(retries=1, backoff_factor=0)
+    with pytest.raises(DroneGatewayError):
+        gateway.post(f"http://127.0.0.1:{port}/takeoff", json={})
+
+
+def test_async_gateway_concurrent_commands(drone_server):
+    """Тест: асинхронный шлюз выполняет команды параллельно."""
+    gateway = AsyncDroneGateway(max_workers=4)
+
+    async def launch():
+        return await asyncio.gather(*(gateway.post(drone_server + "/takeoff", json={"altitude": a})
+                                      for a in range(8)))
+
+    responses = asyncio.run(launch())
+    assert all(response.status_code == 200 for response in responses)
+    gateway.close()
+
+
+def test_takeoff_route_proxies_to_drone(client, drone_server):
+    """Тест: маршрут взлета пересылает команду дрону через шлюз."""
+    test_client, headers = client
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    response = test_client.post("/drones/DJI001/takeoff", json={"altitude": 15}, headers=headers)
+    assert response.status_code == 200
+    assert "15" in response.get_json()["message"]
+
+
+def test_takeoff_route_reports_unresponsive_drone(client, silent_drone, monkeypatch):
+    """Тест: зависший дрон дает 504 вместо блокировки обработчика."""
+    test_client, headers = client
+    monkeypatch.setattr(drone_routes, "gateway", DroneGateway(read_timeout=0.2))
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": silent_drone})
+    response = test_client.post("/drones/DJI001/takeoff", json={"altitude": 15}, headers=headers)
+    assert response.status_code == 504
+
+
+def test_broadcast_command_fans_out(client, drone_server, silent_drone, monkeypatch):
+    """Тест: групповая команда рассылается выбранным дронам и возвращает NDJSON."""
+    test_client, headers = client
+    monkeypatch.setattr(drone_routes, "gateway", DroneGateway(read_timeout=0.3))
+    for i in range(6):
+        test_client.post("/drones", json={"drone_id": f"DJI{i:03d}", "manufacturer": "DJI",
+                                          "control_url": drone_server})
+    test_client.post("/drones", json={"drone_id": "DJI999", "manufacturer": "DJI", "control_url": silent_drone})
+    test_client.post("/drones", json={"drone_id": "AIRSIM001", "manufacturer": "AirSim",
+                                      "control_url": drone_server})
+
+    response = test_client.post("/drones/commands", headers=headers, json={
+        "command": "takeoff", "params": {"altitude": 20},
+        "selector": {"manufacturer": "DJI"}, "max_concurrency": 8})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    statuses = {line["drone_id"]: line["status"] for line in lines}
+    assert statuses.pop("DJI999") == 504
+    assert statuses == {f"DJI{i:03d}": 200 for i in range(6)}
+    # Зависший дрон не задерживает остальные: его результат приходит последним
+    assert lines[-1]["drone_id"] == "DJI999"
+
+
+def test_broadcast_command_rejects_unknown_command(client):
+    """Тест: неизвестная групповая команда отклоняется."""
+    test_client, headers = client
+    response = test_client.post("/drones/commands", headers=headers, json={"command": "self_destruct"})
+    assert response.status_code == 400
+
+
+INVALID_BROADCASTS = [
+    {"command": "takeoff", "selector": {"drone_ids": [["DJI001"]]}},
+    {"command": "takeoff", "selector": {"drone_ids": 5}},
+    {"command": "takeoff", "selector": {"drone_ids": "DJI001"}},
+    {"command": "takeoff", "params": {"altitude": "high"}},
+    {"command": "takeoff", "params": {"altitude": -10}},
+]
+
+
+@pytest.mark.parametrize("body", INVALID_BROADCASTS, ids=["nested-ids", "int-ids", "string-ids",
+                                                         "altitude-type", "negative-altitude"])
+def test_broadcast_command_validates_selector_and_params(client, drone_server, body):
+    """Тест: неверные selector.drone_ids и params команды дают 400, команда никому не отправляется."""
+    test_client, headers = client
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    response = test_client.post("/drones/commands", headers=headers, json=body)
+    assert response.status_code == 400
+    assert response.get_json()["details"]
+
+
+@pytest.fixture(params=["sharded", "sqlite"])
+def registry(request, tmp_path):
+    """Фикстура: обе реализации реестра дронов."""
+    if request.param == "sqlite":
+        return SQLiteDroneRegistry(str(tmp_path / "drones.db"))
+    return ShardedDroneRegistry(shards=4)
+
+
+def test_registry_mapping_and_version(registry):
+    """Тест: реестр работает как словарь и увеличивает версию при изменениях."""
+    version = registry.version
+    registry["DJI001"] = {"drone_id": "DJI001", "manufacturer": "DJI"}
+    registry.update_many([(f"AIRSIM{i:03d}", {"drone_id": f"AIRSIM{i:03d}"}) for i in range(10)])
+    assert registry.version == version + 2
+    assert "DJI001" in registry and len(registry) == 11
+    assert registry.get("missing") is None
+    del registry["DJI001"]
+    assert "DJI001" not in registry
+    assert sorted(registry.snapshot()) == [f"AIRSIM{i:03d}" for i in range(10)]
+
+
+def test_registry_concurrent_writers(registry):
+    """Тест: параллельные записи из нескольких потоков не теряются."""
+    def register(worker):
+        for i in range(50):
+            registry[f"W{worker}-{i}"] = {"worker": worker}
+
+    threads = [threading.Thread(target=register, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(registry) == 400
+
+
+def test_sqlite_registry_shared_between_instances(tmp_path):
+    """Тест: изменения одного воркера видны другому после смены версии."""
+    path = str(tmp_path / "drones.db")
+    worker_a, worker_b = SQLiteDroneRegistry(path), SQLiteDroneRegistry(path)
+    worker_a["DJI001"] = {"status": "operational"}
+    assert worker_b["DJI001"] == {"status": "operational"}
+    worker_a["DJI001"] = {"status": "maintenance"}
+    assert worker_b["DJI001"] == {"status": "maintenance"}
+    assert worker_b.version == worker_a.version
+
+
+@pytest.fixture
+def fleet_client(client):
+    """Фикстура: сервер с зарегистрированным флотом из 25 дронов."""
+    test_client, headers = client
+    for i in range(25):
+        manufacturer = "DJI" if i % 2 else "AirSim"
+        test_client.post("/drones", json={"drone_id": f"D{i:03d}", "manufacturer": manufacturer,
+                                          "status": "operational", "control_url": f"http://drone{i}"})
+    return test_client, headers
+
+
+def test_get_drones_pagination_filter_and_projection(fleet_client):
+    """Тест: курсорная выдача, фильтр по производителю и проекция полей."""
+    test_client, headers = fleet_client
+    seen = []
+    cursor = None
+    while True:
+        query = {"limit": 5, "manufacturer": "DJI", "fields": "manufacturer"}
+        if cursor:
+            query["cursor"] = cursor
+        response = test_client.get("/drones", query_string=query, headers=headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert all(info == {"manufacturer": "DJI"} for info in page.values())
+        seen.extend(page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == [f"D{i:03d}" for i in range(25) if i % 2]
+
+    response = test_client.get("/drones", query_string={"limit": 0}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_get_drones_etag_until_mutation(fleet_client):
+    """Тест: повторный опрос получает 304, пока реестр не изменится."""
+    test_client, headers = fleet_client
+    first = test_client.get("/drones", headers=headers)
+    assert len(first.get_json()) == 25
+    etag = first.headers["ETag"]
+
+    cached = test_client.get("/drones", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    test_client.post("/drones", json={"drone_id": "D999", "control_url": "http://drone999"})
+    changed = test_client.get("/drones", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "D999" in changed.get_json()
+
+
+def test_get_drones_etag_changes_with_registry_epoch(client, monkeypatch):
+    """Тест: после перезапуска (новый реестр с той же версией) старый ETag не дает 304."""
+    test_client, headers = client
+    etag = test_client.get("/drones", headers=headers).headers["ETag"]
+    restarted = ShardedDroneRegistry()
+    for _ in range(drone_routes.drones.version):
+        restarted["D000"] = {"control_url": "http://drone0"}
+    assert restarted.version == drone_routes.drones.version
+    monkeypatch.setattr(drone_routes, "drones", restarted)
+    response = test_client.get("/drones", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert "D000" in response.get_json()
+
+
+def test_sqlite_registry_epoch_is_shared_per_file(tmp_path):
+    """Тест: воркеры одного файла видят одну эпоху, новый файл получает новую."""
+    path = str(tmp_path / "drones.db")
+    assert SQLiteDroneRegistry(path).epoch == SQLiteDroneRegistry(path).epoch
+    assert SQLiteDroneRegistry(str(tmp_path / "other.db")).epoch != SQLiteDroneRegistry(path).epoch
+
+
+def test_versioned_cache_ignores_stale_puts():
+    """Тест: значение, вычисленное по старой версии, не вытесняет значения новой."""
+    cache = VersionedCache()
+    cache.put(5, "listing", "new", epoch="a")
+    cache.put(4, "listing", "stale", epoch="a")
+    assert cache.get(5, "listing", epoch="a") == "new"
+    assert cache.get(4, "listing", epoch="a") is None
+    cache.put(1, "listing", "restarted", epoch="b")
+    assert cache.get(1, "listing", epoch="b") == "restarted"
+
+
+def test_bulk_registration_ndjson_reports_line_errors(client):
+    """Тест: NDJSON-пакет добавляется целиком, ошибочные строки только сообщаются."""
+    test_client, headers = client
+    lines = [json.dumps({"drone_id": f"D{i:05d}", "manufacturer": "DJI", "max_speed": 20}) for i in range(500)]
+    lines[10] = '{"drone_id": 7}'
+    lines[20] = "{broken"
+    lines[30] = json.dumps({"drone_id": "D-bad", "max_speed": True})
+    response = test_client.post("/drones/bulk", data="\n".join(lines), headers=headers,
+                                content_type="application/x-ndjson")
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result["inserted"] == 497
+    assert [error["line"] for error in result["errors"]] == [11, 21, 31]
+    assert len(drone_routes.drones) == 497
+
+
+def test_bulk_registration_json_array(client):
+    """Тест: JSON-массив разбирается поэлементно."""
+    test_client, headers = client
+    records = [{"drone_id": f"A{i}", "sensors": ["GPS"]} for i in range(50)] + [["not", "an", "object"]]
+    response = test_client.post("/drones/bulk", json=records, headers=headers)
+    assert response.get_json() == {"inserted": 50, "errors": [{"line": 51, "error": "ожидается JSON-объект"}]}
+
+    response = test_client.post("/drones/bulk", data="a,b", headers=headers, content_type="text/csv")
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("body, line", [
+    ('[{"drone_id": "A1"},,{"drone_id": "A2"}]', 2),
+    ('[{"drone_id": "A1"},]', 2),
+    ('[{"drone_id": "A1"} {"drone_id": "A2"}]', 2),
+    ('[,{"drone_id": "A1"}]', 1),
+    ('[{"drone_id": "A1"}', 2),
+    ('[{"drone_id": "A1"}] {}', 2),
+    ('{"drone_id": "A1"}', 1),
+])
+def test_bulk_registration_rejects_malformed_json_array(client, body, line):
+    """Тест: ошибка разметки JSON-массива отклоняет пакет целиком с кодом 400."""
+    test_client, headers = client
+    response = test_client.post("/drones/bulk", data=body, headers=headers, content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json()["line"] == line
+    assert len(drone_routes.drones) == 0
+
+
+def test_iter_json_array_splits_elements_across_chunks():
+    """Тест: разбор не зависит от того, где границы блоков режут массив."""
+    body = json.dumps([{"drone_id": f"A{i}", "max_speed": i * 1.5} for i in range(20)]).encode()
+    for chunk_size in (1, 3, 7, 64):
+        records = list(iter_json_array(io.BytesIO(body), chunk_size=chunk_size))
+        assert [record["max_speed"] for _, record in records] == [i * 1.5 for i in range(20)]
+    assert list(iter_json_array(io.BytesIO(b" [ ] "))) == []
+
+
+def test_compiled_schema_rejects_wrong_types():
+    """Тест: скомпилированная схема проверяет обязательность, типы и диапазоны."""
+    validate = compile_schema({"altitude": Field((int, float), required=True, min_value=0, max_value=6000),
+                               "mode": Field(str, choices=["auto", "gps"])}, allow_extra=False)
+    assert validate({"altitude": 100, "mode": "gps"}) == {"altitude": 100, "mode": "gps"}
+    for bad in ({}, {"altitude": "high"}, {"altitude": -1}, {"altitude": 10, "mode": "manual"},
+                {"altitude": 10, "extra": 1}, {"altitude": False}):
+        with pytest.raises(SchemaError):
+            validate(bad)
+
+
+def test_schema_decorator_rejects_invalid_body(client):
+    """Тест: маршрут с декоратором схемы возвращает 400 с перечнем нарушений."""
+    test_client, headers = client
+    response = test_client.post("/drones", json={"drone_id": 42, "max_speed": "fast"})
+    assert response.status_code == 400
+    assert len(response.get_json()["details"]) == 2
+
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": "http://drone"})
+    response = test_client.post("/drones/DJI001/takeoff", json={"altitude": "high"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_schema_validation_is_timed_per_route(client):
+    """Тест: время проверки схемы накапливается по маршрутам."""
+    test_client, _ = client
+    test_client.post("/drones", json={"drone_id": "DJI001", "max_speed": 20})
+    assert validation_stats()["create_drone"] > 0
+
+
+def test_takeoff_without_control_url_is_conflict(client, drone_server):
+    """Тест: команда дрону без адреса управления дает 409, а не ошибку сервера."""
+    test_client, headers = client
+    test_client.post("/drones", json={"drone_id": "DJI001", "manufacturer": "DJI"})
+    response = test_client.post("/drones/DJI001/takeoff", json={"altitude": 15}, headers=headers)
+    assert response.status_code == 409
+
+    test_client.post("/drones", json={"drone_id": "DJI002", "manufacturer": "DJI", "control_url": drone_server})
+    response = test_client.post("/drones/commands", headers=headers, json={
+        "command": "takeoff", "params": {"altitude": 20}, "selector": {"manufacturer": "DJI"}})
+    statuses = {line["drone_id"]: line["status"]
+                for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert statuses == {"DJI001": 409, "DJI002": 200}
+
+
+def test_authenticated_route_caches_tokens_and_honours_revocation(client):
+    """Тест: повторные запросы берут токен из кэша, отозванный токен отклоняется."""
+    test_client, headers = client
+    with app.app_context():
+        token = create_access_token(identity="revoked-operator")
+        jti = decode_token(token)["jti"]
+    revoked_headers = {"Authorization": f"Bearer {token}"}
+    hits = token_cache.hits
+    for _ in range(3):
+        assert test_client.get("/drones", headers=revoked_headers).status_code == 200
+    # decode_token выше уже проверил подпись через CachingJWTManager, поэтому все три запроса — попадания
+    assert token_cache.hits - hits == 3
+
+    token_cache.revoke(jti)
+    assert test_client.get("/drones", headers=revoked_headers).status_code == 401
+    assert test_client.get("/drones", headers={"Authorization": "Bearer forged"}).status_code == 422
+
+
+def test_authenticated_route_runs_callbacks_on_cache_hits(client, monkeypatch):
+    """Тест: токен из кэша по-прежнему проходит token_in_blocklist_loader и доступен в get_jwt."""
+    test_client, headers = client
+    assert test_client.get("/drones", headers=headers).status_code == 200
+    hits = token_cache.hits
+    monkeypatch.setattr(token_cache, "is_revoked", lambda jti: True)
+    response = test_client.get("/drones", headers=headers)
+    assert response.status_code == 401
+    assert token_cache.hits - hits == 1
+
+
+@pytest.fixture(params=["memory", "shared"])
+def bucket_store(request):
+    """Фикстура: хранилища корзин токенов в памяти процесса и в разделяемой памяти."""
+    if request.param == "memory":
+        yield MemoryBucketStore()
+        return
+    store = SharedMemoryBucketStore(slots=64)
+    yield store
+    store.close(unlink=True)
+
+
+def test_token_bucket_limits_burst_and_refills(bucket_store, monkeypatch):
+    """Тест: корзина пропускает всплеск, затем ограничивает и пополняется со временем."""
+    limiter = TokenBucketLimiter(rate=10, burst=5, store=bucket_store)
+    for _ in range(5):
+        limiter.check("user:operator")
+    with pytest.raises(RateLimitExceeded) as error:
+        limiter.check("user:operator")
+    assert 0 < error.value.retry_after <= 0.1
+    limiter.check("user:other")
+
+    now = time.time(), time.monotonic()
+    monkeypatch.setattr(time, "time", lambda: now[0] + 0.5)
+    monkeypatch.setattr(time, "monotonic", lambda: now[1] + 0.5)
+    for _ in range(5):
+        limiter.check("user:operator")
+
+
+def test_admission_controller_sheds_load_but_admits_critical():
+    """Тест: при перегрузке обычные запросы отклоняются, критичные используют резерв."""
+    admission = AdmissionController(max_concurrent=1, reserved=1, max_queue=0, queue_timeout=0.05)
+    with admission.admit():
+        with pytest.raises(RateLimitExceeded):
+            with admission.admit():
+                pass
+        with admission.admit(critical=True):
+            pass
+
+
+def test_admission_controller_async_acquire_waits_in_queue():
+    """Тест: acquire_async ждет места в очереди, не останавливая цикл событий."""
+    admission = AdmissionController(max_concurrent=1, reserved=0, max_queue=1, queue_timeout=1.0)
+
+    async def run():
+        admission.acquire()
+        asyncio.get_running_loop().call_later(0.05, admission.release)
+        await admission.acquire_async()
+        return admission._active
+
+    assert asyncio.run(run()) == 1
+
+
+def test_takeoff_route_returns_429_with_retry_after(client, drone_server, monkeypatch):
+    """Тест: повторные команды одному дрону сверх лимита получают 429 и Retry-After."""
+    test_client, headers = client
+    monkeypatch.setattr(rate_limit, "drone_limiter", TokenBucketLimiter(rate=0.5, burst=2))
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    statuses = [test_client.post("/drones/DJI001/takeoff", json={"altitude": 10}, headers=headers).status_code
+                for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = test_client.post("/drones/DJI001/takeoff", json={"altitude": 10}, headers=headers)
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_per_drone_rejection_does_not_spend_user_tokens(client, drone_server, monkeypatch):
+    """Тест: команда, отклоненная лимитом дрона, не расходует лимит пользователя."""
+    test_client, headers = client
+    monkeypatch.setattr(rate_limit, "user_limiter", TokenBucketLimiter(rate=1e-3, burst=3))
+    monkeypatch.setattr(rate_limit, "drone_limiter", TokenBucketLimiter(rate=1e-3, burst=1))
+    for drone_id in ("DJI001", "DJI002"):
+        test_client.post("/drones", json={"drone_id": drone_id, "control_url": drone_server})
+    statuses = [test_client.post(f"/drones/{drone_id}/takeoff", json={"altitude": 10}, headers=headers).status_code
+                for drone_id in ("DJI001", "DJI001", "DJI001", "DJI002")]
+    assert statuses == [200, 429, 429, 200]
+
+
+def test_shed_request_does_not_spend_rate_limit_tokens(client, drone_server, monkeypatch):
+    """Тест: запрос, отклоненный контролем допуска, возвращает токены пользователя и дрона."""
+    test_client, headers = client
+    monkeypatch.setattr(rate_limit, "user_limiter", TokenBucketLimiter(rate=1e-3, burst=1))
+    monkeypatch.setattr(rate_limit, "drone_limiter", TokenBucketLimiter(rate=1e-3, burst=1))
+    admission = AdmissionController(max_concurrent=1, reserved=0, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(rate_limit, "admission", admission)
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    admission.acquire()
+    try:
+        assert test_client.post("/drones/DJI001/takeoff", json={"altitude": 10}, headers=headers).status_code == 429
+    finally:
+        admission.release()
+    assert test_client.post("/drones/DJI001/takeoff", json={"altitude": 10}, headers=headers).status_code == 200
+
+
+def test_broadcast_holds_admission_until_stream_closes_and_reserves_critical(client, drone_server, monkeypatch):
+    """Тест: потоковая рассылка держит место допуска до конца ответа, посадка использует резерв."""
+    test_client, headers = client
+    admission = AdmissionController(max_concurrent=1, reserved=1, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(rate_limit, "admission", admission)
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    body = {"command": "takeoff", "params": {"altitude": 10}}
+    response = test_client.post("/drones/commands", headers=headers, json=body, buffered=False)
+    assert admission._active == 1
+
+    def concurrent_requests():
+        # Открытый потоковый ответ держит контекст запроса этого потока, поэтому остальные — из другого
+        with app.test_client() as other:
+            statuses.append(other.post("/drones/commands", headers=headers, json=body).status_code)
+            with other.post("/drones/commands", headers=headers, json={"command": "return_to_base"}) as critical:
+                statuses.append(critical.status_code)
+
+    statuses = []
+    thread = threading.Thread(target=concurrent_requests)
+    thread.start()
+    thread.join()
+    assert statuses == [429, 200]
+    assert json.loads(response.get_data(as_text=True))["status"] == 200
+    response.close()
+    assert admission._active == 0
+
+
+def test_shared_memory_store_attaches_by_name_across_processes():
+    """Тест: процесс, подключившийся к сегменту по имени, делит с создателем корзины и блокировку."""
+    import multiprocessing
+
+    store = SharedMemoryBucketStore(slots=64)
+    try:
+        limiter = TokenBucketLimiter(rate=1e-3, burst=200, store=store)
+        # Дочерний процесс подключается к сегменту по имени, а не использует унаследованный объект
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_spend_tokens, args=(store._memory.name, 50)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        assert [worker.exitcode for worker in workers] == [0] * 4
+        with pytest.raises(RateLimitExceeded):
+            limiter.check("user:shared")
+    finally:
+        store.close(unlink=True)
+
+
+def _spend_tokens(name, count):
+    store = SharedMemoryBucketStore(name, slots=64)
+    limiter = TokenBucketLimiter(rate=1e-3, burst=200, store=store)
+    for _ in range(count):
+        limiter.check("user:shared")
+    store.close()
+
+
+@pytest.fixture
+def asgi_app(client, monkeypatch):
+    """Фикстура: ASGI-приложение сервера, клиент httpx к нему и заголовок авторизации."""
+    httpx = pytest.importorskip("httpx")
+    import asgi
+
+    monkeypatch.setattr(rate_limit, "user_limiter", TokenBucketLimiter(rate=100, burst=100))
+    monkeypatch.setattr(rate_limit, "drone_limiter", TokenBucketLimiter(rate=100, burst=100))
+    application = asgi.DroneASGIApp()
+    _, headers = client
+
+    async def run(scenario):
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", headers=headers) as http:
+            try:
+                return await scenario(http)
+            finally:
+                await application.close()
+
+    return lambda scenario: asyncio.run(run(scenario))
+
+
+def test_asgi_takeoff_commands_run_concurrently(asgi_app, drone_server, monkeypatch):
+    """Тест: медленный дрон не занимает поток, команды взлета выполняются одновременно."""
+    monkeypatch.setattr(light_server, "RESPONSE_DELAY", 0.3)
+    monkeypatch.setitem(light_server.takeoff_concurrency, "peak", 0)
+    for i in range(10):
+        drone_routes.drones[f"DJI{i:03d}"] = {"drone_id": f"DJI{i:03d}", "control_url": drone_server}
+
+    async def scenario(http):
+        return await asyncio.gather(*(http.post(f"/drones/DJI{i:03d}/takeoff", json={"altitude": 10 + i})
+                                      for i in range(10)))
+
+    responses = asgi_app(scenario)
+    assert [response.status_code for response in responses] == [200] * 10
+    assert "15" in responses[5].json()["message"]
+    # При последовательной обработке дрон-заглушка никогда не выполняет больше одной команды
+    assert light_server.takeoff_concurrency["peak"] > 1
+
+
+def test_asgi_keeps_route_semantics(asgi_app, drone_server):
+    """Тест: ASGI-приложение отвечает так же, как Flask, и передает ему остальные маршруты."""
+    async def scenario(http):
+        created = await http.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+        listing = await http.get("/drones")
+        unknown = await http.post("/drones/NOPE/takeoff", json={"altitude": 10})
+        invalid = await http.post("/drones/DJI001/takeoff", json={"altitude": "high"})
+        anonymous = await http.post("/drones/DJI001/takeoff", json={"altitude": 10}, headers={"Authorization": ""})
+        broadcast = await http.post("/drones/commands", json={"command": "takeoff", "params": {"altitude": 5}})
+        await http.post("/drones", json={"drone_id": "DJI002"})
+        unreachable = await http.post("/drones/DJI002/takeoff", json={"altitude": 10})
+        return created, listing, unknown, invalid, anonymous, broadcast, unreachable
+
+    created, listing, unknown, invalid, anonymous, broadcast, unreachable = asgi_app(scenario)
+    assert created.status_code == 201
+    assert list(listing.json()) == ["DJI001"]
+    assert unknown.status_code == 404
+    assert invalid.status_code == 400 and invalid.json()["details"]
+    assert anonymous.status_code == 401
+    assert broadcast.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in broadcast.text.splitlines()] == [{"drone_id": "DJI001", "status": 200}]
+    assert unreachable.status_code == 409
+
+
+def test_asgi_commands_pass_admission_control(asgi_app, drone_server, monkeypatch):
+    """Тест: ASGI-команды занимают места допуска: при перегрузке 429 с Retry-After, посадка — из резерва."""
+    monkeypatch.setattr(light_server, "RESPONSE_DELAY", 0.3)
+    admission = AdmissionController(max_concurrent=1, reserved=1, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(rate_limit, "admission", admission)
+    for drone_id in ("DJI001", "DJI002"):
+        drone_routes.drones[drone_id] = {"drone_id": drone_id, "control_url": drone_server}
+
+    async def scenario(http):
+        slow = asyncio.ensure_future(http.post("/drones/DJI001/takeoff", json={"altitude": 10}))
+        await asyncio.sleep(0.1)
+        shed = await http.post("/drones/DJI002/takeoff", json={"altitude": 10})
+        broadcast = await http.post("/drones/commands", json={"command": "takeoff", "params": {"altitude": 5}})
+        critical = await http.post("/drones/commands", json={"command": "land"})
+        return await slow, shed, broadcast, critical
+
+    slow, shed, broadcast, critical = asgi_app(scenario)
+    assert slow.status_code == 200
+    assert shed.status_code == broadcast.status_code == 429
+    assert shed.headers["Retry-After"] == "1"
+    assert critical.status_code == 200
+    assert admission._active == 0
+
+
+def test_asgi_broadcast_holds_admission_until_last_chunk(client, drone_server, monkeypatch):
+    """Тест: рассылка через ASGI держит место допуска до последнего пустого фрагмента тела."""
+    import asgi
+
+    admission = AdmissionController(max_concurrent=1, reserved=0, max_queue=0, queue_timeout=0.05)
+    monkeypatch.setattr(rate_limit, "admission", admission)
+    drone_routes.drones["DJI001"] = {"drone_id": "DJI001", "control_url": drone_server}
+    _, headers = client
+    body = json.dumps({"command": "takeoff", "params": {"altitude": 5}}).encode()
+    scope = {"type": "http", "method": "POST", "path": "/drones/commands", "query_string": b"",
+             "headers": [(b"authorization", headers["Authorization"].encode()),
+                         (b"content-type", b"application/json")]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append((message["type"], message.get("body"), admission._active))
+
+    async def run():
+        application = asgi.DroneASGIApp()
+        try:
+            await application(scope, receive, send)
+        finally:
+            await application.close()
+
+    asyncio.run(run())
+    assert sent[0][0] == "http.response.start"
+    assert sent[-1] == ("http.response.body", b"", 1)
+    assert all(active == 1 for _, _, active in sent)
+    assert admission._active == 0
+
+
+def test_asgi_broadcast_validates_selector_and_params(asgi_app, drone_server):
+    """Тест: ASGI-рассылка проверяет selector.drone_ids и params так же, как Flask."""
+    drone_routes.drones["DJI001"] = {"drone_id": "DJI001", "control_url": drone_server}
+
+    async def scenario(http):
+        return [await http.post("/drones/commands", json=body) for body in INVALID_BROADCASTS]
+
+    responses = asgi_app(scenario)
+    assert [response.status_code for response in responses] == [400] * len(INVALID_BROADCASTS)
+    assert all(response.json()["details"] for response in responses)
+
+
+@pytest.fixture
+def takeoff_counter(monkeypatch):
+    """Фикстура: счетчик команд взлета, дошедших до дрона-заглушки."""
+    calls = []
+    change_altitude = light_server.drone_controller.change_altitude
+    monkeypatch.setattr(light_server.drone_controller, "change_altitude",
+                        lambda altitude: calls.append(altitude) or change_altitude(altitude))
+    return calls
+
+
+def test_idempotent_takeoff_replays_completed_command(client, drone_server, takeoff_counter):
+    """Тест: повтор с тем же Idempotency-Key получает сохраненный ответ без второй команды дрону."""
+    test_client, headers = client
+    test_client.post("/drones", json={"drone_id": "DJI001", "control_url": drone_server})
+    headers = {**headers, "Idempotency-Key": "takeoff-replay"}
+    first = test_client.post("/drones/DJI001/takeoff", json={"altitude": 15}, headers=headers)
+    retry = test_client.post("/drones/DJI001/takeoff", json={"altitude": 15}, headers=headers)
+    conflict = test_client.post("/drones/DJI001/takeoff", json={"altitude": 30}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert conflict.status_code == 422
+    assert takeoff_counter == [15]
+
+
+def test_asgi_duplicate_takeoffs_attach_to_pending_command(asgi_app, drone_server, takeoff_counter, monkeypatch):
+    """Тест: одновременные повторы ждут выполняющуюся команду, а не отправляют ее снова."""
+    monkeypatch.setattr(light_server, "RESPONSE_DELAY", 0.2)
+    drone_routes.drones["DJI001"] = {"drone_id": "DJI001", "control_url": drone_server}
+
+    async def scenario(http):
+        return await asyncio.gather(*(http.post("/drones/DJI001/takeoff", json={"altitude": 20},
+                                                headers={"Idempotency-Key": "takeoff-pending"})
+                                      for _ in range(5)))
+
+    responses = asgi_app(scenario)
+    assert [response.status_code for response in responses] == [200] * 5
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    assert takeoff_counter == [20]
+
+
+def test_idempotency_cache_expires_and_skips_server_errors(monkeypatch):
+    """Тест: ответ хранится ttl секунд, ответы 5xx не сохраняются, другое тело дает конфликт."""
+    cache = IdempotencyCache(ttl=10)
+    now = [0.0]
+    monkeypatch.setattr("idempotency.time.monotonic", lambda: now[0])
+    body = IdempotencyCache.fingerprint(b"{}")
+
+    future, owner = cache.begin("ok", body)
+    cache.complete("ok", future, 200, [], b"{}")
+    assert owner and cache.begin("ok", body) == (future, False)
+    with pytest.raises(IdempotencyConflict):
+        cache.begin("ok", IdempotencyCache.fingerprint(b"[]"))
+    now[0] = 11.0
+    assert cache.begin("ok", body)[1]
+
+    future, _ = cache.begin("failed", body)
+    cache.complete("failed", future, 504, [], b"{}")
+    assert future.result() == (504, [], b"{}")
+    assert cache.begin("failed", body)[1]
+
+
+def test_idempotency_cache_never_evicts_pending_commands():
+    """Тест: при переполнении вытесняются завершенные записи, а выполняющиеся остаются."""
+    cache = IdempotencyCache(maxsize=2)
+    body = IdempotencyCache.fingerprint(b"{}")
+    pending, _ = cache.begin("pending", body)
+    done, _ = cache.begin("done", body)
+    cache.complete("done", done, 200, [], b"{}")
+    cache.begin("new", body)
+    cache.begin("newer", body)
+    assert cache.begin("pending", body) == (pending, False)
+    assert cache.begin("done", body)[1]
+
+
+def test_idempotent_replay_keeps_response_headers():
+    """Тест: повтор получает заголовки исходного ответа, кроме транспортных."""
+    from flask import Flask, make_response
+    from flask_jwt_extended import JWTManager
+    from helpers import authenticated_route
+    from idempotency import idempotent
+
+    app_with_headers = Flask(__name__)
+    app_with_headers.config["SECRET_KEY"] = "test_secret_key"
+    JWTManager(app_with_headers)
+
+    @app_with_headers.route("/missions", methods=["POST"])
+    @authenticated_route
+    @idempotent()
+    def create_mission():
+        response = make_response({"mission_id": "M1"}, 201)
+        response.headers["Location"] = "/missions/M1"
+        response.headers["X-Drone-Id"] = "DJI001"
+        return response
+
+    with app_with_headers.app_context():
+        token = create_access_token(identity="operator")
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "mission-headers"}
+    with app_with_headers.test_client() as test_client:
+        first = test_client.post("/missions", json={}, headers=headers)
+        retry = test_client.post("/missions", json={}, headers=headers)
+    assert retry.status_code == first.status_code == 201
+    for name in ("Location", "X-Drone-Id", "Content-Type"):
+        assert retry.headers[name] == first.headers[name]
+    assert retry.headers.getlist("Content-Length") == [str(len(first.get_data()))]
+
+
+def test_latency_histogram_percentiles_within_precision():
+    """Тест: перцентили гистограммы совпадают с точными с относительной погрешностью корзины."""
+    histogram = LatencyHistogram()
+    samples = [0.0001 * 1.01 ** i for i in range(1000)]
+    for sample in samples:
+        histogram.record(sample)
+    exact = sorted(int(sample * 1e6) for sample in samples)
+    for percent in (50, 99, 99.9):
+        expected = exact[math.ceil(len(exact) * percent / 100) - 1]
+        assert expected <= histogram.percentile(percent) <= expected * 1.01
+    assert histogram.summary()["max_us"] == exact[-1]
+    merged = LatencyHistogram()
+    merged.merge(histogram)
+    merged.merge(histogram)
+    assert merged.total == 2000 and merged.percentile(50) == histogram.percentile(50)
+
+
+def test_load_generator_drives_request_mix(drone_server, tmp_path, capsys):
+    """Тест: генератор выдерживает частоту на смеси запросов к дрону-заглушке и сохраняет отчет."""
+    output = tmp_path / "run.json"
+    report = load_generator.main(["--url", drone_server, "--mix", "light", "--weights", "battery=0",
+                                  "--rate", "200", "--duration", "1", "--connections", "8",
+                                  "--output", str(output)])
+    assert report["requests"] == 200
+    assert report["statuses"] == {"200": 200}
+    assert set(report["kinds"]) == {"status", "position", "takeoff"}
+    assert report["throughput"] > 150
+    summary = report["latency"]["summary"]
+    assert 0 < summary["p50"] <= summary["p99"] <= summary["p999"] <= summary["max_us"]
+
+    load_generator.main(["--url", drone_server, "--rate", "100", "--duration", "0.5",
+                         "--compare", str(output)])
+    assert "p99:" in capsys.readouterr().out
+
+
+def test_admin_profile_starts_single_window(client, tmp_path, monkeypatch):
+    """Тест: /admin/profile запускает одно окно профилирования и отклоняет неверные параметры."""
+    from main import profiler
+
+    test_client, headers = client
+    monkeypatch.setenv("DRONE_PROFILE_DIR", str(tmp_path))
+    assert test_client.post("/admin/profile", json={"seconds": 0.2}).status_code == 401
+    assert test_client.post("/admin/profile", json={"seconds": 10000}, headers=headers).status_code == 400
+    response = test_client.post("/admin/profile", json={"seconds": 0.2, "format": "speedscope"}, headers=headers)
+    assert response.status_code == 202
+    assert response.get_json()["output_dir"] == str(tmp_path)
+    assert test_client.post("/admin/profile", json={"seconds": 0.2}, headers=headers).status_code == 409
+    outputs = profiler.active().stop()
+    assert outputs and all(os.path.basename(path).startswith("server-") for path in outputs)
+
+
+# Сервер без каталога drone в sys.path, как при python server/main.py
+_PROFILE_PROBE = """
+import sys
+sys.path.insert(0, {server!r})
+from flask_jwt_extended import create_access_token
+import main
+with main.app.app_context():
+    token = create_access_token(identity="operator")
+response = main.app.test_client().post("/admin/profile", json={{"seconds": 0.2}},
+                                       headers={{"Authorization": "Bearer " + token}})
+main.profiler.active().stop()
+print(response.status_code)
+"""
+
+
+def test_admin_profile_available_without_profiler_launcher(tmp_path):
+    """Тест: сервер, запущенный без python -m drone.profiler, сам находит профилировщик."""
+    environment = {name: value for name, value in os.environ.items() if name != "PYTHONPATH"}
+    environment["DRONE_PROFILE_DIR"] = str(tmp_path)
+    code = _PROFILE_PROBE.format(server=os.path.join(import_benchmark.ROOT, "server"))
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=environment,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["202"]
+
+
+def test_metrics_endpoint_reports_request_durations(client):
+    """Тест: /metrics отдает общий реестр с длительностью обработанных запросов по маршрутам."""
+    test_client, headers = client
+    assert test_client.get("/drones", headers=headers).status_code == 200
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert "# TYPE server_request_duration_seconds histogram" in text
+    assert 'server_request_duration_seconds_count{endpoint="drone_routes.get_drones"}' in text